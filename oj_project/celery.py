@@ -19,6 +19,15 @@ app.autodiscover_tasks()
 app.autodiscover_tasks(['oj_project.judge'], related_name='tasks')
 app.autodiscover_tasks(['oj_project.judge'], related_name='tasks_docker')
 app.autodiscover_tasks(['oj_project.judge'], related_name='tasks_judge0')
+app.autodiscover_tasks(['oj_project.problems'], related_name='counters')
+app.autodiscover_tasks(['oj_project.problems'], related_name='archive')
+app.autodiscover_tasks(['oj_project.problems'], related_name='rejudge')
+app.autodiscover_tasks(['oj_project.users'], related_name='leaderboard')
+
+# 判题 worker 定期检查判题后端，把状态发布到 Redis（Web 进程据此选择后端，见 oj_project/judge/dispatcher.py）
+from oj_project.judge.dispatcher import BackendHeartbeat  # noqa: E402
+
+app.steps['worker'].add(BackendHeartbeat)
 
 
 @app.task(bind=True, ignore_result=True)
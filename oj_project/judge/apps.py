@@ -4,3 +4,6 @@ from django.apps import AppConfig
 class JudgeConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'oj_project.judge'
+
+    def ready(self):
+        from . import signals  # noqa: F401
@@ -0,0 +1,199 @@
+"""
+基于 cgroup v2 的单次运行内存限制与测量
+
+每个测试用例的程序运行在独立的子 cgroup 中：
+    memory.max     按题目内存限制设置，超出时由内核 OOM killer 结束程序
+    memory.peak    运行期间的内存峰值
+    memory.events  oom_kill 计数，用于区分内存超限和其他原因导致的 SIGKILL
+    cpu.stat       usage_usec，运行期间消耗的 CPU 时间
+
+需要一个委派给判题进程的 cgroup v2 子树（JUDGE_CGROUP_ROOT），且判题进程本身位于该子树中，
+例如 systemd 服务设置 Delegate=yes，或容器以 --cgroupns=private 运行并可写 /sys/fs/cgroup。
+不满足条件时 create_run_cgroup 返回 None，调用方回退到按题目内存限制设置 RLIMIT_AS。
+"""
+
+import logging
+import os
+import subprocess
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
+
+_available = None
+_available_lock = threading.Lock()
+
+
+def _cgroup_root():
+    return getattr(settings, 'OJ_SETTINGS', {}).get('JUDGE_CGROUP_ROOT', '')
+
+
+class RunCgroup:
+    """单次运行的 cgroup"""
+
+    def __init__(self, path):
+        self.path = path
+
+    @classmethod
+    def create(cls, root, memory_limit_kb):
+        path = os.path.join(root, f'run-{uuid.uuid4().hex}')
+        os.mkdir(path)
+        cgroup = cls(path)
+        try:
+            cgroup._write('memory.max', str(memory_limit_kb * 1024))
+            if os.path.exists(os.path.join(path, 'memory.swap.max')):
+                cgroup._write('memory.swap.max', '0')
+        except OSError:
+            cgroup.close()
+            raise
+        return cgroup
+
+    def _write(self, name, value):
+        with open(os.path.join(self.path, name), 'w') as f:
+            f.write(value)
+
+    def _read(self, name):
+        with open(os.path.join(self.path, name)) as f:
+            return f.read()
+
+    def join(self):
+        """把当前进程加入 cgroup（在子进程 exec 之前调用）"""
+        self._write('cgroup.procs', str(os.getpid()))
+
+    def peak_kb(self):
+        """
+        运行期间的内存峰值
+
+        Returns:
+            int | None: KB；内核不支持 memory.peak（5.19 之前）时返回 None
+        """
+        try:
+            return int(self._read('memory.peak')) // 1024
+        except (OSError, ValueError):
+            return None
+
+    def cpu_time_ms(self):
+        """
+        cgroup 内全部进程的 CPU 时间（用户态 + 内核态）
+
+        Returns:
+            int | None: 毫秒；读取失败时返回 None
+        """
+        try:
+            for line in self._read('cpu.stat').splitlines():
+                key, _, value = line.partition(' ')
+                if key == 'usage_usec':
+                    return int(value) // 1000
+        except (OSError, ValueError):
+            pass
+        return None
+
+    def oom_killed(self):
+        """是否有进程因超出 memory.max 被 OOM killer 结束"""
+        try:
+            for line in self._read('memory.events').splitlines():
+                key, _, value = line.partition(' ')
+                if key == 'oom_kill':
+                    return int(value) > 0
+        except (OSError, ValueError):
+            pass
+        return False
+
+    def close(self):
+        """结束残留进程并删除 cgroup"""
+        try:
+            if os.path.exists(os.path.join(self.path, 'cgroup.kill')):
+                self._write('cgroup.kill', '1')
+        except OSError:
+            pass
+        # 被结束的进程退出前 cgroup 不能删除，稍等重试
+        for _ in range(50):
+            try:
+                os.rmdir(self.path)
+                return
+            except FileNotFoundError:
+                return
+            except OSError as e:
+                error = e
+                time.sleep(0.02)
+        logger.warning(f"删除 cgroup 失败: {self.path}: {error}")
+
+
+def _probe(root):
+    """检查 cgroup 子树是否可用：能创建子 cgroup、设置内存限制并把子进程移入其中"""
+    try:
+        with open(os.path.join(root, 'cgroup.controllers')) as f:
+            if 'memory' not in f.read().split():
+                return False
+        with open(os.path.join(root, 'cgroup.subtree_control')) as f:
+            enabled = f.read().split()
+        if 'memory' not in enabled:
+            with open(os.path.join(root, 'cgroup.subtree_control'), 'w') as f:
+                f.write('+memory')
+
+        cgroup = RunCgroup.create(root, 64 * 1024)
+        try:
+            # 由子进程自己写入 cgroup.procs，不使用 preexec_fn（可能在并行评测的线程中首次检查）
+            result = subprocess.run(
+                ['/bin/sh', '-c', 'echo $$ > "$1"', 'sh', os.path.join(cgroup.path, 'cgroup.procs')],
+                stderr=subprocess.DEVNULL,
+                timeout=5,
+                check=False
+            )
+            return result.returncode == 0
+        finally:
+            cgroup.close()
+    except (OSError, subprocess.SubprocessError) as e:
+        logger.warning(f"cgroup 不可用，回退到 RLIMIT_AS 内存限制: {root}: {e}")
+        return False
+
+
+def cgroup_available():
+    """JUDGE_CGROUP_ROOT 是否可用（每个进程只检查一次）"""
+    global _available
+
+    root = _cgroup_root()
+    if not root:
+        return False
+    with _available_lock:
+        if _available is None:
+            _available = _probe(root)
+        return _available
+
+
+def create_run_cgroup(memory_limit_kb):
+    """
+    为一次运行创建 cgroup
+
+    Args:
+        memory_limit_kb: 内存限制（KB）
+
+    Returns:
+        RunCgroup | None: 不可用时返回 None
+    """
+    if not cgroup_available():
+        return None
+    try:
+        return RunCgroup.create(_cgroup_root(), memory_limit_kb)
+    except OSError as e:
+        logger.warning(f"创建 cgroup 失败: {e}")
+        return None
+
+
+@contextmanager
+def run_cgroup(memory_limit_kb):
+    """
+    在 with 块内使用一次运行的 cgroup，结束时删除
+
+    Yields:
+        RunCgroup | None
+    """
+    cgroup = create_run_cgroup(memory_limit_kb)
+    try:
+        yield cgroup
+    finally:
+        if cgroup is not None:
+            cgroup.close()
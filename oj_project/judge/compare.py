@@ -0,0 +1,250 @@
+"""
+流式输出比对
+
+评测时不再把程序的全部输出读入内存后再比对，而是边读取标准输出边与期望输出比较：
+一旦出现不一致或输出超过长度限制就立即停止读取并结束程序，判题进程的内存占用与输出大小无关。
+
+比对规则与原先的字符串比对一致：
+    strict：output.strip() == expected.strip()（Python 评测）
+    lines： 在 strip() 的基础上再忽略每行行尾的空白（C++ 评测）
+
+程序输出按文本模式处理（`\\r\\n` 与 `\\r` 视为换行）；程序输出一侧只识别 ASCII 空白字符。
+
+期望输出可以是字符串，也可以是 bytes 或 mmap（测试数据文件），后者只识别 ASCII 空白字符，
+比对时按块切片读取，不会把整个期望输出复制到内存中。
+"""
+
+# str.strip() 在 ASCII 范围内识别的空白字符
+WHITESPACE = b' \t\n\r\x0b\x0c\x1c\x1d\x1e\x1f'
+LINE_WHITESPACE = WHITESPACE.replace(b'\n', b'')
+
+# UTF-8 的后续字节，统计字符数时不计入
+CONTINUATION_BYTES = bytes(range(0x80, 0xc0))
+
+
+class OutputChecker:
+    """
+    增量比对程序输出与期望输出
+
+    由 runner.communicate 逐块调用 feed()，返回 False 时调用方应停止读取并结束程序；
+    程序正常结束后调用 finish() 得到比对结果。
+    """
+
+    def __init__(self, expected, mode='strict', max_output=None):
+        """
+        Args:
+            expected: 期望输出（str、bytes 或 mmap）
+            mode: 比对规则，'strict' 或 'lines'
+            max_output: 输出最大长度（字符），超过时停止读取
+        """
+        if isinstance(expected, str):
+            if mode == 'lines':
+                expected = '\n'.join(line.rstrip() for line in expected.strip().split('\n'))
+            expected = expected.strip().encode('utf-8')
+        self.expected = expected
+        self._lines = mode == 'lines' and _has_line_end_whitespace(expected)
+        self._reader = self._open_expected()
+        self.mode = mode
+        self.max_output = max_output
+
+        # 不一致 / 输出超长时置为 True
+        self.mismatch = False
+        self.overflow = False
+
+        self._chunks = []
+        self._length = 0
+        self._pending_cr = False
+        self._started = False
+        self._pending_whitespace = b''
+        self._line_tail = b''
+
+    @property
+    def stopped(self):
+        return self.mismatch or self.overflow
+
+    def feed(self, data):
+        """
+        处理一块标准输出
+
+        Returns:
+            bool: 是否需要继续读取
+        """
+        if self.stopped:
+            return False
+
+        # 与文本模式一致地统一换行符，块末尾的 \r 留到下一块再处理
+        if self._pending_cr:
+            data = b'\r' + data
+            self._pending_cr = False
+        if data.endswith(b'\r'):
+            data = data[:-1]
+            self._pending_cr = True
+        data = data.replace(b'\r\n', b'\n').replace(b'\r', b'\n')
+
+        self._length += len(data) - len(data.translate(None, CONTINUATION_BYTES))
+        if self.max_output is not None and self._length > self.max_output:
+            self.overflow = True
+            return False
+        self._chunks.append(data)
+
+        if self.mode == 'lines':
+            data = self._strip_line_ends(data)
+        self._compare(data)
+        return not self.mismatch
+
+    def finish(self):
+        """
+        程序输出结束
+
+        Returns:
+            bool: 输出是否与期望输出一致
+        """
+        if self.stopped:
+            return False
+        return self._reader.at_end()
+
+    def output(self):
+        """已读取的程序输出（用于错误信息）"""
+        return b''.join(self._chunks).decode('utf-8', errors='replace')
+
+    def expected_text(self, limit=None):
+        """
+        期望输出（去掉首尾空白，用于错误信息）
+
+        Args:
+            limit: 最多返回的字节数
+        """
+        reader = self._open_expected()
+        text = reader.read(len(self.expected) if limit is None else limit)
+        if reader.at_end():
+            text = text.rstrip(WHITESPACE)
+        return text.decode('utf-8', errors='replace')
+
+    def _open_expected(self):
+        if self._lines:
+            return _LineStrippedReader(self.expected)
+        return _ExpectedReader(self.expected)
+
+    def _strip_line_ends(self, data):
+        data, self._line_tail = _strip_line_ends(self._line_tail, data)
+        return data
+
+    def _compare(self, data):
+        if not self._started:
+            data = data.lstrip(WHITESPACE)
+            if not data:
+                return
+            self._started = True
+
+        # 块末尾的空白可能是整个输出末尾的空白，等到后面出现非空白字符时再比较
+        body = data.rstrip(WHITESPACE)
+        if body:
+            segment = self._pending_whitespace + body
+            if self._reader.read(len(segment)) != segment:
+                self.mismatch = True
+                return
+            self._pending_whitespace = b''
+        self._pending_whitespace += data[len(body):]
+
+
+class _ExpectedReader:
+    """顺序读取期望输出（去掉首尾空白），每次只切片需要比对的一段"""
+
+    def __init__(self, data):
+        self.data = data
+        self._position, self._end = _strip_bounds(data)
+
+    def read(self, size):
+        chunk = self.data[self._position:min(self._position + size, self._end)]
+        self._position += len(chunk)
+        return chunk
+
+    def at_end(self):
+        return self._position == self._end
+
+
+class _LineStrippedReader:
+    """
+    顺序读取期望输出并去掉首尾空白和每行行尾的空白（lines 模式）
+
+    按块读取并处理，内存中只保留尚未比对的一小段。
+    """
+
+    CHUNK_SIZE = 64 * 1024
+
+    def __init__(self, data):
+        self.data = data
+        self._offset = 0
+        self._line_tail = b''
+        self._buffer = b''
+        # 跳过开头的空白
+        while self._fill(1) and not self._buffer.lstrip(WHITESPACE):
+            self._buffer = b''
+        self._buffer = self._buffer.lstrip(WHITESPACE)
+
+    def _fill(self, size):
+        """
+        读取原始数据直到缓冲区不少于 size 字节
+
+        Returns:
+            bool: 缓冲区是否有数据
+        """
+        while len(self._buffer) < size and self._offset < len(self.data):
+            chunk = self.data[self._offset:self._offset + self.CHUNK_SIZE]
+            self._offset += len(chunk)
+            chunk, self._line_tail = _strip_line_ends(self._line_tail, chunk)
+            self._buffer += chunk
+        # 数据末尾剩余的 _line_tail 是最后一行的行尾空白，丢弃
+        return bool(self._buffer)
+
+    def read(self, size):
+        self._fill(size)
+        chunk, self._buffer = self._buffer[:size], self._buffer[size:]
+        return chunk
+
+    def at_end(self):
+        """剩余部分是否只有空白"""
+        while self._fill(self.CHUNK_SIZE):
+            if self._buffer.strip(WHITESPACE):
+                return False
+            self._buffer = b''
+        return True
+
+
+def _strip_line_ends(tail, data):
+    """
+    去掉每行行尾的空白
+
+    数据末尾的空白不能确定是否在行尾，返回给调用方与下一块数据一起处理
+
+    Args:
+        tail: 上一块数据末尾保留的空白
+        data: 本块数据
+
+    Returns:
+        tuple: (处理后的数据, 保留的空白)
+    """
+    lines = (tail + data).split(b'\n')
+    last = lines.pop()
+    body = last.rstrip(LINE_WHITESPACE)
+    tail = last[len(body):]
+    if not lines:
+        return body, tail
+    return b'\n'.join(line.rstrip(LINE_WHITESPACE) for line in lines) + b'\n' + body, tail
+
+
+def _strip_bounds(data):
+    """去掉首尾 ASCII 空白后的范围 (start, end)"""
+    start, end = 0, len(data)
+    while start < end and data[start] in WHITESPACE:
+        start += 1
+    while end > start and data[end - 1] in WHITESPACE:
+        end -= 1
+    return start, end
+
+
+def _has_line_end_whitespace(data):
+    """是否有行带行尾空白（没有时期望输出无需按行处理）"""
+    if data[-1:] and data[-1] in LINE_WHITESPACE:
+        return True
+    return any(data.find(bytes([char]) + b'\n') != -1 for char in LINE_WHITESPACE)
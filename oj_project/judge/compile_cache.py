@@ -0,0 +1,216 @@
+"""
+C++ 编译缓存
+
+以「源代码 + 编译参数 + 编译器版本」的哈希为键，把编译产物（可执行文件或编译错误）
+保存在本地磁盘上。重判和完全相同的重复提交可以直接复用，跳过编译直接运行测试用例。
+
+目录结构：
+    <COMPILE_CACHE_DIR>/<key>/solution    编译成功的可执行文件
+    <COMPILE_CACHE_DIR>/<key>/error.txt   编译错误信息
+
+缓存按总大小限制，超过上限时按最近使用时间（目录 mtime）淘汰最旧的条目。
+"""
+
+import hashlib
+import logging
+import os
+import shutil
+import subprocess
+import tempfile
+import threading
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
+
+BINARY_NAME = 'solution'
+ERROR_NAME = 'error.txt'
+
+_toolchain_versions = {}
+_evict_lock = threading.Lock()
+
+
+def _cache_settings():
+    oj_settings = getattr(settings, 'OJ_SETTINGS', {})
+    return (
+        oj_settings.get('COMPILE_CACHE_ENABLED', True),
+        oj_settings.get('COMPILE_CACHE_DIR', os.path.join(tempfile.gettempdir(), 'oj_compile_cache')),
+        oj_settings.get('COMPILE_CACHE_MAX_BYTES', 1024 * 1024 * 1024),
+    )
+
+
+def get_toolchain_version(compiler):
+    """
+    获取编译器版本（同一进程内只查询一次）
+
+    Args:
+        compiler: 编译器路径
+
+    Returns:
+        str: `compiler --version` 的第一行，获取失败时返回空字符串
+    """
+    if compiler not in _toolchain_versions:
+        try:
+            result = subprocess.run(
+                [compiler, '--version'],
+                capture_output=True,
+                text=True,
+                timeout=5,
+                check=False
+            )
+            _toolchain_versions[compiler] = result.stdout.splitlines()[0] if result.stdout else ''
+        except Exception:
+            _toolchain_versions[compiler] = ''
+    return _toolchain_versions[compiler]
+
+
+def make_key(code, compile_flags, toolchain_version):
+    """
+    计算缓存键
+
+    Args:
+        code: 源代码
+        compile_flags: 编译参数列表（不含输入输出文件路径）
+        toolchain_version: 编译器版本字符串
+
+    Returns:
+        str: sha256 十六进制摘要
+    """
+    digest = hashlib.sha256()
+    for part in (toolchain_version, '\0'.join(compile_flags), code):
+        digest.update(part.encode('utf-8'))
+        digest.update(b'\x00\x01')
+    return digest.hexdigest()
+
+
+class CompileCache:
+    """本地磁盘上的编译缓存（LRU，按总大小淘汰）"""
+
+    def __init__(self, root=None, max_bytes=None):
+        enabled, default_root, default_max_bytes = _cache_settings()
+        self.enabled = enabled
+        self.root = root or default_root
+        self.max_bytes = max_bytes if max_bytes is not None else default_max_bytes
+
+    def _entry_dir(self, key):
+        return os.path.join(self.root, key)
+
+    def get(self, key):
+        """
+        查询缓存
+
+        Returns:
+            dict | None: 命中时返回
+                {'status': 'ok', 'executable': 可执行文件路径} 或
+                {'status': 'error', 'error_info': 编译错误信息}；
+            未命中返回 None
+        """
+        if not self.enabled:
+            return None
+
+        entry_dir = self._entry_dir(key)
+        binary = os.path.join(entry_dir, BINARY_NAME)
+        error_file = os.path.join(entry_dir, ERROR_NAME)
+
+        try:
+            if os.path.exists(binary):
+                hit = {'status': 'ok', 'executable': binary}
+            elif os.path.exists(error_file):
+                with open(error_file, 'r', encoding='utf-8') as f:
+                    hit = {'status': 'error', 'error_info': f.read()}
+            else:
+                return None
+            # 更新最近使用时间
+            os.utime(entry_dir)
+            return hit
+        except OSError:
+            # 条目可能恰好被其他进程淘汰
+            return None
+
+    def checkout(self, key, dest):
+        """
+        把缓存中的可执行文件放到 dest（优先硬链接，失败时复制）
+
+        运行时使用私有副本，避免缓存淘汰时文件被删除。
+
+        Returns:
+            bool: 是否成功
+        """
+        binary = os.path.join(self._entry_dir(key), BINARY_NAME)
+        try:
+            try:
+                os.link(binary, dest)
+            except OSError:
+                shutil.copy2(binary, dest)
+            return True
+        except OSError:
+            return False
+
+    def put_binary(self, key, executable):
+        """保存编译成功的可执行文件"""
+        self._put(key, BINARY_NAME, lambda path: shutil.copy2(executable, path))
+
+    def put_error(self, key, error_info):
+        """保存编译错误信息"""
+        def write(path):
+            with open(path, 'w', encoding='utf-8') as f:
+                f.write(error_info)
+        self._put(key, ERROR_NAME, write)
+
+    def _put(self, key, name, writer):
+        if not self.enabled:
+            return
+
+        try:
+            os.makedirs(self.root, exist_ok=True)
+            # 先写入临时目录，再原子地重命名，避免其他进程读到不完整的文件
+            staging = tempfile.mkdtemp(prefix='.staging-', dir=self.root)
+            try:
+                writer(os.path.join(staging, name))
+                try:
+                    os.rename(staging, self._entry_dir(key))
+                except OSError:
+                    # 其他进程已经写入了同一条目
+                    pass
+            finally:
+                shutil.rmtree(staging, ignore_errors=True)
+            self.evict()
+        except OSError as e:
+            logger.warning(f"写入编译缓存失败: {e}")
+
+    def evict(self):
+        """总大小超过上限时，按最近使用时间淘汰最旧的条目"""
+        if not _evict_lock.acquire(blocking=False):
+            return
+        try:
+            entries = []
+            total = 0
+            with os.scandir(self.root) as it:
+                for entry in it:
+                    if entry.name.startswith('.') or not entry.is_dir():
+                        continue
+                    size = 0
+                    for name in (BINARY_NAME, ERROR_NAME):
+                        try:
+                            size += os.path.getsize(os.path.join(entry.path, name))
+                        except OSError:
+                            pass
+                    try:
+                        mtime = entry.stat().st_mtime
+                    except OSError:
+                        continue
+                    entries.append((mtime, size, entry.path))
+                    total += size
+
+            if total <= self.max_bytes:
+                return
+
+            entries.sort()
+            for mtime, size, path in entries:
+                if total <= self.max_bytes:
+                    break
+                shutil.rmtree(path, ignore_errors=True)
+                total -= size
+        except OSError as e:
+            logger.warning(f"清理编译缓存失败: {e}")
+        finally:
+            _evict_lock.release()
@@ -0,0 +1,534 @@
+"""
+Docker判题容器池
+
+为每个判题镜像（oj-judge-python、oj-judge-cpp）预先创建一批锁定配置的常驻容器，
+一次提交的全部测试用例都在同一个容器中通过 exec 运行，避免每个测试用例都创建、启动、删除容器。
+
+容器归还时会清空工作目录并杀掉残留进程；
+复用次数达到上限、健康检查失败或运行中出现超时等异常的容器会被销毁，之后按需重新创建。
+"""
+
+import atexit
+import logging
+import os
+import re
+import socket
+import struct
+import threading
+import time
+from contextlib import contextmanager
+import docker
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
+
+POOL_LABEL = 'oj.judge.pool'
+
+# 容器保持运行的命令（镜像中的 busybox 提供 tail）
+IDLE_COMMAND = ['tail', '-f', '/dev/null']
+
+# 归还容器时的清理命令：清空工作目录，杀掉除 PID 1 以外的所有进程
+RESET_COMMAND = [
+    'sh', '-c',
+    'rm -rf /judge/* /judge/.[!.]* /tmp/* /tmp/.[!.]* 2>/dev/null; kill -9 -1 2>/dev/null; true'
+]
+
+STDOUT = 1
+STDERR = 2
+
+# 用户程序通过镜像中 busybox 的 time 启动，结束后在标准错误末尾附加内存峰值（KB）；
+# 程序非正常结束时 time 会先输出一行结束原因
+MEASURE_MARKER = '__OJ_RUSAGE__'
+MEASURE_PREFIX = ['time', '-f', f'\n{MEASURE_MARKER} %M']
+MEASURE_REPORT = re.compile(
+    r'(?:Command (terminated by signal|exited with non-zero status) (\d+)\n)?'
+    r'\n' + MEASURE_MARKER + r' (\d+)\n?$'
+)
+
+
+def _pool_settings():
+    oj_settings = getattr(settings, 'OJ_SETTINGS', {})
+    return (
+        oj_settings.get('DOCKER_POOL_SIZE', 2),
+        oj_settings.get('DOCKER_POOL_MAX_USES', 50),
+    )
+
+
+def sandbox_options(image):
+    """
+    判题容器的安全配置（与一次性容器保持一致）
+
+    C++ 镜像的 /judge 需要允许执行编译出的程序，因此挂载为 exec。
+    """
+    if 'cpp' in image:
+        tmpfs = {
+            '/tmp': 'size=50m,mode=1777',
+            '/judge': 'size=50m,mode=1777,exec',
+        }
+    else:
+        tmpfs = {
+            '/tmp': 'size=10m,mode=1777',  # 临时目录限制10MB
+            '/judge': 'size=1m,mode=1777',
+        }
+
+    return {
+        # 网络隔离
+        'network_disabled': True,
+
+        # 资源限制
+        'cpu_period': 100000,  # 100ms
+        'cpu_quota': 50000,  # 50% CPU
+        'pids_limit': 20,  # 最多20个进程
+
+        # 文件系统
+        'read_only': True,  # 只读根文件系统
+        'tmpfs': tmpfs,
+
+        # 安全选项
+        'security_opt': ['no-new-privileges'],
+        'cap_drop': ['ALL'],  # 移除所有capabilities
+
+        # 其他限制
+        'ulimits': [
+            docker.types.Ulimit(name='nofile', soft=20, hard=20),  # 最多20个文件
+            docker.types.Ulimit(name='nproc', soft=20, hard=20),  # 最多20个进程
+        ],
+    }
+
+
+def measure_command(cmd):
+    """在命令前加上内存峰值测量（DOCKER_MEASURE_MEMORY 关闭时原样返回）"""
+    if not getattr(settings, 'OJ_SETTINGS', {}).get('DOCKER_MEASURE_MEMORY', True):
+        return list(cmd)
+    return MEASURE_PREFIX + list(cmd)
+
+
+def parse_measurement(error):
+    """
+    从标准错误中取出 time 附加的测量结果
+
+    Returns:
+        tuple: (程序本身的标准错误, 内存峰值 KB 或 None, 结束程序的信号或 None)
+    """
+    match = MEASURE_REPORT.search(error)
+    if match is None:
+        return error, None, None
+    reason, number, maxrss = match.groups()
+    signal_number = int(number) if reason == 'terminated by signal' else None
+    return error[:match.start()], int(maxrss), signal_number
+
+
+def run_result(exit_code, output, error, execution_time, memory_limit_mb):
+    """
+    根据一次运行的退出码和输出生成结果
+
+    被 SIGKILL 结束或内存峰值超过限制时判为内存超限：
+    容器内没有其他会发送 SIGKILL 的进程（超时由判题进程处理），只可能是 OOM killer。
+
+    Returns:
+        dict: 与 DockerJudge.judge_python 相同格式的结果，memory_kb 为内存峰值
+    """
+    error, memory_kb, signal_number = parse_measurement(error)
+    if signal_number is not None:
+        exit_code = -signal_number
+    memory_kb = memory_kb or 0
+
+    if signal_number == 9 or memory_kb > memory_limit_mb * 1024:
+        return {
+            'status': 'Memory Limit Exceeded',
+            'output': output,
+            'error': '内存超出限制',
+            'time_ms': execution_time,
+            'memory_kb': memory_kb,
+            'exit_code': exit_code
+        }
+
+    if exit_code != 0:
+        return {
+            'status': 'Runtime Error',
+            'output': output,
+            'error': error[:500],
+            'time_ms': execution_time,
+            'memory_kb': memory_kb,
+            'exit_code': exit_code
+        }
+
+    return {
+        'status': 'Success',
+        'output': output,
+        'error': error,
+        'time_ms': execution_time,
+        'memory_kb': memory_kb,
+        'exit_code': 0
+    }
+
+
+class PooledContainer:
+    """池中的一个容器"""
+
+    def __init__(self, container):
+        self.container = container
+        self.uses = 0
+        self.memory_limit_mb = None
+
+
+class ContainerPool:
+    """单个镜像的容器池（每个判题进程一个）"""
+
+    def __init__(self, client, image, size, max_uses):
+        self.client = client
+        self.image = image
+        self.size = size
+        self.max_uses = max_uses
+        self._idle = []
+        self._count = 0
+        self._condition = threading.Condition()
+
+    def _create(self, memory_limit_mb):
+        container = self.client.containers.create(
+            image=self.image,
+            command=IDLE_COMMAND,
+            detach=True,
+            labels={POOL_LABEL: '1'},
+            mem_limit=f'{memory_limit_mb}m',
+            memswap_limit=f'{memory_limit_mb}m',  # 禁用swap
+            **sandbox_options(self.image)
+        )
+        container.start()
+        pooled = PooledContainer(container)
+        pooled.memory_limit_mb = memory_limit_mb
+        return pooled
+
+    def warm(self, memory_limit_mb=256):
+        """预先创建容器直到填满池"""
+        while True:
+            with self._condition:
+                if self._count >= self.size:
+                    return
+                self._count += 1
+            try:
+                pooled = self._create(memory_limit_mb)
+            except Exception as e:
+                with self._condition:
+                    self._count -= 1
+                logger.warning(f"预创建判题容器失败: {e}")
+                return
+            with self._condition:
+                self._idle.append(pooled)
+                self._condition.notify()
+
+    def _healthy(self, pooled):
+        try:
+            pooled.container.reload()
+            return pooled.container.status == 'running'
+        except Exception:
+            return False
+
+    def acquire(self, memory_limit_mb):
+        """
+        取出一个健康的容器，并把内存限制调整为 memory_limit_mb
+
+        Returns:
+            PooledContainer
+        """
+        while True:
+            pooled = None
+            with self._condition:
+                while not self._idle and self._count >= self.size:
+                    self._condition.wait()
+                if self._idle:
+                    pooled = self._idle.pop()
+                else:
+                    self._count += 1
+
+            if pooled is None:
+                try:
+                    return self._create(memory_limit_mb)
+                except Exception:
+                    with self._condition:
+                        self._count -= 1
+                        self._condition.notify()
+                    raise
+
+            if not self._healthy(pooled):
+                self._destroy(pooled)
+                continue
+
+            try:
+                set_memory_limit(pooled, memory_limit_mb)
+            except Exception as e:
+                logger.warning(f"调整判题容器内存限制失败: {e}")
+                self._destroy(pooled)
+                continue
+            return pooled
+
+    def release(self, pooled, dirty=False):
+        """
+        归还容器：清理后放回池中，或在需要时销毁
+
+        Args:
+            pooled: PooledContainer
+            dirty: 容器中是否可能有残留的运行中进程（如超时）
+        """
+        pooled.uses += 1
+        recycle = dirty or pooled.uses >= self.max_uses
+        if not recycle:
+            try:
+                exit_code, _, _ = exec_in_container(self.client, pooled.container, RESET_COMMAND, timeout=5)
+                recycle = exit_code != 0
+            except Exception:
+                recycle = True
+
+        if recycle:
+            self._destroy(pooled)
+            return
+
+        with self._condition:
+            self._idle.append(pooled)
+            self._condition.notify()
+
+    def _destroy(self, pooled):
+        with self._condition:
+            self._count -= 1
+            self._condition.notify()
+        try:
+            pooled.container.remove(force=True)
+        except Exception:
+            pass
+
+    def close(self):
+        with self._condition:
+            idle, self._idle = self._idle, []
+        for pooled in idle:
+            self._destroy(pooled)
+
+
+def set_memory_limit(pooled, memory_limit_mb):
+    """调整容器的内存限制"""
+    if pooled.memory_limit_mb != memory_limit_mb:
+        pooled.container.update(
+            mem_limit=f'{memory_limit_mb}m',
+            memswap_limit=f'{memory_limit_mb}m'
+        )
+        pooled.memory_limit_mb = memory_limit_mb
+
+
+def exec_in_container(client, container, cmd, stdin_data=None, timeout=None, workdir=None):
+    """
+    在容器中执行命令
+
+    Args:
+        client: DockerClient
+        container: 容器
+        cmd: 命令列表
+        stdin_data: 标准输入（bytes）
+        timeout: 超时时间（秒）
+        workdir: 工作目录
+
+    Returns:
+        tuple: (退出码, stdout bytes, stderr bytes)
+
+    Raises:
+        socket.timeout: 执行超时（命令可能仍在容器中运行）
+    """
+    api = client.api
+    exec_id = api.exec_create(
+        container.id,
+        cmd,
+        stdin=True,
+        stdout=True,
+        stderr=True,
+        workdir=workdir,
+    )['Id']
+    sock = api.exec_start(exec_id, socket=True)
+    raw = getattr(sock, '_sock', sock)
+    deadline = time.monotonic() + timeout if timeout else None
+
+    def send_input():
+        # 单独的线程写入标准输入，避免输入输出都很大时双方互相阻塞
+        try:
+            if stdin_data:
+                raw.sendall(stdin_data)
+            raw.shutdown(socket.SHUT_WR)
+        except OSError:
+            pass
+
+    try:
+        raw.settimeout(timeout)
+        writer = threading.Thread(target=send_input, daemon=True)
+        writer.start()
+        stdout, stderr = _read_frames(raw, deadline)
+        writer.join(1)
+    finally:
+        try:
+            sock.close()
+        except Exception:
+            pass
+
+    exit_code = api.exec_inspect(exec_id).get('ExitCode')
+    return (exit_code if exit_code is not None else -1), stdout, stderr
+
+
+def _read_frames(raw, deadline):
+    """读取 docker 多路复用的输出流（每帧 8 字节头：流类型 + 长度）"""
+    buffers = {STDOUT: [], STDERR: []}
+    pending = b''
+
+    while True:
+        if deadline is not None:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                raise socket.timeout('exec timed out')
+            raw.settimeout(remaining)
+        data = raw.recv(65536)
+        if not data:
+            break
+        pending += data
+        while len(pending) >= 8:
+            stream_type, length = struct.unpack('>BxxxL', pending[:8])
+            if len(pending) < 8 + length:
+                break
+            buffers.setdefault(stream_type, []).append(pending[8:8 + length])
+            pending = pending[8 + length:]
+
+    return b''.join(buffers[STDOUT]), b''.join(buffers[STDERR])
+
+
+class SandboxSession:
+    """一次提交在池化容器中的评测会话"""
+
+    def __init__(self, client, pooled):
+        self.client = client
+        self.pooled = pooled
+        self.dirty = False
+
+    def write_file(self, path, content):
+        """把文件写入容器（通过 stdin 传入，避免命令行长度和转义问题）"""
+        exit_code, _, stderr = self.execute(
+            ['sh', '-c', f'cat > {path}'],
+            stdin_data=content.encode('utf-8'),
+            timeout=10,
+        )
+        if exit_code != 0:
+            raise RuntimeError(f"写入容器文件失败: {stderr.decode('utf-8', errors='replace')[:200]}")
+
+    def set_memory_limit(self, memory_limit_mb):
+        set_memory_limit(self.pooled, memory_limit_mb)
+
+    def execute(self, cmd, stdin_data=None, timeout=None):
+        """
+        在容器中执行命令
+
+        超时或执行异常时会把会话标记为 dirty，归还时销毁该容器。
+
+        Returns:
+            tuple: (退出码, stdout bytes, stderr bytes)
+        """
+        try:
+            return exec_in_container(
+                self.client,
+                self.pooled.container,
+                cmd,
+                stdin_data=stdin_data,
+                timeout=timeout,
+                workdir='/judge',
+            )
+        except Exception:
+            self.dirty = True
+            raise
+
+    def run(self, cmd, test_input, time_limit_ms):
+        """
+        在容器中运行一次程序
+
+        Returns:
+            dict: 与 DockerJudge.judge_python 相同格式的结果（见 run_result）
+        """
+        start_time = time.time()
+        try:
+            exit_code, stdout, stderr = self.execute(
+                measure_command(cmd),
+                stdin_data=(test_input or '').encode('utf-8'),
+                timeout=time_limit_ms / 1000.0,
+            )
+        except socket.timeout:
+            # 程序可能仍在运行，归还时销毁该容器
+            return {
+                'status': 'Time Limit Exceeded',
+                'output': '',
+                'error': f'执行超时 (>{time_limit_ms}ms)',
+                'time_ms': time_limit_ms,
+                'memory_kb': 0,
+                'exit_code': -1
+            }
+        execution_time = int((time.time() - start_time) * 1000)
+
+        return run_result(
+            exit_code,
+            stdout.decode('utf-8', errors='replace'),
+            stderr.decode('utf-8', errors='replace'),
+            execution_time,
+            self.pooled.memory_limit_mb,
+        )
+
+
+_pools = {}
+_pools_pid = None
+_pools_lock = threading.Lock()
+
+
+def pool_enabled():
+    return getattr(settings, 'OJ_SETTINGS', {}).get('DOCKER_POOL_ENABLED', True)
+
+
+def get_container_pool(client, image):
+    """获取当前进程中某个镜像的容器池（首次使用时预创建容器）"""
+    global _pools, _pools_pid
+
+    with _pools_lock:
+        if _pools_pid != os.getpid():
+            # prefork 子进程不能复用父进程的池
+            _pools = {}
+            _pools_pid = os.getpid()
+        pool = _pools.get(image)
+        created = pool is None
+        if created:
+            size, max_uses = _pool_settings()
+            pool = ContainerPool(client, image, size, max_uses)
+            _pools[image] = pool
+
+    if created:
+        pool.warm()
+    return pool
+
+
+@contextmanager
+def sandbox_session(client, image, memory_limit_mb):
+    """
+    从池中借出一个容器用于一次提交的评测
+
+    用法：
+        with sandbox_session(client, image, 256) as session:
+            session.write_file('/judge/solution.py', code)
+            result = session.run(['python3', '/judge/solution.py'], test_input, 1000)
+    """
+    pool = get_container_pool(client, image)
+    pooled = pool.acquire(memory_limit_mb)
+    session = SandboxSession(client, pooled)
+    try:
+        yield session
+    except Exception:
+        session.dirty = True
+        raise
+    finally:
+        pool.release(pooled, dirty=session.dirty)
+
+
+@atexit.register
+def _close_pools():
+    if _pools_pid == os.getpid():
+        for pool in list(_pools.values()):
+            try:
+                pool.close()
+            except Exception:
+                pass
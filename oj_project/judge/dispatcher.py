@@ -0,0 +1,357 @@
+"""
+判题后端调度
+
+三种判题方式（traditional / docker / judge0）实现同一个后端接口，
+每个提交按后端的实时状态选择：
+    1. 按 JUDGE_METHOD、JUDGE_FALLBACK_BACKENDS 的顺序依次考虑各后端
+    2. 跳过不可用（没有 worker 报告可用）或已饱和（排队数超过上限）的后端
+    3. 全部饱和时选第一个可用的后端；全部不可用时仍使用 JUDGE_METHOD，由任务按原来的方式报错
+
+Web 进程不直接检查后端：Web 容器没有挂载 Docker socket，检查 Judge0 也会阻塞提交请求。
+每个判题 worker 的 BackendHeartbeat 每 JUDGE_BACKEND_CHECK_INTERVAL 秒在后台线程中检查一次各后端，
+把结果发布到 Redis 哈希 oj:judge:health:<后端>（{worker 主机名: JSON 心跳}）；
+choose_backend 只读取心跳和 Celery 队列长度（一次 Redis 往返）。
+超过 JUDGE_BACKEND_HEARTBEAT_TTL 秒没有更新的心跳视为该 worker 已下线。
+
+排队数：traditional 和 docker 在判题 worker 本机评测，看提交所在 Celery 队列的长度（JUDGE_MAX_QUEUE_LENGTH）；
+judge0 看 Judge0 自身的排队数（JUDGE0_MAX_QUEUE，由 worker 检查时一并发布）。
+traditional 和 docker 占用同一批判题 worker（docker 的容器池在每个判题进程中，一次只借出一个容器，
+容量就是 worker 的并发数），没有各自的容量信号：一个饱和时另一个也饱和，不在它们之间按饱和转交，
+只转交给有独立容量的后端（judge0）。后端不可用时仍按顺序转交。
+
+判题任务运行时发现后端故障（如 Docker 守护进程不可用、Judge0 重试耗尽）时调用 fail_over，
+把提交转交给下一个后端，而不是直接判为 System Error；
+同时把本 worker 的心跳标记为不可用，直到下一次检查。
+"""
+
+import json
+import logging
+import socket
+import threading
+import time
+from celery import bootsteps
+from django.conf import settings
+from .redis_client import get_redis
+
+logger = logging.getLogger(__name__)
+
+HEALTH_KEY_PREFIX = 'oj:judge:health:'
+
+# kombu Redis transport 按优先级把一个队列拆成多个列表：队列名、队列名 + SEP + 优先级档位
+KOMBU_PRIORITY_SEP = '\x06\x16'
+KOMBU_PRIORITY_STEPS = (3, 6, 9)
+
+
+def _oj_settings():
+    return getattr(settings, 'OJ_SETTINGS', {})
+
+
+class JudgeBackend:
+    """
+    判题后端接口
+
+    子类实现 task（Celery 任务）和 probe（健康检查，只在判题 worker 中调用）。
+    """
+
+    name = ''
+
+    # 饱和判断依据的容量：相同的后端同时饱和，choose_backend 不在它们之间按饱和转交
+    capacity = 'worker'
+
+    @property
+    def task(self):
+        raise NotImplementedError
+
+    def enabled(self):
+        """后端是否在配置中启用"""
+        return True
+
+    def probe(self):
+        """
+        检查后端状态
+
+        Returns:
+            dict: 心跳中的其他信息（如排队数）
+
+        Raises:
+            Exception: 检查失败时视为不可用
+        """
+        return {}
+
+    def saturated(self, health, queue_length):
+        """
+        后端是否饱和
+
+        Args:
+            health: 最近一次报告可用的心跳
+            queue_length: 提交所在 Celery 队列的长度，未知时为 None
+        """
+        limit = _oj_settings().get('JUDGE_MAX_QUEUE_LENGTH', 50)
+        return queue_length is not None and queue_length > limit
+
+
+class TraditionalBackend(JudgeBackend):
+    """在判题 worker 本机运行（阶段1）"""
+
+    name = 'traditional'
+
+    @property
+    def task(self):
+        from .tasks import judge_submission
+        return judge_submission
+
+
+class DockerBackend(JudgeBackend):
+    """Docker 容器判题（阶段2）"""
+
+    name = 'docker'
+
+    @property
+    def task(self):
+        from .tasks_docker import judge_submission_docker
+        return judge_submission_docker
+
+    def enabled(self):
+        return _oj_settings().get('DOCKER_JUDGE_ENABLED', False)
+
+    def probe(self):
+        from .docker_judge import DockerJudge
+        judge = DockerJudge()  # 连接失败时抛出 RuntimeError
+        judge.client.close()
+        return {}
+
+
+class Judge0Backend(JudgeBackend):
+    """Judge0 沙箱判题（阶段3）"""
+
+    name = 'judge0'
+    capacity = 'judge0'
+
+    @property
+    def task(self):
+        from .tasks_judge0 import judge_submission_judge0
+        return judge_submission_judge0
+
+    def probe(self):
+        from .judge0_client import Judge0Client
+        return {'queue': Judge0Client().get_queue_size()}
+
+    def saturated(self, health, queue_length):
+        # 在 Judge0 中评测，worker 只等待结果，看 Judge0 自身的排队数
+        return health.get('queue', 0) > _oj_settings().get('JUDGE0_MAX_QUEUE', 100)
+
+
+BACKENDS = {backend.name: backend for backend in (TraditionalBackend(), DockerBackend(), Judge0Backend())}
+
+
+def get_backend(name):
+    return BACKENDS.get(name) or BACKENDS['traditional']
+
+
+def backend_order():
+    """按优先顺序排列的已启用后端（JUDGE_METHOD 在最前）"""
+    oj_settings = _oj_settings()
+    names = [oj_settings.get('JUDGE_METHOD', 'traditional')]
+    names += oj_settings.get('JUDGE_FALLBACK_BACKENDS', [])
+    order = []
+    for name in names:
+        backend = BACKENDS.get(name)
+        if backend is not None and backend not in order and backend.enabled():
+            order.append(backend)
+    return order or [BACKENDS['traditional']]
+
+
+def worker_name():
+    return socket.gethostname()
+
+
+def publish_health(name, available, extra=None):
+    """
+    发布本 worker 对一个后端的检查结果
+
+    Args:
+        name: 后端名称
+        available: 是否可用
+        extra: 心跳中的其他信息（probe 的返回值）
+    """
+    ttl = _oj_settings().get('JUDGE_BACKEND_HEARTBEAT_TTL', 30)
+    key = f'{HEALTH_KEY_PREFIX}{name}'
+    heartbeat = json.dumps({'available': available, 'time': time.time(), **(extra or {})})
+    try:
+        pipe = get_redis().pipeline(transaction=False)
+        pipe.hset(key, worker_name(), heartbeat)
+        # 所有 worker 都下线后整个哈希过期
+        pipe.expire(key, ttl * 10)
+        pipe.execute()
+    except Exception as e:
+        logger.warning(f"发布判题后端状态失败 ({name}): {e}")
+
+
+def probe_backends():
+    """检查所有已启用的后端并发布结果（在判题 worker 中调用）"""
+    for backend in backend_order():
+        try:
+            extra = backend.probe()
+        except Exception as e:
+            logger.warning(f"判题后端 {backend.name} 不可用: {e}")
+            publish_health(backend.name, False)
+        else:
+            publish_health(backend.name, True, extra)
+
+
+def queue_length(client, queue):
+    """Celery 队列（Redis broker）中等待的任务数，包括各优先级档位的列表"""
+    pipe = client.pipeline(transaction=False)
+    pipe.llen(queue)
+    for step in KOMBU_PRIORITY_STEPS:
+        pipe.llen(f'{queue}{KOMBU_PRIORITY_SEP}{step}')
+    return sum(pipe.execute())
+
+
+def backend_statuses(backends, queue=None):
+    """
+    读取后端状态（worker 发布的心跳 + 提交所在 Celery 队列的长度）
+
+    Args:
+        backends: 后端列表
+        queue: 提交所在的 Celery 队列，None 时不检查队列长度
+
+    Returns:
+        dict: {后端名称: (是否可用, 是否饱和)}；Redis 不可用时全部视为不可用
+    """
+    ttl = _oj_settings().get('JUDGE_BACKEND_HEARTBEAT_TTL', 30)
+    try:
+        client = get_redis()
+        pipe = client.pipeline(transaction=False)
+        for backend in backends:
+            pipe.hgetall(f'{HEALTH_KEY_PREFIX}{backend.name}')
+        heartbeats = pipe.execute()
+        length = queue_length(client, queue) if queue else None
+    except Exception as e:
+        logger.warning(f"读取判题后端状态失败: {e}")
+        return {backend.name: (False, False) for backend in backends}
+
+    now = time.time()
+    statuses = {}
+    for backend, entries in zip(backends, heartbeats):
+        # 多个 worker 中最近一次报告可用的心跳
+        latest = None
+        for value in entries.values():
+            try:
+                health = json.loads(value)
+            except ValueError:
+                continue
+            if now - health.get('time', 0) > ttl or not health.get('available'):
+                continue
+            if latest is None or health['time'] > latest['time']:
+                latest = health
+        if latest is None:
+            statuses[backend.name] = (False, False)
+        else:
+            statuses[backend.name] = (True, backend.saturated(latest, length))
+    return statuses
+
+
+def backend_status(backend, queue=None):
+    """
+    后端状态
+
+    Returns:
+        tuple: (是否可用, 是否饱和)
+    """
+    return backend_statuses([backend], queue)[backend.name]
+
+
+def mark_unavailable(name):
+    """把后端标记为不可用（直到本 worker 下一次检查）"""
+    publish_health(name, False)
+
+
+def choose_backend(exclude=(), queue=None):
+    """
+    为一个提交选择判题后端
+
+    Args:
+        exclude: 不考虑的后端名称（已经失败过的后端）
+        queue: 提交将要进入的 Celery 队列（用于判断 traditional / docker 是否饱和）
+
+    Returns:
+        JudgeBackend | None: 排除后没有任何后端时返回 None
+    """
+    candidates = [backend for backend in backend_order() if backend.name not in exclude]
+    if not candidates:
+        return None
+
+    statuses = backend_statuses(candidates, queue)
+    saturated = None
+    busy_capacities = set()
+    for backend in candidates:
+        available, busy = statuses[backend.name]
+        if not available:
+            continue
+        # 与已饱和的后端共用容量（如 traditional 和 docker 共用判题 worker）时同样饱和
+        if not busy and backend.capacity not in busy_capacities:
+            return backend
+        busy_capacities.add(backend.capacity)
+        saturated = saturated or backend
+
+    if saturated is not None:
+        return saturated
+    # 全部不可用：交给首选后端，由任务报告错误
+    return candidates[0]
+
+
+class BackendHeartbeat(bootsteps.StartStopStep):
+    """
+    判题 worker 定期检查各后端并发布心跳（worker 主进程中的后台线程，不占用判题进程）
+
+    在 celery.py 中注册：app.steps['worker'].add(BackendHeartbeat)
+    """
+
+    requires = {'celery.worker.components:Pool'}
+
+    def __init__(self, worker, **kwargs):
+        super().__init__(worker, **kwargs)
+        self._stopped = threading.Event()
+        self._thread = None
+
+    def start(self, worker):
+        self._stopped.clear()
+        self._thread = threading.Thread(target=self._run, name='judge-backend-heartbeat', daemon=True)
+        self._thread.start()
+
+    def stop(self, worker):
+        self._stopped.set()
+
+    def _run(self):
+        while not self._stopped.is_set():
+            try:
+                probe_backends()
+            except Exception as e:
+                logger.warning(f"检查判题后端失败: {e}")
+            self._stopped.wait(_oj_settings().get('JUDGE_BACKEND_CHECK_INTERVAL', 10))
+
+
+def fail_over(submission, failed_backend, failed_backends=None):
+    """
+    判题任务发现后端故障时，把提交转交给下一个可用的后端
+
+    Args:
+        submission: 提交记录
+        failed_backend: 出现故障的后端名称
+        failed_backends: 此前已经失败过的后端名称（由任务参数传入，避免在后端之间来回转交）
+
+    Returns:
+        bool: 是否已转交；没有其他可用后端时返回 False，调用方按原来的方式报告错误
+    """
+    from .routing import enqueue_judge
+
+    mark_unavailable(failed_backend)
+    exclude = set(failed_backends or ()) | {failed_backend}
+    backend = choose_backend(exclude)
+    if backend is None or not backend_status(backend)[0]:
+        return False
+
+    logger.warning(f"判题后端 {failed_backend} 故障，提交 {submission.id} 转交给 {backend.name}")
+    enqueue_judge(submission, backend=backend, failed_backends=sorted(exclude))
+    return True
@@ -9,7 +9,9 @@ import tempfile
 import os
 import time
 import base64
+import uuid
 from django.conf import settings
+from .container_pool import measure_command, run_result, sandbox_session
 
 
 class DockerJudge:
@@ -51,9 +53,9 @@ class DockerJudge:
             # 创建容器
             container = self.client.containers.create(
                 image='oj-judge-python:latest',
-                command=[
+                command=measure_command([
                     'python3', '-c', code
-                ],
+                ]),
                 stdin_open=True,
                 detach=True,
                 
@@ -104,27 +106,9 @@ class DockerJudge:
                 output = container.logs(stdout=True, stderr=False).decode('utf-8')
                 error = container.logs(stdout=False, stderr=True).decode('utf-8')
                 
-                # 检查退出码
+                # 检查退出码和内存峰值
                 exit_code = result.get('StatusCode', -1)
-                
-                if exit_code != 0:
-                    return {
-                        'status': 'Runtime Error',
-                        'output': output,
-                        'error': error[:500],
-                        'time_ms': execution_time,
-                        'memory_kb': 0,
-                        'exit_code': exit_code
-                    }
-                
-                return {
-                    'status': 'Success',
-                    'output': output,
-                    'error': error,
-                    'time_ms': execution_time,
-                    'memory_kb': 0,  # Docker API获取内存较复杂，暂时设为0
-                    'exit_code': 0
-                }
+                return run_result(exit_code, output, error, execution_time, memory_limit_mb)
                 
             except docker.errors.ContainerError as e:
                 return {
@@ -157,7 +141,7 @@ class DockerJudge:
     
     def judge_cpp(self, code, test_input, time_limit_ms, memory_limit_mb):
         """
-        在Docker容器中判题C++代码
+        在Docker容器中判题C++代码（编译 + 运行一个测试用例）
         
         Args:
             code: C++代码
@@ -168,22 +152,47 @@ class DockerJudge:
         Returns:
             dict: 判题结果
         """
-        compile_container = None
-        run_container = None
+        compile_result = self.compile_cpp(code)
+        if compile_result['status'] != 'Success':
+            return compile_result
+        
+        try:
+            return self.run_cpp(compile_result['artifact'], test_input, time_limit_ms, memory_limit_mb)
+        finally:
+            self.remove_artifact(compile_result['artifact'])
+    
+    def compile_cpp(self, code):
+        """
+        编译C++代码到独立的产物卷
+        
+        每次提交只编译一次，产物卷随后以只读方式挂载到各个运行容器中。
+        调用方使用完毕后需要调用 remove_artifact 删除产物卷。
+        
+        Args:
+            code: C++代码
+        
+        Returns:
+            dict: 编译成功时 status 为 'Success'，artifact 为产物卷名称；
+                  失败时为 Compile Error 结果
+        """
+        artifact = f'oj-artifact-{uuid.uuid4().hex}'
+        self.client.volumes.create(name=artifact, labels={'oj.judge.artifact': '1'})
         
+        compile_container = None
         try:
-            # ===== 阶段1：编译 =====
+            # 产物卷挂载到镜像中属于判题用户的 /judge 目录，空卷会继承其属主，判题用户可写
             compile_container = self.client.containers.create(
-                image='oj-judge-cpp:latest',
+                image=settings.OJ_SETTINGS.get('DOCKER_CPP_IMAGE', 'oj-judge-cpp:latest'),
                 command=[
                     'sh', '-c',
                     f'echo "{self._escape_code(code)}" > /tmp/solution.cpp && '
-                    'g++ -o /tmp/solution /tmp/solution.cpp -std=c++17 -O2 -Wall 2>&1'
+                    'g++ -o /judge/solution /tmp/solution.cpp -std=c++17 -O2 -Wall 2>&1'
                 ],
                 detach=True,
                 mem_limit='512m',  # 编译需要更多内存
                 network_disabled=True,
                 tmpfs={'/tmp': 'size=50m,mode=1777'},
+                volumes={artifact: {'bind': '/judge', 'mode': 'rw'}},
                 security_opt=['no-new-privileges'],
                 cap_drop=['ALL'],
             )
@@ -195,18 +204,8 @@ class DockerJudge:
                 compile_result = compile_container.wait(timeout=10)
                 compile_output = compile_container.logs().decode('utf-8')
                 compile_exit_code = compile_result.get('StatusCode', -1)
-                
-                if compile_exit_code != 0:
-                    return {
-                        'status': 'Compile Error',
-                        'output': '',
-                        'error': compile_output[:500],
-                        'time_ms': 0,
-                        'memory_kb': 0,
-                        'exit_code': compile_exit_code
-                    }
-                
             except Exception as e:
+                self.remove_artifact(artifact)
                 return {
                     'status': 'Compile Error',
                     'output': '',
@@ -215,23 +214,58 @@ class DockerJudge:
                     'memory_kb': 0,
                     'exit_code': -1
                 }
-            finally:
-                if compile_container:
-                    compile_container.remove(force=True)
             
-            # ===== 阶段2：运行 =====
-            # 由于容器隔离，我们需要重新编译或使用volume
-            # 这里简化处理：在运行容器中重新编译
-            start_time = time.time()
+            if compile_exit_code != 0:
+                self.remove_artifact(artifact)
+                return {
+                    'status': 'Compile Error',
+                    'output': '',
+                    'error': compile_output[:500],
+                    'time_ms': 0,
+                    'memory_kb': 0,
+                    'exit_code': compile_exit_code
+                }
             
+            return {
+                'status': 'Success',
+                'artifact': artifact,
+                'output': compile_output,
+                'error': '',
+                'time_ms': 0,
+                'memory_kb': 0,
+                'exit_code': 0
+            }
+        except Exception:
+            self.remove_artifact(artifact)
+            raise
+        finally:
+            if compile_container:
+                try:
+                    compile_container.remove(force=True)
+                except:
+                    pass
+    
+    def run_cpp(self, artifact, test_input, time_limit_ms, memory_limit_mb):
+        """
+        在Docker容器中运行已编译的C++程序
+        
+        产物卷以只读方式挂载，运行时间只包含程序本身的执行。
+        
+        Args:
+            artifact: compile_cpp 返回的产物卷名称
+            test_input: 测试输入
+            time_limit_ms: 时间限制（毫秒）
+            memory_limit_mb: 内存限制（MB）
+        
+        Returns:
+            dict: 判题结果
+        """
+        run_container = None
+        
+        try:
             run_container = self.client.containers.create(
-                image='oj-judge-cpp:latest',
-                command=[
-                    'sh', '-c',
-                    f'echo "{self._escape_code(code)}" > /tmp/solution.cpp && '
-                    'g++ -o /tmp/solution /tmp/solution.cpp -std=c++17 -O2 2>/dev/null && '
-                    '/tmp/solution'
-                ],
+                image=settings.OJ_SETTINGS.get('DOCKER_CPP_IMAGE', 'oj-judge-cpp:latest'),
+                command=measure_command(['/judge/solution']),
                 stdin_open=True,
                 detach=True,
                 
@@ -243,9 +277,10 @@ class DockerJudge:
                 cpu_quota=50000,
                 pids_limit=20,
                 
-                # 文件系统
-                read_only=False,  # 需要写入临时文件
+                # 文件系统：程序只读挂载，根文件系统只读
+                read_only=True,
                 tmpfs={'/tmp': 'size=50m,mode=1777'},
+                volumes={artifact: {'bind': '/judge', 'mode': 'ro'}},
                 
                 # 安全选项
                 security_opt=['no-new-privileges'],
@@ -257,6 +292,7 @@ class DockerJudge:
                 ]
             )
             
+            start_time = time.time()
             run_container.start()
             
             # 发送输入
@@ -274,25 +310,7 @@ class DockerJudge:
                 output = run_container.logs(stdout=True, stderr=False).decode('utf-8')
                 error = run_container.logs(stdout=False, stderr=True).decode('utf-8')
                 exit_code = result.get('StatusCode', -1)
-                
-                if exit_code != 0:
-                    return {
-                        'status': 'Runtime Error',
-                        'output': output,
-                        'error': error[:500],
-                        'time_ms': execution_time,
-                        'memory_kb': 0,
-                        'exit_code': exit_code
-                    }
-                
-                return {
-                    'status': 'Success',
-                    'output': output,
-                    'error': error,
-                    'time_ms': execution_time,
-                    'memory_kb': 0,
-                    'exit_code': 0
-                }
+                return run_result(exit_code, output, error, execution_time, memory_limit_mb)
                 
             except Exception as e:
                 if 'timeout' in str(e).lower():
@@ -314,6 +332,31 @@ class DockerJudge:
                 except:
                     pass
     
+    def remove_artifact(self, artifact):
+        """删除编译产物卷"""
+        try:
+            self.client.volumes.get(artifact).remove(force=True)
+        except Exception:
+            pass
+    
+    def sandbox(self, language, memory_limit_mb):
+        """
+        从容器池借出一个判题容器，用于在同一个沙箱中运行一次提交的全部测试用例
+        
+        Args:
+            language: 编程语言（'Python' 或 'C++'）
+            memory_limit_mb: 内存限制（MB）
+        
+        Returns:
+            上下文管理器，产出 SandboxSession
+        """
+        oj_settings = settings.OJ_SETTINGS
+        if language == 'C++':
+            image = oj_settings.get('DOCKER_CPP_IMAGE', 'oj-judge-cpp:latest')
+        else:
+            image = oj_settings.get('DOCKER_PYTHON_IMAGE', 'oj-judge-python:latest')
+        return sandbox_session(self.client, image, memory_limit_mb)
+    
     def _escape_code(self, code):
         """转义代码中的特殊字符"""
         # 使用base64编码避免shell注入
@@ -324,10 +367,16 @@ class DockerJudge:
         """清理所有判题容器（紧急情况）"""
         try:
             containers = self.client.containers.list(
+                all=True,
                 filters={'ancestor': ['oj-judge-python:latest', 'oj-judge-cpp:latest']}
             )
             for container in containers:
                 container.remove(force=True)
+            for volume in self.client.volumes.list(filters={'label': 'oj.judge.artifact'}):
+                try:
+                    volume.remove(force=True)
+                except Exception:
+                    pass
             return len(containers)
         except Exception as e:
             print(f"清理容器失败: {e}")
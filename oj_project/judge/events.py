@@ -0,0 +1,95 @@
+"""
+评测状态推送
+
+判题进程在提交状态变化时通过 Redis pub/sub 发布事件，
+Web 端的 Server-Sent Events 视图（views.submission_events）订阅后推送给浏览器，
+提交详情页不再需要定时刷新整个页面。
+
+频道：oj:submission:<提交ID>
+事件（JSON）：
+    {"type": "status", "status": ..., "status_display": ..., "time_used": ..., "memory_used": ..., "score": ...}
+    {"type": "case", "status": "Judging", "case": 测试用例序号, "case_status": ..., "finished": 已完成数, "total": 总数}
+
+状态事件由 Submission 的 post_save 信号在事务提交后发布（见 signals.py），三种判题方式都会产生；
+测试用例进度事件由判题任务发布。发布失败只记录日志，不影响评测。
+"""
+
+import json
+import logging
+from .redis_client import get_redis
+
+logger = logging.getLogger(__name__)
+
+CHANNEL_PREFIX = 'oj:submission:'
+
+# 评测结束的状态（收到后推送流结束）
+FINAL_STATUSES = {
+    'Accepted', 'Wrong Answer', 'Time Limit Exceeded', 'Memory Limit Exceeded',
+    'Runtime Error', 'Compile Error', 'System Error',
+}
+
+
+def submission_channel(submission_id):
+    return f'{CHANNEL_PREFIX}{submission_id}'
+
+
+def status_event(submission):
+    """提交当前状态对应的事件"""
+    return {
+        'type': 'status',
+        'status': submission.status,
+        'status_display': submission.get_status_display(),
+        'time_used': submission.time_used,
+        'memory_used': submission.memory_used,
+        'score': submission.score,
+    }
+
+
+def is_final(event):
+    return event.get('type') == 'status' and event.get('status') in FINAL_STATUSES
+
+
+def publish(submission_id, event):
+    """
+    发布一个事件
+
+    Args:
+        submission_id: 提交ID
+        event: 事件字典
+    """
+    try:
+        get_redis().publish(submission_channel(submission_id), json.dumps(event, ensure_ascii=False))
+    except Exception as e:
+        logger.warning(f"发布评测事件失败 (submission={submission_id}): {e}")
+
+
+def publish_status(submission):
+    publish(submission.id, status_event(submission))
+
+
+def case_progress(submission_id):
+    """
+    生成测试用例进度回调（传给 runner.run_test_cases 的 on_result）
+
+    并行评测时测试用例完成的顺序不固定，finished 为已完成的数量。
+    """
+    finished = 0
+
+    def on_result(index, result, total):
+        nonlocal finished
+        finished += 1
+        publish(submission_id, {
+            'type': 'case',
+            'status': 'Judging',
+            'case': index + 1,
+            'case_status': result.get('status'),
+            'finished': finished,
+            'total': total,
+        })
+
+    return on_result
+
+
+def format_sse(event):
+    """把事件编码为 Server-Sent Events 消息"""
+    return f"data: {json.dumps(event, ensure_ascii=False)}\n\n"
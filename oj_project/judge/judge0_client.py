@@ -2,11 +2,82 @@
 Judge0 API 客户端
 
 封装与 Judge0 REST API 的交互
+
+所有请求共用一个进程级的 keep-alive 会话（连接池），
+一次提交的全部测试用例通过 `/submissions/batch` 一次提交、批量查询结果。
 """
+import base64
+import binascii
+import os
 import requests
+import threading
 import time
+from requests.adapters import HTTPAdapter
 from django.conf import settings
 
+# Judge0 批量接口单次最多接受的提交数（Judge0 默认 MAX_SUBMISSION_BATCH_SIZE 为 20）
+DEFAULT_BATCH_SIZE = 20
+
+# 查询结果时需要的字段
+RESULT_FIELDS = 'token,status,time,memory,stdout,stderr,compile_output,message,expected_output'
+
+# Judge0 回调请求体中以 base64 编码的文本字段
+BASE64_FIELDS = ('stdout', 'stderr', 'compile_output', 'message', 'expected_output')
+
+_session = None
+_session_pid = None
+_session_lock = threading.Lock()
+
+
+def _reset_lock():
+    # 判题 worker 主进程中有后台线程（dispatcher.BackendHeartbeat），fork 时锁可能正被持有
+    global _session_lock
+    _session_lock = threading.Lock()
+
+
+os.register_at_fork(after_in_child=_reset_lock)
+
+
+def get_session():
+    """
+    获取当前进程共用的 HTTP 会话
+
+    会话复用 TCP 连接；Celery prefork 模式下每个子进程各自创建一个会话。
+    """
+    global _session, _session_pid
+
+    with _session_lock:
+        if _session is None or _session_pid != os.getpid():
+            pool_size = getattr(settings, 'OJ_SETTINGS', {}).get('JUDGE0_POOL_SIZE', 10)
+            adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size)
+            session = requests.Session()
+            session.mount('http://', adapter)
+            session.mount('https://', adapter)
+            _session = session
+            _session_pid = os.getpid()
+        return _session
+
+
+def decode_callback(result):
+    """
+    解码 Judge0 回调请求体（回调中的文本字段总是 base64 编码）
+
+    Args:
+        result: 回调请求体
+
+    Returns:
+        dict: 文本字段解码后的提交结果
+    """
+    decoded = dict(result)
+    for field in BASE64_FIELDS:
+        value = decoded.get(field)
+        if value:
+            try:
+                decoded[field] = base64.b64decode(value).decode('utf-8', errors='replace')
+            except (binascii.Error, ValueError):
+                pass
+    return decoded
+
 
 class Judge0Client:
     """Judge0 API 客户端"""
@@ -25,11 +96,13 @@ class Judge0Client:
         }
         if self.token:
             self.headers['X-Auth-Token'] = self.token
+        self.session = get_session()
+        self.batch_size = getattr(settings, 'OJ_SETTINGS', {}).get('JUDGE0_BATCH_SIZE', DEFAULT_BATCH_SIZE)
     
-    def submit_code(self, language, source_code, stdin='', expected_output='', 
-                   cpu_time_limit=5.0, memory_limit=512000):
+    def build_payload(self, language, source_code, stdin='', expected_output='',
+                      cpu_time_limit=5.0, memory_limit=512000, callback_url=None):
         """
-        提交代码到 Judge0
+        构造单个提交的请求体
         
         Args:
             language: 编程语言 ('Python' 或 'C++')
@@ -38,9 +111,10 @@ class Judge0Client:
             expected_output: 期望输出
             cpu_time_limit: CPU 时间限制（秒）
             memory_limit: 内存限制（KB）
+            callback_url: 评测完成后 Judge0 回调（PUT）的地址，为空时不回调
         
         Returns:
-            dict: 包含 token 的响应
+            dict: Judge0 提交请求体
         """
         language_id = self.LANGUAGE_MAP.get(language)
         if not language_id:
@@ -55,9 +129,32 @@ class Judge0Client:
             'memory_limit': memory_limit,
             'enable_network': False,
         }
+        if callback_url:
+            payload['callback_url'] = callback_url
+        return payload
+    
+    def submit_code(self, language, source_code, stdin='', expected_output='', 
+                   cpu_time_limit=5.0, memory_limit=512000):
+        """
+        提交代码到 Judge0
+        
+        Args:
+            language: 编程语言 ('Python' 或 'C++')
+            source_code: 源代码
+            stdin: 标准输入
+            expected_output: 期望输出
+            cpu_time_limit: CPU 时间限制（秒）
+            memory_limit: 内存限制（KB）
+        
+        Returns:
+            dict: 包含 token 的响应
+        """
+        payload = self.build_payload(
+            language, source_code, stdin, expected_output, cpu_time_limit, memory_limit
+        )
         
         try:
-            response = requests.post(
+            response = self.session.post(
                 f'{self.base_url}/submissions?wait=false',
                 json=payload,
                 headers=self.headers,
@@ -79,7 +176,7 @@ class Judge0Client:
             dict: 提交结果
         """
         try:
-            response = requests.get(
+            response = self.session.get(
                 f'{self.base_url}/submissions/{token}',
                 headers=self.headers,
                 timeout=10
@@ -89,6 +186,27 @@ class Judge0Client:
         except requests.RequestException as e:
             raise Exception(f"获取结果失败: {str(e)}")
     
+    def get_queue_size(self, timeout=2):
+        """
+        获取 Judge0 排队中的提交数（GET /workers，所有队列求和）
+        
+        Args:
+            timeout: 请求超时时间（秒），用于健康检查，应当较短
+        
+        Returns:
+            int: 排队中的提交数
+        """
+        try:
+            response = self.session.get(
+                f'{self.base_url}/workers',
+                headers=self.headers,
+                timeout=timeout
+            )
+            response.raise_for_status()
+            return sum(queue.get('size', 0) for queue in response.json())
+        except (requests.RequestException, ValueError, TypeError, AttributeError) as e:
+            raise Exception(f"获取 Judge0 队列状态失败: {str(e)}")
+    
     def wait_for_submission(self, token, max_wait=30, poll_interval=1):
         """
         等待提交完成
@@ -129,7 +247,8 @@ class Judge0Client:
         
         raise TimeoutError(f"等待结果超时（{max_wait}秒）")
     
-    def parse_result(self, result):
+    @staticmethod
+    def parse_result(result):
         """
         解析 Judge0 返回的结果，转换为我们的格式
         
@@ -147,7 +266,7 @@ class Judge0Client:
             3: 'Accepted',
             4: 'Wrong Answer',
             5: 'Time Limit Exceeded',
-            6: 'Compilation Error',
+            6: 'Compile Error',
             7: 'Runtime Error',
             8: 'Runtime Error',
             9: 'Runtime Error',
@@ -166,20 +285,20 @@ class Judge0Client:
         
         # 错误信息
         error_info = ''
-        if status == 'Compilation Error':
+        if status == 'Compile Error':
             error_info = result.get('compile_output', '')
         elif status in ['Runtime Error', 'System Error']:
             error_info = result.get('stderr', '') or result.get('message', '') or status_description
         elif status == 'Wrong Answer':
-            expected = result.get('expected_output', '').strip()
-            actual = result.get('stdout', '').strip()
+            expected = (result.get('expected_output') or '').strip()
+            actual = (result.get('stdout') or '').strip()
             if expected and actual:
                 error_info = f"期望输出:\n{expected}\n\n实际输出:\n{actual}"
             else:
                 error_info = "输出不匹配"
         
         # 输出
-        output = result.get('stdout', '')
+        output = result.get('stdout') or ''
         
         return {
             'status': status,
@@ -224,4 +343,124 @@ class Judge0Client:
         
         # 解析结果
         return self.parse_result(result)
-
+    
+    def submit_batch(self, payloads):
+        """
+        批量提交代码（按 JUDGE0_BATCH_SIZE 分片调用 /submissions/batch）
+        
+        Args:
+            payloads: build_payload 构造的请求体列表
+        
+        Returns:
+            list: 与 payloads 顺序一致的 token 列表
+        """
+        tokens = []
+        for start in range(0, len(payloads), self.batch_size):
+            chunk = payloads[start:start + self.batch_size]
+            try:
+                response = self.session.post(
+                    f'{self.base_url}/submissions/batch?base64_encoded=false',
+                    json={'submissions': chunk},
+                    headers=self.headers,
+                    timeout=10
+                )
+                response.raise_for_status()
+            except requests.RequestException as e:
+                raise Exception(f"批量提交代码失败: {str(e)}")
+            
+            items = response.json()
+            if len(items) != len(chunk):
+                raise Exception(f"批量提交返回数量不一致: {len(items)} != {len(chunk)}")
+            for item in items:
+                token = item.get('token')
+                if not token:
+                    raise Exception(f"批量提交失败: {item}")
+                tokens.append(token)
+        return tokens
+    
+    def get_submissions_batch(self, tokens):
+        """
+        批量获取提交结果
+        
+        Args:
+            tokens: token 列表
+        
+        Returns:
+            dict: token -> 提交结果
+        """
+        results = {}
+        for start in range(0, len(tokens), self.batch_size):
+            chunk = tokens[start:start + self.batch_size]
+            try:
+                response = self.session.get(
+                    f'{self.base_url}/submissions/batch',
+                    params={
+                        'tokens': ','.join(chunk),
+                        'base64_encoded': 'false',
+                        'fields': RESULT_FIELDS,
+                    },
+                    headers=self.headers,
+                    timeout=10
+                )
+                response.raise_for_status()
+            except requests.RequestException as e:
+                raise Exception(f"批量获取结果失败: {str(e)}")
+            
+            for token, result in zip(chunk, response.json().get('submissions', [])):
+                if result:
+                    results[result.get('token') or token] = result
+        return results
+    
+    def wait_for_batch(self, tokens, max_wait=30, poll_interval=1):
+        """
+        等待一批提交全部完成（每轮只查询尚未完成的提交）
+        
+        Args:
+            tokens: token 列表
+            max_wait: 最大等待时间（秒）
+            poll_interval: 轮询间隔（秒）
+        
+        Returns:
+            list: 与 tokens 顺序一致的提交结果
+        """
+        finished = {}
+        pending = list(tokens)
+        start_time = time.time()
+        while time.time() - start_time < max_wait:
+            results = self.get_submissions_batch(pending)
+            for token, result in results.items():
+                if result.get('status', {}).get('id') not in [1, 2]:  # Not In Queue or Processing
+                    finished[token] = result
+            pending = [token for token in pending if token not in finished]
+            if not pending:
+                return [finished[token] for token in tokens]
+            
+            time.sleep(poll_interval)
+        
+        raise TimeoutError(f"等待结果超时（{max_wait}秒）")
+    
+    def judge_batch(self, language, source_code, cases, cpu_time_limit=5.0, memory_limit=512000):
+        """
+        批量判题：一次提交全部测试用例 -> 批量等待 -> 解析结果
+        
+        Args:
+            language: 编程语言
+            source_code: 源代码
+            cases: [(标准输入, 期望输出), ...]
+            cpu_time_limit: CPU 时间限制（秒）
+            memory_limit: 内存限制（KB）
+        
+        Returns:
+            list: 与 cases 顺序一致的判题结果
+        """
+        payloads = [
+            self.build_payload(language, source_code, stdin, expected_output, cpu_time_limit, memory_limit)
+            for stdin, expected_output in cases
+        ]
+        tokens = self.submit_batch(payloads)
+        
+        # 等待时间随测试用例数增长，Judge0 队列中的提交按工作进程数并发执行
+        max_wait = max(30, len(tokens) * (cpu_time_limit + 1))
+        results = self.wait_for_batch(tokens, max_wait=max_wait)
+        
+        return [self.parse_result(result) for result in results]
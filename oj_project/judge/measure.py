@@ -0,0 +1,135 @@
+"""
+用户程序的内存峰值测量（oj-measure）
+
+判题进程直接 fork + exec 用户程序时，wait4 返回的 ru_maxrss 包含 fork 出的判题进程副本
+（Celery worker 的常驻内存可达数十 MB），简单的程序也会显示占用几十 MB。
+
+oj-measure（oj_measure.c）是一个很小的启动程序：由它 fork 并 exec 用户程序，
+再把用户程序的 rusage 通过管道报告给判题进程。资源限制和 cgroup 也由它在 exec 用户程序之前设置，
+启动时不需要 preexec_fn，并行评测的多个线程可以同时创建子进程。启动程序在每个判题进程首次使用时
+用 C++ 编译器编译到私有临时目录；编译失败时 get_measure_helper 返回 None，
+调用方回退到判题进程自己的 wait4 结果。
+"""
+
+import atexit
+import logging
+import os
+import resource
+import shutil
+import subprocess
+import tempfile
+import threading
+
+logger = logging.getLogger(__name__)
+
+MEASURE_SOURCE = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'oj_measure.c')
+
+_helper = None
+_helper_pid = None
+_helper_lock = threading.Lock()
+
+
+def _build_helper(compiler):
+    build_dir = tempfile.mkdtemp(prefix='oj-measure-')
+    atexit.register(shutil.rmtree, build_dir, True)
+    helper = os.path.join(build_dir, 'oj-measure')
+
+    # 优先静态链接，避免用户程序运行前加载动态库的开销；不支持时退回动态链接
+    for flags in (['-static'], []):
+        try:
+            result = subprocess.run(
+                [compiler, '-x', 'c', '-O2', *flags, '-o', helper, MEASURE_SOURCE],
+                capture_output=True,
+                text=True,
+                timeout=60,
+                check=False
+            )
+        except (OSError, subprocess.SubprocessError) as e:
+            logger.warning(f"编译 oj-measure 失败，内存峰值将包含判题进程: {e}")
+            return None
+        if result.returncode == 0:
+            return helper
+    logger.warning(f"编译 oj-measure 失败，内存峰值将包含判题进程: {result.stderr[:500]}")
+    return None
+
+
+def get_measure_helper(compiler):
+    """
+    获取 oj-measure 的路径（每个进程只编译一次）
+
+    Args:
+        compiler: 编译器路径
+
+    Returns:
+        str | None: 不可用时返回 None
+    """
+    global _helper, _helper_pid
+
+    with _helper_lock:
+        if _helper_pid != os.getpid():
+            _helper = _build_helper(compiler)
+            _helper_pid = os.getpid()
+        return _helper
+
+
+class Measurement:
+    """
+    通过 oj-measure 运行一次程序
+
+    用法：
+        measurement = Measurement(helper, cmd, limits, cgroup)
+        run_program(measurement.cmd, ..., pass_fds=measurement.pass_fds)
+        rusage = measurement.finish()
+    """
+
+    def __init__(self, helper, cmd, limits, cgroup=None):
+        """
+        Args:
+            helper: get_measure_helper 的返回值
+            cmd: 用户程序的命令（程序须为完整路径）
+            limits: 资源限制 [(名称, 软限制, 硬限制), ...]，由 oj-measure 在 fork 之后设置给用户程序
+            cgroup: RunCgroup 或 None，用户程序由 oj-measure 加入该 cgroup
+        """
+        self._read_fd, self._write_fd = os.pipe()
+
+        procs = os.path.join(cgroup.path, 'cgroup.procs') if cgroup is not None else '-'
+        spec = ','.join(f'{getattr(resource, name)}:{soft}:{hard}' for name, soft, hard in limits) or '-'
+        self.cmd = [helper, str(self._write_fd), procs, spec] + list(cmd)
+        self.pass_fds = (self._write_fd,)
+
+    def finish(self):
+        """
+        读取用户程序的资源使用（程序结束后调用）
+
+        Returns:
+            dict | None: {'utime', 'stime', 'maxrss'}（秒、秒、KB），
+                oj-measure 被结束（如超时）时返回 None
+
+        Raises:
+            OSError: 用户程序加入 cgroup 或设置资源限制失败（没有运行）
+        """
+        self.close_writer()
+        try:
+            data = os.read(self._read_fd, 4096)
+        finally:
+            os.close(self._read_fd)
+            self._read_fd = None
+        if data.startswith(b'E '):
+            error = int(data.split()[1])
+            raise OSError(error, f'oj-measure 加入 cgroup 或设置资源限制失败: {os.strerror(error)}')
+        try:
+            maxrss, utime, stime = (int(value) for value in data.split())
+        except ValueError:
+            return None
+        return {'utime': utime / 1e6, 'stime': stime / 1e6, 'maxrss': maxrss}
+
+    def close_writer(self):
+        if self._write_fd is not None:
+            os.close(self._write_fd)
+            self._write_fd = None
+
+    def close(self):
+        self.close_writer()
+        if self._read_fd is not None:
+            os.close(self._read_fd)
+            self._read_fd = None
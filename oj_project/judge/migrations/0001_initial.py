@@ -0,0 +1,86 @@
+# Generated by Django 4.2.7 on 2026-10-18 03:46
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+    initial = True
+
+    dependencies = [
+        ("problems", "0002_alter_submission_language"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="Judge0CaseResult",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                (
+                    "case_index",
+                    models.IntegerField(
+                        help_text="按 TestCase.order 排序后的下标", verbose_name="测试用例序号"
+                    ),
+                ),
+                (
+                    "token",
+                    models.CharField(
+                        blank=True,
+                        max_length=64,
+                        null=True,
+                        unique=True,
+                        verbose_name="Judge0 token",
+                    ),
+                ),
+                (
+                    "status",
+                    models.CharField(
+                        blank=True,
+                        help_text="为空表示尚未返回结果",
+                        max_length=30,
+                        verbose_name="状态",
+                    ),
+                ),
+                ("time_used", models.FloatField(default=0, verbose_name="运行时间(ms)")),
+                ("memory_used", models.FloatField(default=0, verbose_name="内存使用(KB)")),
+                ("error_info", models.TextField(blank=True, verbose_name="错误信息")),
+                (
+                    "created_at",
+                    models.DateTimeField(auto_now_add=True, verbose_name="提交时间"),
+                ),
+                (
+                    "finished_at",
+                    models.DateTimeField(blank=True, null=True, verbose_name="完成时间"),
+                ),
+                (
+                    "submission",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="judge0_results",
+                        to="problems.submission",
+                        verbose_name="提交记录",
+                    ),
+                ),
+            ],
+            options={
+                "verbose_name": "Judge0 测试用例结果",
+                "verbose_name_plural": "Judge0 测试用例结果",
+                "ordering": ["submission", "case_index"],
+                "indexes": [
+                    models.Index(
+                        fields=["status", "created_at"],
+                        name="judge_judge_status_7f000f_idx",
+                    )
+                ],
+                "unique_together": {("submission", "case_index")},
+            },
+        ),
+    ]
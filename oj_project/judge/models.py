@@ -1,3 +1,37 @@
 from django.db import models
+from oj_project.problems.models import Submission
 
-# Create your models here.
+
+class Judge0CaseResult(models.Model):
+    """
+    Judge0 单个测试用例的评测结果
+
+    提交到 Judge0 时为每个测试用例创建一条记录，Judge0 通过回调（或兜底轮询）写入结果；
+    全部需要的结果到齐后汇总到 Submission，并删除这些记录。
+    """
+    submission = models.ForeignKey(
+        Submission,
+        on_delete=models.CASCADE,
+        related_name='judge0_results',
+        verbose_name='提交记录'
+    )
+    case_index = models.IntegerField('测试用例序号', help_text='按 TestCase.order 排序后的下标')
+    token = models.CharField('Judge0 token', max_length=64, unique=True, null=True, blank=True)
+    status = models.CharField('状态', max_length=30, blank=True, help_text='为空表示尚未返回结果')
+    time_used = models.FloatField('运行时间(ms)', default=0)
+    memory_used = models.FloatField('内存使用(KB)', default=0)
+    error_info = models.TextField('错误信息', blank=True)
+    created_at = models.DateTimeField('提交时间', auto_now_add=True)
+    finished_at = models.DateTimeField('完成时间', null=True, blank=True)
+
+    class Meta:
+        verbose_name = 'Judge0 测试用例结果'
+        verbose_name_plural = 'Judge0 测试用例结果'
+        ordering = ['submission', 'case_index']
+        unique_together = [('submission', 'case_index')]
+        indexes = [
+            models.Index(fields=['status', 'created_at']),
+        ]
+
+    def __str__(self):
+        return f"{self.submission_id} - #{self.case_index} - {self.status or 'Pending'}"
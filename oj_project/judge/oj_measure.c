@@ -0,0 +1,129 @@
+/*
+ * oj-measure: 运行程序并报告其资源使用
+ *
+ * 用法: oj-measure <报告 fd> <cgroup.procs 路径> <资源限制> <程序> [参数...]
+ *
+ * 判题进程 fork 后直接 exec 用户程序时，内核记录的内存峰值（ru_maxrss）包含
+ * fork 出的判题进程副本的内存。本程序体积很小，由它 fork 并 exec 用户程序，
+ * wait4 得到的 ru_maxrss 只反映用户程序本身。
+ *
+ * 资源限制和 cgroup 也由本程序在子进程 exec 之前设置，判题进程启动本程序时不需要 preexec_fn
+ * （判题进程并行评测时多个线程同时创建子进程，preexec_fn 在 fork 出的子进程中运行 Python 代码不安全）：
+ *     cgroup.procs 路径  子进程写入自己的 pid 加入 cgroup，"-" 表示不使用 cgroup
+ *     资源限制          "<资源编号>:<软限制>:<硬限制>,..."，"-" 表示不设置；
+ *                       RLIMIT_NPROC 按用户统计进程数，本程序自身的 fork 不能受其限制，因此都只设置给子进程
+ *
+ * 用户程序结束后向报告 fd（通常是管道）写入:
+ *     "<maxrss KB> <用户态时间 us> <内核态时间 us>\n"
+ * 子进程加入 cgroup 或设置资源限制失败时不运行用户程序，先写入 "E <errno>\n"。
+ * 报告 fd 设置了 FD_CLOEXEC，不会被用户程序继承。
+ * 退出状态与用户程序一致，用户程序被信号结束时本程序以同一信号结束。
+ */
+#include <errno.h>
+#include <fcntl.h>
+#include <signal.h>
+#include <stdio.h>
+#include <stdlib.h>
+#include <string.h>
+#include <sys/prctl.h>
+#include <sys/resource.h>
+#include <sys/time.h>
+#include <sys/wait.h>
+#include <unistd.h>
+
+static long to_us(struct timeval tv)
+{
+    return tv.tv_sec * 1000000L + tv.tv_usec;
+}
+
+static int join_cgroup(const char *procs)
+{
+    int fd = open(procs, O_WRONLY);
+    if (fd < 0)
+        return -1;
+    int ok = dprintf(fd, "%d\n", (int)getpid()) > 0;
+    int saved = errno;
+    close(fd);
+    errno = saved;
+    return ok ? 0 : -1;
+}
+
+static int set_limits(char *spec)
+{
+    char *save = NULL;
+    for (char *item = strtok_r(spec, ",", &save); item; item = strtok_r(NULL, ",", &save)) {
+        char *end;
+        int resource = (int)strtol(item, &end, 10);
+        if (*end != ':')
+            goto invalid;
+        long long soft = strtoll(end + 1, &end, 10);
+        if (*end != ':')
+            goto invalid;
+        long long hard = strtoll(end + 1, &end, 10);
+        if (*end != '\0')
+            goto invalid;
+        /* RLIM_INFINITY 以 -1 传入 */
+        struct rlimit limit = {(rlim_t)soft, (rlim_t)hard};
+        if (setrlimit(resource, &limit) < 0)
+            return -1;
+    }
+    return 0;
+invalid:
+    errno = EINVAL;
+    return -1;
+}
+
+int main(int argc, char **argv)
+{
+    if (argc < 5) {
+        fprintf(stderr, "usage: %s REPORT_FD CGROUP_PROCS LIMITS PROG [ARGS...]\n", argv[0]);
+        return 127;
+    }
+
+    int report_fd = (int)strtol(argv[1], NULL, 10);
+    fcntl(report_fd, F_SETFD, FD_CLOEXEC);
+
+    pid_t parent = getpid();
+    pid_t pid = fork();
+    if (pid < 0) {
+        perror("fork");
+        return 127;
+    }
+
+    if (pid == 0) {
+        /* 本程序被结束（如超时）时，用户程序随之结束 */
+        prctl(PR_SET_PDEATHSIG, SIGKILL);
+        if (getppid() != parent)
+            _exit(127);
+        if ((strcmp(argv[2], "-") != 0 && join_cgroup(argv[2]) < 0) ||
+                (strcmp(argv[3], "-") != 0 && set_limits(argv[3]) < 0)) {
+            dprintf(report_fd, "E %d\n", errno);
+            _exit(127);
+        }
+        execv(argv[4], argv + 4);
+        perror(argv[4]);
+        _exit(127);
+    }
+
+    int status;
+    struct rusage usage;
+    while (wait4(pid, &status, 0, &usage) < 0) {
+        if (errno != EINTR) {
+            perror("wait4");
+            return 127;
+        }
+    }
+
+    dprintf(report_fd, "%ld %ld %ld\n",
+            usage.ru_maxrss, to_us(usage.ru_utime), to_us(usage.ru_stime));
+    close(report_fd);
+
+    if (WIFSIGNALED(status)) {
+        int sig = WTERMSIG(status);
+        struct rlimit no_core = {0, 0};
+        setrlimit(RLIMIT_CORE, &no_core);
+        signal(sig, SIG_DFL);
+        kill(getpid(), sig);
+    }
+    return WIFEXITED(status) ? WEXITSTATUS(status) : 127;
+}
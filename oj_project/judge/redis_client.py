@@ -0,0 +1,72 @@
+"""
+Redis 连接
+
+判题进程和 Web 进程通过 Redis 交换实时数据（评测状态推送等），
+与 Celery broker 使用同一个 Redis（settings.REDIS_URL）。
+"""
+
+import os
+import threading
+import redis
+import redis.asyncio
+from django.conf import settings
+
+_client = None
+_client_pid = None
+_client_lock = threading.Lock()
+
+
+def _reset_lock():
+    # 判题 worker 主进程中有后台线程（dispatcher.BackendHeartbeat），fork 时锁可能正被持有
+    global _client_lock
+    _client_lock = threading.Lock()
+
+
+os.register_at_fork(after_in_child=_reset_lock)
+
+
+def _redis_url():
+    return getattr(settings, 'REDIS_URL', None) or settings.CELERY_BROKER_URL
+
+
+def get_redis():
+    """
+    获取当前进程共享的 Redis 客户端（内部带连接池，线程安全）
+
+    Celery prefork 子进程不能复用父进程的连接，按 pid 重新创建。
+    """
+    global _client, _client_pid
+
+    with _client_lock:
+        if _client is None or _client_pid != os.getpid():
+            _client = redis.Redis.from_url(
+                _redis_url(),
+                decode_responses=True,
+                socket_connect_timeout=2,
+                socket_timeout=2,
+            )
+            _client_pid = os.getpid()
+        return _client
+
+
+def create_async_redis():
+    """
+    创建 asyncio Redis 客户端（用于 ASGI 视图，调用方负责 aclose）
+
+    asyncio 客户端绑定到创建它的事件循环，因此不在进程内共享。
+    """
+    return redis.asyncio.Redis.from_url(_redis_url(), decode_responses=True)
+
+
+def create_listener_redis():
+    """
+    创建长时间订阅 pub/sub 用的 Redis 客户端（调用方负责 close）
+
+    订阅连接大部分时间在等待消息，不能设置读超时；用心跳检测断开的连接。
+    """
+    return redis.Redis.from_url(
+        _redis_url(),
+        decode_responses=True,
+        socket_connect_timeout=2,
+        health_check_interval=30,
+    )
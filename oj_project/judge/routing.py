@@ -0,0 +1,78 @@
+"""
+判题任务路由
+
+判题任务按「任务类型 + 语言」发送到不同的 Celery 队列，每个队列由专门的 worker 消费：
+编译较慢的 C++ 评测不会阻塞 Python 评测，批量重判也不会阻塞用户的交互式提交。
+
+队列和优先级在 settings.OJ_SETTINGS 中配置：
+    JUDGE_QUEUES      {任务类型: 队列名 或 {语言: 队列名}}
+    JUDGE_PRIORITIES  {任务类型: 优先级}（Redis broker 中 0 最高，9 最低）
+
+未配置的任务类型或语言发送到 Celery 默认队列。
+判题后端（traditional / docker / judge0）由 dispatcher 按后端状态选择。
+
+目前只有用户提交（judge）和重判（rejudge）两种任务类型。自定义运行（不评测、只返回运行输出）不在此范围内：
+项目中还没有这个功能，需要时增加任务类型，在 JUDGE_QUEUES 中为它配置单独的队列即可。
+"""
+
+from django.conf import settings
+
+# 任务类型
+KIND_JUDGE = 'judge'  # 用户提交
+KIND_REJUDGE = 'rejudge'  # 重判
+
+
+def _oj_settings():
+    return getattr(settings, 'OJ_SETTINGS', {})
+
+
+def judge_queue(language, kind=KIND_JUDGE):
+    """
+    判题任务的队列
+
+    Args:
+        language: 提交语言（Submission.language）
+        kind: 任务类型
+
+    Returns:
+        str | None: 队列名，None 表示 Celery 默认队列
+    """
+    route = _oj_settings().get('JUDGE_QUEUES', {}).get(kind)
+    if isinstance(route, dict):
+        return route.get(language)
+    return route
+
+
+def judge_priority(kind=KIND_JUDGE):
+    """判题任务的优先级，未配置时返回 None"""
+    return _oj_settings().get('JUDGE_PRIORITIES', {}).get(kind)
+
+
+def enqueue_judge(submission, kind=KIND_JUDGE, priority=None, backend=None, failed_backends=None):
+    """
+    把提交发送到对应的判题队列
+
+    Args:
+        submission: 提交记录
+        kind: 任务类型
+        priority: 优先级，默认按 JUDGE_PRIORITIES
+        backend: 判题后端（dispatcher.JudgeBackend），默认由 dispatcher 按后端状态和队列长度选择
+        failed_backends: 已经失败过的后端名称（故障转交时传给任务）
+
+    Returns:
+        celery.result.AsyncResult
+    """
+    from .dispatcher import choose_backend
+
+    queue = judge_queue(submission.language, kind)
+    if backend is None:
+        backend = choose_backend(queue=queue or getattr(settings, 'CELERY_TASK_DEFAULT_QUEUE', 'celery'))
+    options = {}
+    if queue:
+        options['queue'] = queue
+    if priority is None:
+        priority = judge_priority(kind)
+    if priority is not None:
+        options['priority'] = priority
+    kwargs = {'failed_backends': failed_backends} if failed_backends else {}
+    return backend.task.apply_async(args=[submission.id], kwargs=kwargs, **options)
@@ -0,0 +1,335 @@
+"""
+测试用例执行调度
+
+负责运行单个测试用例的子进程，并按顺序或并行方式调度一次提交的全部测试用例。
+
+并行模式下测试用例被分发到一个以 CPU 核数为上限的线程池中，每个线程负责一个子进程；
+汇总结果时仍按 `order` 取第一个失败的测试用例，保证与顺序评测的结果一致。
+一旦某个测试用例失败，排在它之后、仍在运行或等待中的测试用例会被取消。
+"""
+
+import contextlib
+import os
+import selectors
+import subprocess
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+from django.conf import settings
+
+# 标准错误最多保留的字节数
+STDERR_LIMIT = 65536
+
+# preexec_fn 在 fork 出的子进程中运行 Python 代码，并行评测的多个线程同时创建子进程时不安全，
+# 使用 preexec_fn 的子进程逐个创建（通过 oj-measure 启动的程序不使用 preexec_fn，见 measure.py）
+_preexec_lock = threading.Lock()
+
+
+class CaseContext:
+    """
+    单个测试用例的运行上下文
+
+    记录该测试用例启动的子进程，调度器取消测试用例时会杀掉这些进程。
+    """
+
+    def __init__(self):
+        self.cancelled = False
+        self._processes = []
+        self._lock = threading.Lock()
+
+    def attach(self, process):
+        """登记子进程；如果测试用例已被取消，立即杀掉"""
+        with self._lock:
+            self._processes.append(process)
+            cancelled = self.cancelled
+        if cancelled:
+            _kill_quietly(process)
+
+    def cancel(self):
+        """取消测试用例，杀掉所有已登记的子进程"""
+        with self._lock:
+            self.cancelled = True
+            processes = list(self._processes)
+        for process in processes:
+            _kill_quietly(process)
+
+
+def _kill_quietly(process):
+    try:
+        process.kill()
+    except Exception:
+        pass
+
+
+class RusagePopen(subprocess.Popen):
+    """
+    回收子进程时通过 wait4 记录资源使用的 Popen
+
+    rusage 为 {'utime', 'stime', 'maxrss'}（秒、秒、KB），未能取得时为 None
+    （例如子进程在 kill() 内部的 poll() 中被回收）。
+    """
+
+    rusage = None
+
+    def _try_wait(self, wait_flags):
+        try:
+            pid, status, usage = os.wait4(self.pid, wait_flags)
+        except ChildProcessError:
+            return super()._try_wait(wait_flags)
+        if pid == self.pid:
+            self.rusage = {
+                'utime': usage.ru_utime,
+                'stime': usage.ru_stime,
+                'maxrss': usage.ru_maxrss,
+            }
+        return pid, status
+
+
+def run_program(cmd, input_data, timeout, context, checker=None, **popen_kwargs):
+    """
+    运行程序并收集输出（输出格式与 subprocess.run(capture_output=True, text=True) 一致）
+
+    Args:
+        cmd: 命令
+        input_data: 标准输入，字符串或已打开的文件（直接作为子进程的标准输入）
+        timeout: 超时时间（秒）
+        context: CaseContext，用于登记子进程以便取消
+        checker: OutputChecker，指定时边读取边比对标准输出，不一致或超长时结束程序
+        **popen_kwargs: 传给 subprocess.Popen 的其他参数（env、cwd、preexec_fn 等）
+
+    Returns:
+        subprocess.CompletedProcess，附带 rusage 属性（见 RusagePopen）
+
+    Raises:
+        subprocess.TimeoutExpired: 运行超时
+    """
+    stdin_file = input_data if hasattr(input_data, 'fileno') else None
+    with _preexec_lock if popen_kwargs.get('preexec_fn') else contextlib.nullcontext():
+        process = RusagePopen(
+            cmd,
+            stdin=stdin_file or subprocess.PIPE,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.PIPE,
+            **popen_kwargs
+        )
+    context.attach(process)
+    with process:
+        stdout, stderr = communicate(process, None if stdin_file else input_data, timeout, checker)
+    completed = subprocess.CompletedProcess(cmd, process.returncode, stdout, stderr)
+    completed.rusage = process.rusage
+    return completed
+
+
+def communicate(process, input_data, timeout, checker=None):
+    """
+    向进程写入标准输入并读取输出
+
+    标准错误只保留前 STDERR_LIMIT 字节；指定 checker 时标准输出交给 checker 逐块比对，
+    比对失败或输出超长时立即结束进程。
+
+    Args:
+        process: 具有 stdin/stdout/stderr（二进制管道）、wait(timeout)、kill() 的进程对象，
+            标准输入不是管道时 stdin 为 None
+        input_data: 标准输入（字符串）
+        timeout: 超时时间（秒）
+        checker: OutputChecker（可选）
+
+    Returns:
+        tuple: (stdout, stderr)，与 subprocess 的文本模式一致（UTF-8 解码、统一换行符）；
+            指定 checker 时 stdout 为 checker 已读取的输出
+
+    Raises:
+        subprocess.TimeoutExpired: 运行超时
+    """
+    deadline = time.monotonic() + timeout
+    input_bytes = (input_data or '').encode('utf-8')
+    input_offset = 0
+    chunks = {process.stdout: [], process.stderr: []}
+    stderr_size = 0
+    stopped = False
+
+    with selectors.DefaultSelector() as selector:
+        if input_bytes and process.stdin is not None:
+            os.set_blocking(process.stdin.fileno(), False)
+            selector.register(process.stdin, selectors.EVENT_WRITE)
+        elif process.stdin is not None:
+            process.stdin.close()
+        selector.register(process.stdout, selectors.EVENT_READ)
+        selector.register(process.stderr, selectors.EVENT_READ)
+
+        while selector.get_map() and not stopped:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                process.kill()
+                process.wait()
+                raise subprocess.TimeoutExpired(getattr(process, 'args', None), timeout)
+
+            for key, _ in selector.select(remaining):
+                stream = key.fileobj
+                if stream is process.stdin:
+                    try:
+                        input_offset += os.write(stream.fileno(), input_bytes[input_offset:input_offset + 65536])
+                    except BrokenPipeError:
+                        input_offset = len(input_bytes)
+                    if input_offset >= len(input_bytes):
+                        selector.unregister(stream)
+                        stream.close()
+                    continue
+
+                data = os.read(stream.fileno(), 65536)
+                if not data:
+                    selector.unregister(stream)
+                elif stream is process.stderr:
+                    if stderr_size < STDERR_LIMIT:
+                        chunks[stream].append(data[:STDERR_LIMIT - stderr_size])
+                        stderr_size += len(data)
+                elif checker is None:
+                    chunks[stream].append(data)
+                elif not checker.feed(data):
+                    # 已经可以判定结果，不必等程序结束
+                    process.kill()
+                    stopped = True
+                    break
+
+    try:
+        process.wait(max(deadline - time.monotonic(), 0.001))
+    except subprocess.TimeoutExpired:
+        process.kill()
+        process.wait()
+        raise subprocess.TimeoutExpired(getattr(process, 'args', None), timeout)
+
+    stdout = checker.output() if checker is not None else _decode_output(b''.join(chunks[process.stdout]))
+    return stdout, _decode_output(b''.join(chunks[process.stderr]))
+
+
+def _decode_output(data):
+    return data.decode('utf-8', errors='replace').replace('\r\n', '\n').replace('\r', '\n')
+
+
+def get_parallel_workers(case_count):
+    """
+    计算并行评测使用的线程数
+
+    Returns:
+        int: 线程数，1 表示顺序评测
+    """
+    oj_settings = getattr(settings, 'OJ_SETTINGS', {})
+    if not oj_settings.get('JUDGE_PARALLEL_CASES', False):
+        return 1
+    max_workers = oj_settings.get('JUDGE_PARALLEL_WORKERS') or os.cpu_count() or 1
+    return max(1, min(max_workers, case_count))
+
+
+def run_test_cases(test_cases, run_case, on_result=None):
+    """
+    运行全部测试用例并汇总结果
+
+    Args:
+        test_cases: 按 order 排序的测试用例
+        run_case: 回调 run_case(test_case, context)，返回单个测试用例的结果字典
+            {'status', 'error_info', 'time_used', 'memory_used'}，
+            通过时 status 为 'Accepted'
+        on_result: 回调 on_result(下标, 结果字典, 测试用例总数)，每个测试用例完成时
+            在调度线程中调用（被取消的测试用例不调用）
+
+    Returns:
+        dict: 与顺序评测一致的最终结果
+    """
+    test_cases = list(test_cases)
+    workers = get_parallel_workers(len(test_cases))
+
+    def report(index, result):
+        if on_result is not None:
+            on_result(index, result, len(test_cases))
+
+    if workers == 1:
+        results = _run_sequential(test_cases, run_case, report)
+    else:
+        results = _run_parallel(test_cases, run_case, workers, report)
+
+    return _summarize(results, len(test_cases))
+
+
+def _run_case_safely(test_case, run_case, context):
+    try:
+        return run_case(test_case, context)
+    except Exception as e:
+        return {
+            'status': 'System Error',
+            'error_info': str(e),
+            'time_used': 0,
+            'memory_used': 0,
+        }
+
+
+def _run_sequential(test_cases, run_case, report):
+    results = {}
+    for index, test_case in enumerate(test_cases):
+        result = _run_case_safely(test_case, run_case, CaseContext())
+        results[index] = result
+        report(index, result)
+        if result['status'] != 'Accepted':
+            break
+    return results
+
+
+def _run_parallel(test_cases, run_case, workers, report):
+    results = {}
+    contexts = [CaseContext() for _ in test_cases]
+    # 当前已知的第一个失败测试用例的下标
+    first_failure = len(test_cases)
+
+    with ThreadPoolExecutor(max_workers=workers, thread_name_prefix='judge-case') as executor:
+        pending = {
+            executor.submit(_run_case_safely, test_case, run_case, contexts[index]): index
+            for index, test_case in enumerate(test_cases)
+        }
+
+        while pending:
+            done, _ = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                index = pending.pop(future)
+                if future.cancelled() or contexts[index].cancelled:
+                    continue
+
+                result = future.result()
+                results[index] = result
+                report(index, result)
+                if result['status'] == 'Accepted' or index >= first_failure:
+                    continue
+
+                # 更早的测试用例失败：取消排在它之后的测试用例
+                first_failure = index
+                for other_future, other_index in list(pending.items()):
+                    if other_index > index:
+                        other_future.cancel()
+                        contexts[other_index].cancel()
+
+    return {index: result for index, result in results.items() if index <= first_failure}
+
+
+def _summarize(results, total_cases):
+    max_time = 0
+    max_memory = 0
+
+    for index in sorted(results):
+        result = results[index]
+        if result['status'] != 'Accepted':
+            return {
+                'status': result['status'],
+                'error_info': result.get('error_info', ''),
+                'time_used': result.get('time_used', 0),
+                'memory_used': result.get('memory_used', 0),
+                'score': 0 if result['status'] == 'System Error' else int(index / total_cases * 100)
+            }
+        max_time = max(max_time, result.get('time_used', 0))
+        max_memory = max(max_memory, result.get('memory_used', 0))
+
+    # 所有测试用例通过
+    return {
+        'status': 'Accepted',
+        'error_info': '',
+        'time_used': max_time,
+        'memory_used': max_memory,
+        'score': 100
+    }
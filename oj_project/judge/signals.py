@@ -0,0 +1,15 @@
+"""
+判题相关的信号处理
+"""
+
+from django.db import transaction
+from django.db.models.signals import post_save
+from django.dispatch import receiver
+from oj_project.problems.models import Submission
+from .events import publish_status
+
+
+@receiver(post_save, sender=Submission)
+def publish_submission_status(sender, instance, **kwargs):
+    """提交记录保存后推送最新状态（事务提交后发布，订阅方不会先于数据库看到新状态）"""
+    transaction.on_commit(lambda: publish_status(instance))
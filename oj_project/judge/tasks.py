@@ -12,17 +12,33 @@
 将此文件内容替换 tasks.py 以启用安全加固
 """
 
+import functools
+import math
 import os
 import subprocess
 import tempfile
 import time
 import resource
 import re
+import logging
 from celery import shared_task
 from django.conf import settings
+from django.db import transaction
+from oj_project.problems.counters import record_accepted
 from oj_project.problems.models import Submission, TestCase
+from oj_project.problems.progress import record_verdict
+from oj_project.problems.testdata import open_case_data
 from .audit import log_submission_event, log_security_incident, log_resource_usage
+from .cgroup import run_cgroup
+from .compare import OutputChecker
+from .compile_cache import CompileCache, get_toolchain_version, make_key
+from .events import case_progress
+from .measure import Measurement, get_measure_helper
+from .runner import run_program, run_test_cases
+from .verdict_cache import finish_cached, get_verdict, put_verdict, verdict_key
+from .zygote import ZygoteError, get_zygote_pool
 
+logger = logging.getLogger(__name__)
 
 # 安全配置
 MAX_CODE_LENGTH = 10000  # 代码最大长度（字符）
@@ -84,37 +100,206 @@ def check_code_security(code, language):
     return True, ''
 
 
-def set_resource_limits():
+# C++编译配置
+CPP_COMPILER = '/usr/bin/g++'  # 使用完整路径
+CPP_COMPILE_FLAGS = [
+    '-std=c++17',
+    '-O2',
+    '-Wall',  # 显示警告
+    '-static',  # 静态链接
+    '-DONLINE_JUDGE',  # 定义在线评测宏
+]
+
+
+# 子进程资源限制：(resource 名称, 软限制, 硬限制)
+# CPU 时间和内存限制按题目设置，见 resource_limits
+RESOURCE_LIMITS = [
+    ('RLIMIT_CPU', 5, 5),  # 限制CPU时间为5秒
+    ('RLIMIT_NPROC', 10, 10),  # 限制最大进程数
+    ('RLIMIT_FSIZE', 10 * 1024 * 1024, 10 * 1024 * 1024),  # 限制文件大小为10MB
+    ('RLIMIT_NOFILE', 20, 20),  # 限制打开文件数
+]
+
+# 回退到 RLIMIT_AS 时地址空间上限为题目内存限制的倍数：
+# 运行时预留的虚拟内存不计入，是否超限以实际内存峰值（ru_maxrss）判定
+RLIMIT_AS_FACTOR = 2
+
+# 墙钟时间上限 = 题目时间限制 × JUDGE_WALL_TIME_FACTOR + WALL_TIME_SLACK 秒
+# 只用于结束睡眠或阻塞的程序，是否超时以 CPU 时间判定
+WALL_TIME_SLACK = 1.0
+
+# Python 解释器及其运行环境
+PYTHON_EXECUTABLE = '/usr/local/bin/python'  # 使用完整路径
+PYTHON_ENV = {'PATH': '/usr/local/bin:/usr/bin:/bin'}  # 保留最小PATH
+PYTHON_CWD = '/tmp'  # 设置工作目录
+
+
+def resource_limits(memory_limit_kb, time_limit_ms, cgroup=None):
+    """
+    计算一次运行的资源限制
+    
+    内存优先由 cgroup 的 memory.max 限制（只计算实际使用的内存）；
+    cgroup 不可用时回退到按题目内存限制设置地址空间上限（RLIMIT_AS），
+    此时是否超限由 memory_exceeded 根据内存峰值判定。
+    
+    RLIMIT_CPU 比题目时间限制多留 1 秒，只用于结束死循环的程序，是否超时由 cpu_time_used 判定。
+    
+    Args:
+        memory_limit_kb: 题目内存限制（KB）
+        time_limit_ms: 题目时间限制（毫秒）
+        cgroup: RunCgroup 或 None
+    
+    Returns:
+        list: [(resource 名称, 软限制, 硬限制), ...]
+    """
+    cpu_seconds = math.ceil(time_limit_ms / 1000) + 1
+    limits = [limit for limit in RESOURCE_LIMITS if limit[0] != 'RLIMIT_CPU']
+    limits.append(('RLIMIT_CPU', cpu_seconds, cpu_seconds + 1))
+    if cgroup is None:
+        address_space = memory_limit_kb * 1024 * RLIMIT_AS_FACTOR
+        limits.append(('RLIMIT_AS', address_space, address_space))
+    return limits
+
+
+def wall_time_limit(time_limit_ms):
+    """
+    墙钟时间上限（秒）
+    
+    判题进程负载高时程序的墙钟时间会变长，因此只把墙钟时间作为结束睡眠或阻塞程序的兜底。
+    """
+    factor = getattr(settings, 'OJ_SETTINGS', {}).get('JUDGE_WALL_TIME_FACTOR', 3)
+    return time_limit_ms / 1000.0 * factor + WALL_TIME_SLACK
+
+
+def cpu_time_used(process, cgroup=None, elapsed=None, time_limit_ms=None):
+    """
+    一次运行的 CPU 时间（毫秒，用户态 + 内核态）
+    
+    优先使用 cgroup 的 cpu.stat，否则使用 wait4 返回的 rusage；
+    两者都取不到时（如 oj-measure 在报告前被结束）回退到墙钟时间 elapsed（秒），
+    墙钟时间包含等待时间，不超过题目时间限制 time_limit_ms（不据此判定超时）。
+    """
+    if cgroup is not None:
+        cpu_time = cgroup.cpu_time_ms()
+        if cpu_time is not None:
+            return cpu_time
+    rusage = getattr(process, 'rusage', None)
+    if rusage:
+        return int((rusage['utime'] + rusage['stime']) * 1000)
+    wall_time = int((elapsed or 0) * 1000)
+    return wall_time if time_limit_ms is None else min(wall_time, time_limit_ms)
+
+
+def timed_out_usage(time_limit_ms, cgroup=None):
     """
-    设置子进程的资源限制
+    超过墙钟时间上限被结束的运行的 (CPU 时间, 内存峰值)
+
+    oj-measure 随程序一起被结束，没有 rusage：有 cgroup 时使用 cpu.stat 和 memory.peak，
+    否则 CPU 时间记为题目时间限制。
+    """
+    cpu_time = cgroup.cpu_time_ms() if cgroup is not None else None
+    return (time_limit_ms if cpu_time is None else cpu_time), memory_usage(None, cgroup)
+
+
+def set_resource_limits(limits=None, cgroup=None):
+    """
+    设置子进程的资源限制（在子进程 exec 之前调用）
     在Unix系统上生效
+    
+    Args:
+        limits: resource_limits 的返回值，默认为 RESOURCE_LIMITS
+        cgroup: RunCgroup，指定时先加入该 cgroup（失败时抛出异常，不运行程序）
     """
+    if cgroup is not None:
+        cgroup.join()
     try:
-        # 限制CPU时间为5秒
-        resource.setrlimit(resource.RLIMIT_CPU, (5, 5))
-        
-        # 限制内存为256MB
-        mem_bytes = 256 * 1024 * 1024
-        resource.setrlimit(resource.RLIMIT_AS, (mem_bytes, mem_bytes))
-        
-        # 限制最大进程数
-        resource.setrlimit(resource.RLIMIT_NPROC, (10, 10))
-        
-        # 限制文件大小为10MB
-        file_bytes = 10 * 1024 * 1024
-        resource.setrlimit(resource.RLIMIT_FSIZE, (file_bytes, file_bytes))
-        
-        # 限制打开文件数
-        resource.setrlimit(resource.RLIMIT_NOFILE, (20, 20))
+        for name, soft, hard in (limits or RESOURCE_LIMITS):
+            resource.setrlimit(getattr(resource, name), (soft, hard))
     except Exception as e:
         # Windows系统不支持resource模块，静默忽略
         pass
 
 
+def memory_usage(process, cgroup=None):
+    """
+    一次运行的内存峰值（KB）
+    
+    优先使用 cgroup 的 memory.peak，否则使用 wait4 返回的 ru_maxrss。
+    """
+    if cgroup is not None:
+        peak = cgroup.peak_kb()
+        if peak is not None:
+            return peak
+    rusage = getattr(process, 'rusage', None)
+    return int(rusage['maxrss']) if rusage else 0
+
+
+def memory_exceeded(memory_used, memory_limit_kb, cgroup=None):
+    """是否内存超限：cgroup 记录到 OOM kill，或峰值超过题目限制"""
+    if cgroup is not None and cgroup.oom_killed():
+        return True
+    return memory_used > memory_limit_kb
+
+
+def run_limited(cmd, input_data, timeout, context, checker, memory_limit_kb, time_limit_ms, cgroup=None, **popen_kwargs):
+    """
+    在资源限制下运行用户程序
+    
+    通过 oj-measure 启动程序，rusage 只包含用户程序本身，资源限制和 cgroup 由 oj-measure 设置；
+    oj-measure 不可用时回退到判题进程的 wait4 结果（包含 fork 出的判题进程副本），
+    资源限制由 preexec_fn 设置（runner 逐个创建使用 preexec_fn 的子进程）。
+    
+    Args:
+        cmd: 命令（程序须为完整路径）
+        input_data: 标准输入，字符串或已打开的文件
+        timeout: 墙钟超时时间（秒）
+        context: CaseContext
+        checker: OutputChecker
+        memory_limit_kb: 题目内存限制（KB）
+        time_limit_ms: 题目时间限制（毫秒），用于设置 RLIMIT_CPU
+        cgroup: RunCgroup 或 None
+        **popen_kwargs: 传给 run_program 的其他参数（env、cwd）
+    
+    Returns:
+        subprocess.CompletedProcess，附带 rusage 属性；
+        oj-measure 在报告前被结束（如输出比对失败时提前结束）时 rusage 为 None，见 cpu_time_used
+    
+    Raises:
+        subprocess.TimeoutExpired: 运行超时（没有 rusage，见 timed_out_usage）
+    """
+    limits = resource_limits(memory_limit_kb, time_limit_ms, cgroup)
+    helper = get_measure_helper(CPP_COMPILER)
+    if helper is None:
+        return run_program(
+            cmd, input_data, timeout, context,
+            checker=checker,
+            preexec_fn=functools.partial(set_resource_limits, limits, cgroup),
+            **popen_kwargs
+        )
+    
+    # 资源限制和 cgroup 由 oj-measure 设置，不使用 preexec_fn（并行评测时多个线程同时创建子进程）
+    measurement = Measurement(helper, cmd, limits, cgroup)
+    try:
+        process = run_program(
+            measurement.cmd, input_data, timeout, context,
+            checker=checker,
+            pass_fds=measurement.pass_fds,
+            **popen_kwargs
+        )
+        process.rusage = measurement.finish()
+        return process
+    finally:
+        measurement.close()
+
+
 @shared_task
-def judge_submission(submission_id):
+def judge_submission(submission_id, failed_backends=None):
     """
     评测代码提交（安全加固版）
+
+    Args:
+        submission_id: 提交记录ID
+        failed_backends: 已经失败过的判题后端（由 dispatcher.fail_over 传入）
     """
     try:
         submission = Submission.objects.get(id=submission_id)
@@ -142,14 +327,17 @@ def judge_submission(submission_id):
             
             submission.status = 'Compile Error'
             submission.error_info = f'安全检查失败: {error_msg}'
-            submission.save()
+            with transaction.atomic():
+                submission.save()
+                record_verdict(submission)
             
             log_submission_event(submission, 'security_check_failed', {'reason': error_msg})
             return {'error': error_msg}
         
         # 获取题目的测试用例
         problem = submission.problem
-        test_cases = problem.test_cases.all().order_by('order')
+        # 测试数据从文件读取（见 problems/testdata.py），不加载大文本字段
+        test_cases = problem.test_cases.all().order_by('order').defer('input_data', 'output_data')
         
         if not test_cases.exists():
             submission.status = 'System Error'
@@ -157,6 +345,12 @@ def judge_submission(submission_id):
             submission.save()
             return {'error': 'No test cases'}
         
+        # 相同的代码在未变化的测试数据上评测过，直接复用结果
+        cache_key = verdict_key(submission, 'traditional')
+        cached = get_verdict(cache_key)
+        if cached is not None:
+            return finish_cached(submission, cached, 'completed')
+        
         # 根据语言选择评测方法
         if submission.language == 'Python':
             result = judge_python_secure(submission, test_cases)
@@ -174,7 +368,10 @@ def judge_submission(submission_id):
         submission.time_used = result.get('time_used', 0)
         submission.memory_used = result.get('memory_used', 0)
         submission.error_info = result.get('error_info', '')
-        submission.save()
+        with transaction.atomic():
+            submission.save()
+            record_verdict(submission)
+        put_verdict(cache_key, result)
         
         # 记录资源使用
         log_resource_usage(
@@ -195,10 +392,9 @@ def judge_submission(submission_id):
             }
         )
         
-        # 如果通过，更新题目统计
+        # 如果通过，更新题目和用户的通过数
         if submission.status == 'Accepted':
-            problem.total_accepted += 1
-            problem.save()
+            record_accepted(submission)
         
         return result
         
@@ -220,111 +416,206 @@ def judge_python_secure(submission, test_cases):
     problem = submission.problem
     code = submission.code
     
-    total_cases = test_cases.count()
-    passed_cases = 0
-    max_time = 0
+    # 创建临时文件保存代码
+    with tempfile.NamedTemporaryFile(mode='w', suffix='.py', delete=False) as f:
+        f.write(code)
+        code_file = f.name
     
-    for test_case in test_cases:
-        try:
-            # 创建临时文件保存代码
-            with tempfile.NamedTemporaryFile(mode='w', suffix='.py', delete=False) as f:
-                f.write(code)
-                code_file = f.name
-            
+    # 优先使用预热解释器池，不可用时回退到冷启动解释器
+    zygote_pool = get_zygote_pool(PYTHON_EXECUTABLE, PYTHON_ENV, PYTHON_CWD)
+    
+    wall_timeout = wall_time_limit(problem.time_limit)
+    
+    def execute(input_file, context, checker, cgroup):
+        limits = resource_limits(problem.memory_limit, problem.time_limit, cgroup)
+        if zygote_pool is not None:
             try:
-                # 运行代码（增加安全限制）
-                start_time = time.time()
-                process = subprocess.run(
-                    ['/usr/local/bin/python', code_file],  # 使用完整路径
-                    input=test_case.input_data,
-                    capture_output=True,
-                    text=True,
-                    timeout=problem.time_limit / 1000.0,
-                    check=False,
-                    env={'PATH': '/usr/local/bin:/usr/bin:/bin'},  # 保留最小PATH
-                    cwd='/tmp',  # 设置工作目录
-                    preexec_fn=set_resource_limits  # 设置资源限制
+                process, elapsed = zygote_pool.run(
+                    code_file,
+                    input_file,
+                    wall_timeout,
+                    context,
+                    cwd=PYTHON_CWD,
+                    limits=limits,
+                    checker=checker,
+                    cgroup=cgroup
                 )
-                end_time = time.time()
-                
-                execution_time = int((end_time - start_time) * 1000)
-                max_time = max(max_time, execution_time)
-                
-                # 检查输出长度
-                if len(process.stdout) > MAX_OUTPUT_LENGTH:
-                    return {
-                        'status': 'Runtime Error',
-                        'error_info': '输出长度超过限制',
-                        'time_used': execution_time,
-                        'memory_used': 0,
-                        'score': int(passed_cases / total_cases * 100)
-                    }
-                
-                # 检查是否有运行时错误
-                if process.returncode != 0:
-                    # 检查是否是资源限制导致的错误
-                    if process.returncode == -9:  # SIGKILL
-                        return {
-                            'status': 'Memory Limit Exceeded',
-                            'error_info': '内存超出限制',
-                            'time_used': execution_time,
-                            'memory_used': 0,
-                            'score': int(passed_cases / total_cases * 100)
-                        }
-                    
-                    return {
-                        'status': 'Runtime Error',
-                        'error_info': process.stderr[:500],
-                        'time_used': execution_time,
-                        'memory_used': 0,
-                        'score': int(passed_cases / total_cases * 100)
-                    }
-                
-                # 比对输出
-                output = process.stdout.strip()
-                expected = test_case.output_data.strip()
-                
-                if output == expected:
-                    passed_cases += 1
-                else:
-                    return {
-                        'status': 'Wrong Answer',
-                        'error_info': f'测试用例 #{test_case.order}\n期望输出:\n{expected}\n实际输出:\n{output}',
-                        'time_used': execution_time,
-                        'memory_used': 0,
-                        'score': int(passed_cases / total_cases * 100)
-                    }
-                    
-            except subprocess.TimeoutExpired:
-                return {
-                    'status': 'Time Limit Exceeded',
-                    'error_info': f'运行超时 (>{problem.time_limit}ms)',
-                    'time_used': problem.time_limit,
-                    'memory_used': 0,
-                    'score': int(passed_cases / total_cases * 100)
-                }
-            finally:
-                # 删除临时文件
-                if os.path.exists(code_file):
-                    os.remove(code_file)
-                    
-        except Exception as e:
+                return process, elapsed
+            except ZygoteError as e:
+                logger.warning(f"zygote 运行失败，回退到冷启动解释器: {e}")
+        
+        start_time = time.time()
+        process = run_limited(
+            [PYTHON_EXECUTABLE, code_file],
+            input_file,
+            wall_timeout,
+            context,
+            checker,
+            problem.memory_limit,
+            problem.time_limit,
+            cgroup,  # 设置资源限制
+            env=PYTHON_ENV,
+            cwd=PYTHON_CWD
+        )
+        return process, time.time() - start_time
+    
+    def run_case(test_case, context):
+        with open_case_data(test_case) as (input_file, expected_output), \
+                run_cgroup(problem.memory_limit) as cgroup:
+            return check_case(test_case, context, input_file, expected_output, cgroup)
+    
+    def check_case(test_case, context, input_file, expected_output, cgroup):
+        # 边运行边比对输出：出现不一致或输出超长时立即结束程序
+        checker = OutputChecker(expected_output, 'strict', MAX_OUTPUT_LENGTH)
+        try:
+            # 运行代码（增加安全限制）
+            process, elapsed = execute(input_file, context, checker, cgroup)
+        except subprocess.TimeoutExpired:
+            time_used, memory_used = timed_out_usage(problem.time_limit, cgroup)
             return {
-                'status': 'System Error',
-                'error_info': str(e),
+                'status': 'Time Limit Exceeded',
+                'error_info': f'运行超时 (墙钟时间 >{int(wall_timeout * 1000)}ms)',
+                'time_used': time_used,
+                'memory_used': memory_used
+            }
+        
+        # 以 CPU 时间判定是否超时，不受判题机负载影响
+        execution_time = cpu_time_used(process, cgroup, elapsed, problem.time_limit)
+        memory_used = memory_usage(process, cgroup)
+        
+        if execution_time > problem.time_limit:
+            return {
+                'status': 'Time Limit Exceeded',
+                'error_info': f'运行超时 (>{problem.time_limit}ms)',
+                'time_used': execution_time,
+                'memory_used': memory_used
+            }
+        
+        # 检查输出长度
+        if checker.overflow:
+            return {
+                'status': 'Runtime Error',
+                'error_info': '输出长度超过限制',
+                'time_used': execution_time,
+                'memory_used': memory_used
+            }
+        
+        # 检查内存（cgroup 的 OOM 记录或内存峰值，而不是根据 SIGKILL 推断）
+        if memory_exceeded(memory_used, problem.memory_limit, cgroup):
+            return {
+                'status': 'Memory Limit Exceeded',
+                'error_info': '内存超出限制',
+                'time_used': execution_time,
+                'memory_used': memory_used
+            }
+        
+        # 检查是否有运行时错误（输出不一致时程序已被提前结束）
+        if process.returncode != 0 and not checker.mismatch:
+            return {
+                'status': 'Runtime Error',
+                'error_info': process.stderr[:500] or f'程序异常退出 (退出码: {process.returncode})',
+                'time_used': execution_time,
+                'memory_used': memory_used
+            }
+        
+        # 比对输出
+        if not checker.finish():
+            output = process.stdout.strip()
+            expected = checker.expected_text(MAX_OUTPUT_LENGTH)
+            return {
+                'status': 'Wrong Answer',
+                'error_info': f'测试用例 #{test_case.order}\n期望输出:\n{expected}\n实际输出:\n{output}',
+                'time_used': execution_time,
+                'memory_used': memory_used
+            }
+        
+        return {
+            'status': 'Accepted',
+            'error_info': '',
+            'time_used': execution_time,
+            'memory_used': memory_used
+        }
+    
+    try:
+        return run_test_cases(test_cases, run_case, case_progress(submission.id))
+    finally:
+        # 删除临时文件
+        if os.path.exists(code_file):
+            os.remove(code_file)
+
+
+def compile_cpp(code, temp_dir, executable_file):
+    """
+    编译 C++ 代码（带编译缓存）
+    
+    相同的源代码、编译参数和编译器版本只会真正编译一次，
+    编译成功的可执行文件和编译错误都会被缓存。
+    
+    Args:
+        code: 源代码
+        temp_dir: 本次评测的临时目录
+        executable_file: 可执行文件输出路径
+    
+    Returns:
+        dict | None: 编译失败时返回评测结果，成功时返回 None
+    """
+    cache = CompileCache()
+    key = make_key(code, CPP_COMPILE_FLAGS, get_toolchain_version(CPP_COMPILER))
+    
+    cached = cache.get(key)
+    if cached is not None:
+        if cached['status'] == 'error':
+            return {
+                'status': 'Compile Error',
+                'error_info': cached['error_info'],
                 'time_used': 0,
                 'memory_used': 0,
                 'score': 0
             }
+        if cache.checkout(key, executable_file):
+            return None
+    
+    # 保存源代码
+    source_file = os.path.join(temp_dir, 'solution.cpp')
+    with open(source_file, 'w', encoding='utf-8') as f:
+        f.write(code)
     
-    # 所有测试用例通过
-    return {
-        'status': 'Accepted',
-        'error_info': '',
-        'time_used': max_time,
-        'memory_used': 0,
-        'score': 100
-    }
+    # 编译（添加安全选项）
+    # 使用相对路径，编译错误信息中不会出现临时目录名，缓存的错误信息对所有提交都一致
+    compile_cmd = [CPP_COMPILER, '-o', executable_file, 'solution.cpp'] + CPP_COMPILE_FLAGS
+    
+    try:
+        compile_result = subprocess.run(
+            compile_cmd,
+            capture_output=True,
+            text=True,
+            timeout=10,
+            check=False,
+            cwd=temp_dir
+        )
+    except subprocess.TimeoutExpired:
+        # 编译超时可能是机器繁忙导致的，不写入缓存
+        return {
+            'status': 'Compile Error',
+            'error_info': '编译超时',
+            'time_used': 0,
+            'memory_used': 0,
+            'score': 0
+        }
+    
+    if compile_result.returncode != 0:
+        error_info = compile_result.stderr[:500]
+        cache.put_error(key, error_info)
+        return {
+            'status': 'Compile Error',
+            'error_info': error_info,
+            'time_used': 0,
+            'memory_used': 0,
+            'score': 0
+        }
+    
+    cache.put_binary(key, executable_file)
+    return None
 
 
 def judge_cpp_secure(submission, test_cases):
@@ -334,147 +625,109 @@ def judge_cpp_secure(submission, test_cases):
     problem = submission.problem
     code = submission.code
     
-    total_cases = test_cases.count()
-    passed_cases = 0
-    max_time = 0
-    
     # 创建临时目录
     temp_dir = tempfile.mkdtemp()
     
     try:
-        # 保存源代码
-        source_file = os.path.join(temp_dir, 'solution.cpp')
-        with open(source_file, 'w', encoding='utf-8') as f:
-            f.write(code)
-        
-        # 编译（添加安全选项）
         executable_file = os.path.join(temp_dir, 'solution')
-        compile_cmd = [
-            '/usr/bin/g++',  # 使用完整路径
-            '-o', executable_file,
-            source_file,
-            '-std=c++17',
-            '-O2',
-            '-Wall',  # 显示警告
-            '-static',  # 静态链接
-            '-DONLINE_JUDGE',  # 定义在线评测宏
-        ]
+        compile_error = compile_cpp(code, temp_dir, executable_file)
+        if compile_error is not None:
+            return compile_error
         
-        try:
-            compile_result = subprocess.run(
-                compile_cmd,
-                capture_output=True,
-                text=True,
-                timeout=10,
-                check=False,
-                cwd=temp_dir
-            )
-            
-            if compile_result.returncode != 0:
-                return {
-                    'status': 'Compile Error',
-                    'error_info': compile_result.stderr[:500],
-                    'time_used': 0,
-                    'memory_used': 0,
-                    'score': 0
-                }
-        except subprocess.TimeoutExpired:
-            return {
-                'status': 'Compile Error',
-                'error_info': '编译超时',
-                'time_used': 0,
-                'memory_used': 0,
-                'score': 0
-            }
+        wall_timeout = wall_time_limit(problem.time_limit)
         
-        # 运行测试用例（增加安全限制）
-        for test_case in test_cases:
+        def run_case(test_case, context):
+            with open_case_data(test_case) as (input_file, expected_output), \
+                    run_cgroup(problem.memory_limit) as cgroup:
+                return check_case(test_case, context, input_file, expected_output, cgroup)
+        
+        def check_case(test_case, context, input_file, expected_output, cgroup):
+            # 边运行边比对输出（忽略行尾空白）：出现不一致或输出超长时立即结束程序
+            checker = OutputChecker(expected_output, 'lines', MAX_OUTPUT_LENGTH)
+            
+            # 运行测试用例（增加安全限制）
             try:
                 start_time = time.time()
-                process = subprocess.run(
+                process = run_limited(
                     [executable_file],
-                    input=test_case.input_data,
-                    capture_output=True,
-                    text=True,
-                    timeout=problem.time_limit / 1000.0,
-                    check=False,
+                    input_file,
+                    wall_timeout,
+                    context,
+                    checker,
+                    problem.memory_limit,
+                    problem.time_limit,
+                    cgroup,  # 设置资源限制
                     env={},  # 清空环境变量
-                    cwd=temp_dir,
-                    preexec_fn=set_resource_limits  # 设置资源限制
+                    cwd=temp_dir
                 )
                 end_time = time.time()
-                
-                execution_time = int((end_time - start_time) * 1000)
-                max_time = max(max_time, execution_time)
-                
-                # 检查输出长度
-                if len(process.stdout) > MAX_OUTPUT_LENGTH:
-                    return {
-                        'status': 'Runtime Error',
-                        'error_info': '输出长度超过限制',
-                        'time_used': execution_time,
-                        'memory_used': 0,
-                        'score': int(passed_cases / total_cases * 100)
-                    }
-                
-                # 检查是否有运行时错误
-                if process.returncode != 0:
-                    if process.returncode == -9:
-                        return {
-                            'status': 'Memory Limit Exceeded',
-                            'error_info': '内存超出限制',
-                            'time_used': execution_time,
-                            'memory_used': 0,
-                            'score': int(passed_cases / total_cases * 100)
-                        }
-                    
-                    return {
-                        'status': 'Runtime Error',
-                        'error_info': f'程序异常退出 (退出码: {process.returncode})\n{process.stderr[:300]}',
-                        'time_used': execution_time,
-                        'memory_used': 0,
-                        'score': int(passed_cases / total_cases * 100)
-                    }
-                
-                # 比对输出
-                output = process.stdout.strip()
-                expected = test_case.output_data.strip()
-                
-                if output == expected:
-                    passed_cases += 1
-                else:
-                    # 检查是否只是行尾空格不同
-                    output_lines = [line.rstrip() for line in output.split('\n')]
-                    expected_lines = [line.rstrip() for line in expected.split('\n')]
-                    
-                    if output_lines == expected_lines:
-                        passed_cases += 1
-                    else:
-                        return {
-                            'status': 'Wrong Answer',
-                            'error_info': f'测试用例 #{test_case.order}\n期望输出:\n{expected}\n\n实际输出:\n{output}',
-                            'time_used': execution_time,
-                            'memory_used': 0,
-                            'score': int(passed_cases / total_cases * 100)
-                        }
-                        
             except subprocess.TimeoutExpired:
+                time_used, memory_used = timed_out_usage(problem.time_limit, cgroup)
+                return {
+                    'status': 'Time Limit Exceeded',
+                    'error_info': f'运行超时 (墙钟时间 >{int(wall_timeout * 1000)}ms)',
+                    'time_used': time_used,
+                    'memory_used': memory_used
+                }
+            
+            # 以 CPU 时间判定是否超时，不受判题机负载影响
+            execution_time = cpu_time_used(process, cgroup, end_time - start_time, problem.time_limit)
+            memory_used = memory_usage(process, cgroup)
+            
+            if execution_time > problem.time_limit:
                 return {
                     'status': 'Time Limit Exceeded',
                     'error_info': f'运行超时 (>{problem.time_limit}ms)',
-                    'time_used': problem.time_limit,
-                    'memory_used': 0,
-                    'score': int(passed_cases / total_cases * 100)
+                    'time_used': execution_time,
+                    'memory_used': memory_used
                 }
+            
+            # 检查输出长度
+            if checker.overflow:
+                return {
+                    'status': 'Runtime Error',
+                    'error_info': '输出长度超过限制',
+                    'time_used': execution_time,
+                    'memory_used': memory_used
+                }
+            
+            # 检查内存（cgroup 的 OOM 记录或内存峰值，而不是根据 SIGKILL 推断）
+            if memory_exceeded(memory_used, problem.memory_limit, cgroup):
+                return {
+                    'status': 'Memory Limit Exceeded',
+                    'error_info': '内存超出限制',
+                    'time_used': execution_time,
+                    'memory_used': memory_used
+                }
+            
+            # 检查是否有运行时错误（输出不一致时程序已被提前结束）
+            if process.returncode != 0 and not checker.mismatch:
+                return {
+                    'status': 'Runtime Error',
+                    'error_info': f'程序异常退出 (退出码: {process.returncode})\n{process.stderr[:300]}',
+                    'time_used': execution_time,
+                    'memory_used': memory_used
+                }
+            
+            # 比对输出（行尾空白不同视为一致）
+            if not checker.finish():
+                output = process.stdout.strip()
+                expected = checker.expected_text(MAX_OUTPUT_LENGTH)
+                return {
+                    'status': 'Wrong Answer',
+                    'error_info': f'测试用例 #{test_case.order}\n期望输出:\n{expected}\n\n实际输出:\n{output}',
+                    'time_used': execution_time,
+                    'memory_used': memory_used
+                }
+            
+            return {
+                'status': 'Accepted',
+                'error_info': '',
+                'time_used': execution_time,
+                'memory_used': memory_used
+            }
         
-        # 所有测试用例通过
-        return {
-            'status': 'Accepted',
-            'error_info': '',
-            'time_used': max_time,
-            'memory_used': 0,
-            'score': 100
-        }
+        return run_test_cases(test_cases, run_case, case_progress(submission.id))
         
     except Exception as e:
         return {
@@ -491,4 +744,3 @@ def judge_cpp_secure(submission, test_cases):
             shutil.rmtree(temp_dir)
         except:
             pass
-
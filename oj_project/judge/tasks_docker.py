@@ -4,21 +4,29 @@ Docker容器化判题任务
 使用Docker容器进行安全隔离的代码评测
 """
 
+import socket
 import time
 from celery import shared_task
 from django.conf import settings
+from django.db import transaction
+from oj_project.problems.counters import record_accepted
 from oj_project.problems.models import Submission, TestCase
+from oj_project.problems.progress import record_verdict
 from .audit import log_submission_event, log_security_incident, log_resource_usage
+from .dispatcher import fail_over
 from .docker_judge import DockerJudge
+from .container_pool import pool_enabled
+from .verdict_cache import finish_cached, get_verdict, put_verdict, verdict_key
 
 
 @shared_task
-def judge_submission_docker(submission_id):
+def judge_submission_docker(submission_id, failed_backends=None):
     """
     使用Docker容器判题（安全加固版）
     
     Args:
         submission_id: 提交记录ID
+        failed_backends: 已经失败过的判题后端（由 dispatcher.fail_over 传入）
     """
     try:
         submission = Submission.objects.get(id=submission_id)
@@ -37,10 +45,13 @@ def judge_submission_docker(submission_id):
         try:
             judge = DockerJudge()
         except RuntimeError as e:
+            log_submission_event(submission, 'docker_init_error', {'error': str(e)})
+            # Docker 不可用时转交给其他判题后端
+            if fail_over(submission, 'docker', failed_backends):
+                return {'error': str(e), 'failed_over': True}
             submission.status = 'System Error'
             submission.error_info = f'Docker引擎初始化失败: {str(e)}'
             submission.save()
-            log_submission_event(submission, 'docker_init_error', {'error': str(e)})
             return {'error': str(e)}
         
         # 获取题目的测试用例
@@ -53,6 +64,12 @@ def judge_submission_docker(submission_id):
             submission.save()
             return {'error': 'No test cases'}
         
+        # 相同的代码在未变化的测试数据上评测过，直接复用结果
+        cache_key = verdict_key(submission, 'docker')
+        cached = get_verdict(cache_key)
+        if cached is not None:
+            return finish_cached(submission, cached, 'completed_docker', {'judge_method': 'docker'})
+        
         # 根据语言选择评测方法
         if submission.language == 'Python':
             result = judge_python_docker(judge, submission, test_cases)
@@ -70,7 +87,10 @@ def judge_submission_docker(submission_id):
         submission.time_used = result.get('time_used', 0)
         submission.memory_used = result.get('memory_used', 0)
         submission.error_info = result.get('error_info', '')
-        submission.save()
+        with transaction.atomic():
+            submission.save()
+            record_verdict(submission)
+        put_verdict(cache_key, result)
         
         # 记录资源使用
         log_resource_usage(
@@ -92,10 +112,9 @@ def judge_submission_docker(submission_id):
             }
         )
         
-        # 如果通过，更新题目统计
+        # 如果通过，更新题目和用户的通过数
         if submission.status == 'Accepted':
-            problem.total_accepted += 1
-            problem.save()
+            record_accepted(submission)
         
         return result
         
@@ -110,6 +129,11 @@ def judge_submission_docker(submission_id):
         return {'error': str(e)}
 
 
+def memory_limit_mb(problem):
+    """题目内存限制（Problem.memory_limit 以KB为单位）换算为MB"""
+    return max(problem.memory_limit // 1024, 1)
+
+
 def judge_python_docker(judge, submission, test_cases):
     """
     使用Docker容器评测Python代码
@@ -125,6 +149,46 @@ def judge_python_docker(judge, submission, test_cases):
     problem = submission.problem
     code = submission.code
     
+    if not pool_enabled():
+        # 每个测试用例使用一个一次性容器
+        return check_python_cases(problem, test_cases, lambda test_input: judge.judge_python(
+            code=code,
+            test_input=test_input,
+            time_limit_ms=problem.time_limit,
+            memory_limit_mb=memory_limit_mb(problem)
+        ))
+    
+    # 从容器池借出一个容器，全部测试用例在同一个沙箱中运行
+    try:
+        with judge.sandbox('Python', memory_limit_mb(problem)) as session:
+            session.write_file('/judge/solution.py', code)
+            return check_python_cases(problem, test_cases, lambda test_input: session.run(
+                ['python3', '/judge/solution.py'],
+                test_input,
+                problem.time_limit
+            ))
+    except Exception as e:
+        return {
+            'status': 'System Error',
+            'error_info': f'Docker执行错误: {str(e)}',
+            'time_used': 0,
+            'memory_used': 0,
+            'score': 0
+        }
+
+
+def check_python_cases(problem, test_cases, run):
+    """
+    逐个运行Python测试用例并比对输出
+    
+    Args:
+        problem: 题目
+        test_cases: 测试用例列表
+        run: 回调 run(test_input)，返回 DockerJudge.judge_python 格式的结果
+    
+    Returns:
+        dict: 评测结果
+    """
     total_cases = test_cases.count()
     passed_cases = 0
     max_time = 0
@@ -133,12 +197,7 @@ def judge_python_docker(judge, submission, test_cases):
     for test_case in test_cases:
         try:
             # 使用Docker容器执行
-            result = judge.judge_python(
-                code=code,
-                test_input=test_case.input_data,
-                time_limit_ms=problem.time_limit,
-                memory_limit_mb=problem.memory_limit
-            )
+            result = run(test_case.input_data)
             
             # 更新最大资源使用
             max_time = max(max_time, result.get('time_ms', 0))
@@ -154,6 +213,15 @@ def judge_python_docker(judge, submission, test_cases):
                     'score': int(passed_cases / total_cases * 100)
                 }
             
+            if result['status'] == 'Memory Limit Exceeded':
+                return {
+                    'status': 'Memory Limit Exceeded',
+                    'error_info': f"测试用例 #{test_case.order}\n{result.get('error', '')}",
+                    'time_used': max_time,
+                    'memory_used': max_memory,
+                    'score': int(passed_cases / total_cases * 100)
+                }
+            
             if result['status'] == 'Time Limit Exceeded':
                 return {
                     'status': 'Time Limit Exceeded',
@@ -212,37 +280,104 @@ def judge_cpp_docker(judge, submission, test_cases):
     problem = submission.problem
     code = submission.code
     
-    total_cases = test_cases.count()
-    passed_cases = 0
-    max_time = 0
-    max_memory = 0
+    if pool_enabled():
+        return judge_cpp_pooled(judge, submission, test_cases)
     
-    # 首先编译检查（使用第一个测试用例的空输入）
-    first_result = judge.judge_cpp(
-        code=code,
-        test_input='',
-        time_limit_ms=10000,  # 编译给10秒
-        memory_limit_mb=512  # 编译需要更多内存
-    )
+    # 只编译一次，产物以只读方式挂载到每个测试用例的运行容器中
+    compile_result = judge.compile_cpp(code)
     
-    if first_result['status'] == 'Compile Error':
+    if compile_result['status'] == 'Compile Error':
         return {
             'status': 'Compile Error',
-            'error_info': first_result.get('error', ''),
+            'error_info': compile_result.get('error', ''),
             'time_used': 0,
             'memory_used': 0,
             'score': 0
         }
     
+    artifact = compile_result['artifact']
+    try:
+        return check_cpp_cases(problem, test_cases, lambda test_input: judge.run_cpp(
+            artifact=artifact,
+            test_input=test_input,
+            time_limit_ms=problem.time_limit,
+            memory_limit_mb=memory_limit_mb(problem)
+        ))
+    finally:
+        judge.remove_artifact(artifact)
+
+
+def judge_cpp_pooled(judge, submission, test_cases):
+    """
+    在池化容器中评测C++代码：同一个沙箱内编译一次，再运行全部测试用例
+    
+    编译时间不计入运行时间。
+    """
+    problem = submission.problem
+    
+    try:
+        with judge.sandbox('C++', 512) as session:  # 编译需要更多内存
+            session.write_file('/judge/solution.cpp', submission.code)
+            try:
+                exit_code, _, compile_output = session.execute(
+                    ['g++', '-o', '/judge/solution', '/judge/solution.cpp', '-std=c++17', '-O2', '-Wall'],
+                    timeout=10  # 编译给10秒
+                )
+            except socket.timeout:
+                return {
+                    'status': 'Compile Error',
+                    'error_info': '编译超时',
+                    'time_used': 0,
+                    'memory_used': 0,
+                    'score': 0
+                }
+            
+            if exit_code != 0:
+                return {
+                    'status': 'Compile Error',
+                    'error_info': compile_output.decode('utf-8', errors='replace')[:500],
+                    'time_used': 0,
+                    'memory_used': 0,
+                    'score': 0
+                }
+            
+            session.set_memory_limit(memory_limit_mb(problem))
+            return check_cpp_cases(problem, test_cases, lambda test_input: session.run(
+                ['/judge/solution'],
+                test_input,
+                problem.time_limit
+            ))
+    except Exception as e:
+        return {
+            'status': 'System Error',
+            'error_info': f'Docker执行错误: {str(e)}',
+            'time_used': 0,
+            'memory_used': 0,
+            'score': 0
+        }
+
+
+def check_cpp_cases(problem, test_cases, run):
+    """
+    逐个运行C++测试用例并比对输出
+    
+    Args:
+        problem: 题目
+        test_cases: 测试用例列表
+        run: 回调 run(test_input)，返回 DockerJudge.judge_cpp 格式的结果
+    
+    Returns:
+        dict: 评测结果
+    """
+    total_cases = test_cases.count()
+    passed_cases = 0
+    max_time = 0
+    max_memory = 0
+    
     # 逐个测试用例运行
     for test_case in test_cases:
         try:
-            result = judge.judge_cpp(
-                code=code,
-                test_input=test_case.input_data,
-                time_limit_ms=problem.time_limit,
-                memory_limit_mb=problem.memory_limit
-            )
+            result = run(test_case.input_data)
             
             max_time = max(max_time, result.get('time_ms', 0))
             max_memory = max(max_memory, result.get('memory_kb', 0))
@@ -265,6 +400,15 @@ def judge_cpp_docker(judge, submission, test_cases):
                     'score': int(passed_cases / total_cases * 100)
                 }
             
+            if result['status'] == 'Memory Limit Exceeded':
+                return {
+                    'status': 'Memory Limit Exceeded',
+                    'error_info': f"测试用例 #{test_case.order}\n{result.get('error', '')}",
+                    'time_used': max_time,
+                    'memory_used': max_memory,
+                    'score': int(passed_cases / total_cases * 100)
+                }
+            
             if result['status'] == 'Time Limit Exceeded':
                 return {
                     'status': 'Time Limit Exceeded',
@@ -1,22 +1,124 @@
 """
 基于 Judge0 的判题任务
+
+配置了 JUDGE0_CALLBACK_URL 时，提交到 Judge0 后任务立即返回，
+Judge0 评测完每个测试用例后回调 judge:judge0_callback，结果到齐后汇总到提交记录；
+sweep_judge0_results 定期轮询迟迟没有回调的测试用例，作为回调丢失时的兜底。
+未配置回调地址时在任务中轮询等待结果。
 """
+from datetime import timedelta
 from celery import shared_task
+from django.conf import settings
+from django.core.signing import Signer
+from django.db import transaction
+from django.urls import reverse
 from django.utils import timezone
+from django.utils.crypto import constant_time_compare
+from .dispatcher import fail_over
+from .events import publish
 from .judge0_client import Judge0Client
+from .models import Judge0CaseResult
+from .verdict_cache import finish_cached, get_verdict, pop_key, put_verdict, remember_key, verdict_key
+from oj_project.problems.counters import record_accepted
 from oj_project.problems.models import Submission
+from oj_project.problems.progress import record_verdict
 import logging
 
 logger = logging.getLogger(__name__)
 
+CALLBACK_SALT = 'oj_project.judge.judge0_callback'
+
+
+def callback_signature(submission_id, case_index):
+    """计算回调地址中的签名，防止伪造回调"""
+    return Signer(salt=CALLBACK_SALT).signature(f'{submission_id}:{case_index}')
+
+
+def verify_callback_signature(submission_id, case_index, signature):
+    return constant_time_compare(callback_signature(submission_id, case_index), signature)
+
+
+def callback_enabled():
+    return bool(settings.OJ_SETTINGS.get('JUDGE0_CALLBACK_URL', ''))
+
+
+def get_callback_url(submission_id, case_index):
+    """
+    获取测试用例的回调地址
+
+    回调地址中带有测试用例序号，回调可能在 token 保存之前到达，按序号定位结果记录。
+    """
+    base_url = settings.OJ_SETTINGS.get('JUDGE0_CALLBACK_URL', '')
+    path = reverse(
+        'judge:judge0_callback',
+        args=[submission_id, case_index, callback_signature(submission_id, case_index)]
+    )
+    return base_url.rstrip('/') + path
+
+
+def summarize_results(results):
+    """
+    按测试用例顺序汇总结果，取第一个失败的测试用例作为最终结果
+    
+    Args:
+        results: 按测试用例顺序排列的结果列表，尚未返回的测试用例为 None
+    
+    Returns:
+        dict | None: 最终结果；排在第一个失败用例之前的测试用例还有未返回的，返回 None
+    """
+    total_time = 0
+    max_memory = 0
+    
+    for i, result in enumerate(results):
+        if result is None:
+            return None
+        
+        total_time += result['time_used']
+        max_memory = max(max_memory, result['memory_used'])
+        
+        if result['status'] != 'Accepted':
+            error_msg = f"测试用例 #{i+1} 失败\n"
+            error_msg += f"状态: {result['status']}\n"
+            if result['error_info']:
+                error_msg += f"详细信息:\n{result['error_info']}\n"
+            return {
+                'status': result['status'],
+                'score': 0 if result['status'] == 'System Error' else int(i / len(results) * 100),
+                'error_info': error_msg,
+                'time_used': int(total_time),
+                'memory_used': int(max_memory),
+            }
+    
+    return {
+        'status': 'Accepted',
+        'score': 100,
+        'error_info': '',
+        'time_used': int(total_time),
+        'memory_used': int(max_memory),
+    }
+
+
+def save_result(submission, result):
+    submission.status = result['status']
+    submission.score = result['score']
+    submission.error_info = result['error_info']
+    submission.time_used = result['time_used']
+    submission.memory_used = result['memory_used']
+    with transaction.atomic():
+        submission.save()
+        record_verdict(submission)
+    if submission.status == 'Accepted':
+        record_accepted(submission)
+
 
 @shared_task(bind=True, max_retries=3)
-def judge_submission_judge0(self, submission_id):
+def judge_submission_judge0(self, submission_id, failed_backends=None):
     """
     使用 Judge0 进行代码判题的 Celery 任务
     
     Args:
         submission_id: 提交记录的 ID
+        failed_backends: 已经失败过的判题后端（由 dispatcher.fail_over 传入）
     """
     try:
         submission = Submission.objects.get(id=submission_id)
@@ -29,92 +131,66 @@ def judge_submission_judge0(self, submission_id):
         submission.status = 'Judging'
         submission.save(update_fields=['status'])
         
-        # 获取测试用例
-        test_cases = submission.problem.test_cases.all()
+        # 获取测试用例（按 order 排序，结果按同样的顺序汇总）
+        test_cases = list(submission.problem.test_cases.all().order_by('order', 'id'))
         if not test_cases:
             submission.status = 'System Error'
             submission.error_info = '没有可用的测试用例'
             submission.save()
             return
         
+        # 相同的代码在未变化的测试数据上评测过，直接复用结果
+        cache_key = verdict_key(submission, 'judge0')
+        cached = get_verdict(cache_key)
+        if cached is not None:
+            finish_cached(submission, cached, 'completed_judge0', {'judge_method': 'judge0'})
+            return
+        
         # 初始化 Judge0 客户端
         judge0 = Judge0Client()
         
-        # 记录开始时间
-        start_time = timezone.now()
-        
-        total_time = 0
-        max_memory = 0
-        all_passed = True
-        error_messages = []
+        # 计算时间和内存限制
+        time_limit = submission.problem.time_limit / 1000.0  # 转换为秒
+        memory_limit = submission.problem.memory_limit  # KB
+        cases = [(test_case.input_data, test_case.output_data.strip()) for test_case in test_cases]
         
-        # 逐个运行测试用例
-        for i, test_case in enumerate(test_cases):
-            try:
-                # 计算时间和内存限制
-                time_limit = submission.problem.time_limit / 1000.0  # 转换为秒
-                memory_limit = submission.problem.memory_limit * 1024  # 转换为 KB
-                
-                # 使用 Judge0 判题
-                result = judge0.judge_code(
-                    language=submission.language,
-                    source_code=submission.code,
-                    stdin=test_case.input_data,
-                    expected_output=test_case.expected_output.strip(),
-                    cpu_time_limit=time_limit,
-                    memory_limit=memory_limit
+        if callback_enabled():
+            # 回调模式：提交后立即返回，结果由回调写入
+            payloads = [
+                judge0.build_payload(
+                    submission.language, submission.code, stdin, expected_output,
+                    time_limit, memory_limit, callback_url=get_callback_url(submission_id, i)
                 )
-                
-                # 累计时间和内存
-                total_time += result['time_used']
-                max_memory = max(max_memory, result['memory_used'])
-                
-                # 检查状态
-                if result['status'] != 'Accepted':
-                    all_passed = False
-                    error_msg = f"测试用例 #{i+1} 失败\n"
-                    error_msg += f"状态: {result['status']}\n"
-                    if result['error_info']:
-                        error_msg += f"详细信息:\n{result['error_info']}\n"
-                    error_messages.append(error_msg)
-                    
-                    # 如果是编译错误或系统错误，直接终止
-                    if result['status'] in ['Compilation Error', 'System Error']:
-                        break
-            
-            except Exception as e:
-                logger.error(f"测试用例 #{i+1} 执行失败: {str(e)}")
-                all_passed = False
-                error_messages.append(f"测试用例 #{i+1} 系统错误: {str(e)}")
-                break
+                for i, (stdin, expected_output) in enumerate(cases)
+            ]
+            # 先创建结果记录（任务重试时替换上一次的记录），再提交
+            Judge0CaseResult.objects.filter(submission=submission).delete()
+            rows = Judge0CaseResult.objects.bulk_create([
+                Judge0CaseResult(submission=submission, case_index=i)
+                for i in range(len(cases))
+            ])
+            remember_key(submission_id, cache_key)
+            tokens = judge0.submit_batch(payloads)
+            for row, token in zip(rows, tokens):
+                row.token = token
+            Judge0CaseResult.objects.bulk_update(rows, ['token'])
+            logger.info(f"提交 {submission_id} 已提交到 Judge0（{len(tokens)} 个测试用例），等待回调")
+            return
         
-        # 更新提交结果
-        if all_passed:
-            submission.status = 'Accepted'
-            submission.error_info = ''
-        else:
-            # 确定最终状态
-            if error_messages:
-                first_error = error_messages[0]
-                if 'Compilation Error' in first_error:
-                    submission.status = 'Compilation Error'
-                elif 'Runtime Error' in first_error:
-                    submission.status = 'Runtime Error'
-                elif 'Time Limit Exceeded' in first_error:
-                    submission.status = 'Time Limit Exceeded'
-                elif 'Wrong Answer' in first_error:
-                    submission.status = 'Wrong Answer'
-                else:
-                    submission.status = 'System Error'
-            else:
-                submission.status = 'System Error'
-            
-            submission.error_info = '\n\n'.join(error_messages)
+        # 记录开始时间
+        start_time = timezone.now()
         
-        submission.time_used = int(total_time)
-        submission.memory_used = int(max_memory)
-        submission.judged_at = timezone.now()
-        submission.save()
+        # 全部测试用例一次批量提交，轮询等待结果
+        results = judge0.judge_batch(
+            language=submission.language,
+            source_code=submission.code,
+            cases=cases,
+            cpu_time_limit=time_limit,
+            memory_limit=memory_limit
+        )
+        result = summarize_results(results)
+        save_result(submission, result)
+        put_verdict(cache_key, result)
         
         # 记录判题时间
         judge_time = (timezone.now() - start_time).total_seconds()
@@ -129,11 +205,13 @@ def judge_submission_judge0(self, submission_id):
     
     except Exception as e:
         logger.error(f"判题任务失败: {str(e)}", exc_info=True)
+        # 重试耗尽后转交给其他判题后端
+        if self.request.retries >= self.max_retries and fail_over(submission, 'judge0', failed_backends):
+            return
         try:
             submission = Submission.objects.get(id=submission_id)
             submission.status = 'System Error'
             submission.error_info = f'判题系统错误: {str(e)}'
-            submission.judged_at = timezone.now()
             submission.save()
         except Exception:
             pass
@@ -141,3 +219,131 @@ def judge_submission_judge0(self, submission_id):
         # 重试任务
         raise self.retry(exc=e, countdown=5)
 
+
+def record_case_result(submission_id, case_index, result):
+    """
+    记录 Judge0 返回的单个测试用例结果（回调和兜底轮询共用）
+    
+    Args:
+        submission_id: 提交记录的 ID
+        case_index: 测试用例序号
+        result: Judge0 返回的提交结果
+    
+    Returns:
+        bool: 是否记录了新的结果（仍在排队、运行中或重复上报时为 False）
+    """
+    if result.get('status', {}).get('id') in [1, 2]:  # In Queue or Processing
+        return False
+    
+    parsed = Judge0Client.parse_result(result)
+    updated = Judge0CaseResult.objects.filter(
+        submission_id=submission_id,
+        case_index=case_index,
+        status=''
+    ).update(
+        status=parsed['status'],
+        time_used=parsed['time_used'],
+        memory_used=parsed['memory_used'],
+        error_info=parsed['error_info'],
+        finished_at=timezone.now()
+    )
+    if updated:
+        publish(submission_id, {
+            'type': 'case',
+            'status': 'Judging',
+            'case': case_index + 1,
+            'case_status': parsed['status'],
+        })
+    return updated > 0
+
+
+def finalize_submission_judge0(submission_id):
+    """
+    结果足以确定最终状态时汇总到提交记录
+    
+    第一个失败的测试用例之前的结果全部返回即可结束，不必等待后面的测试用例。
+    
+    Returns:
+        bool: 是否完成了汇总
+    """
+    with transaction.atomic():
+        try:
+            submission = Submission.objects.select_for_update().get(id=submission_id)
+        except Submission.DoesNotExist:
+            return False
+        
+        rows = list(Judge0CaseResult.objects.filter(submission_id=submission_id).order_by('case_index'))
+        if not rows:
+            return False
+        
+        result = summarize_results([
+            {
+                'status': row.status,
+                'time_used': row.time_used,
+                'memory_used': row.memory_used,
+                'error_info': row.error_info,
+            } if row.status else None
+            for row in rows
+        ])
+        if result is None:
+            return False
+        
+        if submission.status == 'Judging':
+            save_result(submission, result)
+            put_verdict(pop_key(submission_id), result)
+        # 之后到达的回调找不到记录，直接忽略
+        Judge0CaseResult.objects.filter(submission_id=submission_id).delete()
+    
+    logger.info(
+        f"提交 {submission_id} 判题完成 - "
+        f"状态: {submission.status}, "
+        f"用时: {submission.time_used}ms, "
+        f"内存: {submission.memory_used}KB"
+    )
+    return True
+
+
+@shared_task
+def sweep_judge0_results():
+    """
+    兜底轮询：查询超过 JUDGE0_CALLBACK_GRACE 秒仍未回调的测试用例，
+    超过 JUDGE0_RESULT_TIMEOUT 秒仍无结果的按系统错误处理
+    """
+    now = timezone.now()
+    grace = settings.OJ_SETTINGS.get('JUDGE0_CALLBACK_GRACE', 30)
+    result_timeout = settings.OJ_SETTINGS.get('JUDGE0_RESULT_TIMEOUT', 300)
+    
+    pending = list(
+        Judge0CaseResult.objects
+        .filter(status='', created_at__lt=now - timedelta(seconds=grace))
+        .values_list('id', 'submission_id', 'case_index', 'token', 'created_at')
+    )
+    if not pending:
+        return 0
+    
+    results = {}
+    tokens = [token for _, _, _, token, _ in pending if token]
+    if tokens:
+        try:
+            results = Judge0Client().get_submissions_batch(tokens)
+        except Exception as e:
+            logger.error(f"兜底轮询 Judge0 失败: {str(e)}")
+    
+    submission_ids = set()
+    for row_id, submission_id, case_index, token, created_at in pending:
+        result = results.get(token)
+        if result and record_case_result(submission_id, case_index, result):
+            submission_ids.add(submission_id)
+        elif created_at < now - timedelta(seconds=result_timeout):
+            Judge0CaseResult.objects.filter(id=row_id, status='').update(
+                status='System Error',
+                error_info='等待 Judge0 结果超时',
+                finished_at=now
+            )
+            submission_ids.add(submission_id)
+    
+    for submission_id in submission_ids:
+        finalize_submission_judge0(submission_id)
+    
+    logger.info(f"兜底轮询 Judge0：{len(pending)} 个待返回测试用例，{len(submission_ids)} 个提交有更新")
+    return len(submission_ids)
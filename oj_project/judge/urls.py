@@ -19,5 +19,15 @@ urlpatterns = [
     
     # 清理队列（仅管理员）
     path('clear-queue/', views.clear_judge_queue, name='clear_queue'),
+    
+    # 提交状态推送（Server-Sent Events，ASGI）
+    path('events/submissions/<int:submission_id>/', views.submission_events, name='submission_events'),
+    
+    # Judge0 评测完成回调（签名校验）
+    path(
+        'judge0/callback/<int:submission_id>/<int:case_index>/<str:signature>/',
+        views.judge0_callback,
+        name='judge0_callback'
+    ),
 ]
 
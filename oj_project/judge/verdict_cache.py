@@ -0,0 +1,163 @@
+"""
+评测结果复用
+
+用户原样重新提交的代码、以及测试数据没有变化的重判，评测结果与上一次相同。
+判题任务以「统一换行符后的代码 + 语言 + 测试数据版本（Problem.test_set_version）+ 时间和内存限制 + 判题后端」的哈希为键，
+把确定的评测结果保存在缓存（Django cache）中；命中时直接写入结果，不再编译和运行。
+
+只缓存结果稳定的状态（CACHEABLE_STATUSES），超时、内存超限和系统错误受判题机负载影响，总是重新评测。
+评测逻辑变化（如比对规则、编译参数）时修改 VERDICT_CACHE_VERSION，旧的结果随之失效。
+"""
+
+import hashlib
+import json
+import logging
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from oj_project.problems.counters import record_accepted
+from oj_project.problems.progress import record_verdict
+from .audit import log_submission_event
+
+logger = logging.getLogger(__name__)
+
+VERDICT_CACHE_VERSION = 2
+
+# 可以复用的评测结果
+CACHEABLE_STATUSES = ('Accepted', 'Wrong Answer', 'Compile Error', 'Runtime Error')
+
+# 评测结果的字段及缺省值
+RESULT_FIELDS = {'status': None, 'score': 0, 'time_used': 0, 'memory_used': 0, 'error_info': ''}
+
+
+def _cache_settings():
+    oj_settings = getattr(settings, 'OJ_SETTINGS', {})
+    return (
+        oj_settings.get('VERDICT_CACHE_ENABLED', True),
+        oj_settings.get('VERDICT_CACHE_TIMEOUT', 7 * 24 * 3600),
+    )
+
+
+def normalize_code(code):
+    """
+    统一换行符（\r\n、\r 改为 \n）
+
+    只做不改变程序含义的处理：行尾空白可能在多行字符串中、或影响续行符，不去掉。
+    """
+    return code.replace('\r\n', '\n').replace('\r', '\n')
+
+
+def verdict_key(submission, backend):
+    """
+    评测结果的缓存键
+
+    Args:
+        submission: 提交记录
+        backend: 判题后端名称（见 dispatcher.BACKENDS）
+
+    Returns:
+        str | None: 不能复用结果时返回 None
+    """
+    enabled, _ = _cache_settings()
+    problem = submission.problem
+    if not enabled or not problem.test_set_version:
+        return None
+    data = json.dumps([
+        VERDICT_CACHE_VERSION,
+        hashlib.sha256(normalize_code(submission.code).encode()).hexdigest(),
+        submission.language,
+        problem.test_set_version,
+        problem.time_limit,
+        problem.memory_limit,
+        backend,
+    ])
+    return f'verdict:{hashlib.sha256(data.encode()).hexdigest()}'
+
+
+def get_verdict(key):
+    """
+    读取缓存的评测结果
+
+    Returns:
+        dict | None: {status, score, time_used, memory_used, error_info}
+    """
+    if key is None:
+        return None
+    try:
+        return cache.get(key)
+    except Exception as e:
+        logger.warning(f"读取评测结果缓存失败: {e}")
+        return None
+
+
+def put_verdict(key, result):
+    """缓存评测结果（只缓存 CACHEABLE_STATUSES）"""
+    if key is None or result.get('status') not in CACHEABLE_STATUSES:
+        return
+    _, timeout = _cache_settings()
+    try:
+        cache.set(key, {name: result.get(name, default) for name, default in RESULT_FIELDS.items()}, timeout=timeout)
+    except Exception as e:
+        logger.warning(f"写入评测结果缓存失败: {e}")
+
+
+def remember_key(submission_id, key):
+    """
+    记录提交的缓存键，异步汇总结果时（Judge0 回调模式）用 pop_key 取回
+
+    结果按提交时的测试数据缓存，汇总前测试数据被修改也不会把旧数据上的结果记到新版本上。
+    """
+    if key is None:
+        return
+    _, timeout = _cache_settings()
+    try:
+        cache.set(f'verdict-key:{submission_id}', key, timeout=timeout)
+    except Exception as e:
+        logger.warning(f"记录评测结果缓存键失败 (submission={submission_id}): {e}")
+
+
+def pop_key(submission_id):
+    try:
+        key = cache.get(f'verdict-key:{submission_id}')
+        if key is not None:
+            cache.delete(f'verdict-key:{submission_id}')
+        return key
+    except Exception as e:
+        logger.warning(f"读取评测结果缓存键失败 (submission={submission_id}): {e}")
+        return None
+
+
+def finish_cached(submission, result, event_type, details=None):
+    """
+    用缓存的评测结果完成提交（与正常评测完成时相同：写入结果、更新做题状态和通过数、记录审计日志）
+
+    Args:
+        submission: 提交记录
+        result: get_verdict 的返回值
+        event_type: 审计事件类型（与该判题任务评测完成时相同）
+        details: 审计日志的其他信息
+
+    Returns:
+        dict: 评测结果
+    """
+    for name in RESULT_FIELDS:
+        setattr(submission, name, result[name])
+    with transaction.atomic():
+        submission.save()
+        record_verdict(submission)
+
+    log_submission_event(
+        submission,
+        event_type,
+        {
+            'status': submission.status,
+            'score': submission.score,
+            'time_used': submission.time_used,
+            'cached': True,
+            **(details or {})
+        }
+    )
+
+    if submission.status == 'Accepted':
+        record_accepted(submission)
+    return result
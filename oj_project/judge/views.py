@@ -2,13 +2,22 @@
 判题系统监控视图
 """
 
-from django.http import JsonResponse
+import asyncio
+import json
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.http import JsonResponse, HttpResponseNotAllowed, StreamingHttpResponse
+from django.views.decorators.csrf import csrf_exempt
 from django.views.decorators.http import require_http_methods
 from django.contrib.admin.views.decorators import staff_member_required
 from django.utils import timezone
 from datetime import timedelta
 from oj_project.problems.models import Submission
 from .audit import get_submission_statistics
+from .events import format_sse, is_final, status_event, submission_channel
+from .judge0_client import decode_callback
+from .redis_client import create_async_redis
+from .tasks_judge0 import verify_callback_signature, record_case_result, finalize_submission_judge0
 import platform
 
 
@@ -193,3 +202,102 @@ def clear_judge_queue(request):
             'success': False,
             'error': str(e)
         }, status=500)
+
+
+@csrf_exempt
+@require_http_methods(["PUT", "POST"])
+def judge0_callback(request, submission_id, case_index, signature):
+    """
+    Judge0 评测完成回调
+
+    记录单个测试用例的结果，结果足以确定最终状态时汇总到提交记录。
+    地址中带有签名，只接受由 get_callback_url 生成的地址。
+    """
+    if not verify_callback_signature(submission_id, case_index, signature):
+        return JsonResponse({'error': 'invalid signature'}, status=403)
+    
+    try:
+        result = decode_callback(json.loads(request.body))
+    except (ValueError, TypeError):
+        return JsonResponse({'error': 'invalid body'}, status=400)
+    
+    if record_case_result(submission_id, case_index, result):
+        finalize_submission_judge0(submission_id)
+    
+    return JsonResponse({'status': 'ok'})
+
+
+# 推送流空闲时发送注释行的间隔（秒），防止代理断开连接
+EVENTS_KEEPALIVE = 15
+
+
+def _can_view_submission(request, submission_id):
+    """当前用户能否查看提交（提交者本人或管理员），提交不存在时返回 None"""
+    user = request.user
+    submission = Submission.objects.filter(id=submission_id).only('user_id').first()
+    if submission is None:
+        return None
+    return user.is_authenticated and (user.is_staff or submission.user_id == user.id)
+
+
+async def submission_events(request, submission_id):
+    """
+    提交状态推送（Server-Sent Events）
+    
+    先推送提交的当前状态，之后推送判题进程发布的事件，评测结束后关闭；
+    连接超过 SUBMISSION_EVENTS_TIMEOUT 秒时关闭，由浏览器的 EventSource 自动重连。
+    
+    需要运行在 ASGI 服务器上（生产环境为 events 服务，见 docker-compose.prod.yml）。
+    """
+    if request.method != 'GET':
+        return HttpResponseNotAllowed(['GET'])
+    
+    allowed = await sync_to_async(_can_view_submission)(request, submission_id)
+    if allowed is None:
+        return JsonResponse({'error': 'not found'}, status=404)
+    if not allowed:
+        return JsonResponse({'error': 'forbidden'}, status=403)
+    
+    response = StreamingHttpResponse(
+        _submission_event_stream(submission_id),
+        content_type='text/event-stream'
+    )
+    response['Cache-Control'] = 'no-cache'
+    response['X-Accel-Buffering'] = 'no'  # 关闭 nginx 缓冲
+    return response
+
+
+async def _submission_event_stream(submission_id):
+    timeout = settings.OJ_SETTINGS.get('SUBMISSION_EVENTS_TIMEOUT', 300)
+    loop = asyncio.get_running_loop()
+    deadline = loop.time() + timeout
+    
+    client = create_async_redis()
+    pubsub = client.pubsub()
+    try:
+        # 先订阅再读取当前状态，两者之间发布的事件不会丢失
+        await pubsub.subscribe(submission_channel(submission_id))
+        submission = await Submission.objects.aget(id=submission_id)
+        event = status_event(submission)
+        yield 'retry: 3000\n' + format_sse(event)
+        if is_final(event):
+            return
+        
+        while True:
+            remaining = deadline - loop.time()
+            if remaining <= 0:
+                return
+            message = await pubsub.get_message(
+                ignore_subscribe_messages=True,
+                timeout=min(EVENTS_KEEPALIVE, remaining)
+            )
+            if message is None:
+                yield ': keepalive\n\n'
+                continue
+            event = json.loads(message['data'])
+            yield format_sse(event)
+            if is_final(event):
+                return
+    finally:
+        await pubsub.aclose()
+        await client.aclose()
@@ -0,0 +1,285 @@
+"""
+Python 预热解释器池（zygote）
+
+每个 zygote 是一个已完成启动的 Python 解释器（见 zygote_server.py），
+评测时由它 fork 出子进程执行用户代码，子进程中设置与 set_resource_limits 相同的资源限制。
+这样测试用例的运行时间只包含用户代码本身，不再包含解释器冷启动和 `site` 导入的开销。
+
+池中的 zygote 按需启动，数量不超过 PYTHON_ZYGOTE_POOL_SIZE；每个 zygote 同一时间只执行一个测试用例。
+"""
+
+import json
+import logging
+import os
+import signal
+import socket
+import subprocess
+import threading
+from django.conf import settings
+from .runner import communicate
+
+logger = logging.getLogger(__name__)
+
+SERVER_SCRIPT = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'zygote_server.py')
+MAX_MESSAGE = 65536
+
+
+class ZygoteError(Exception):
+    """zygote 通信失败"""
+
+
+class ZygoteProcess:
+    """
+    由 zygote fork 出的子进程
+
+    提供与 subprocess.Popen 相近的接口（pid、stdin、stdout、stderr、kill、wait、returncode），
+    可以直接交给 CaseContext 登记和 runner.communicate 使用。
+    """
+
+    def __init__(self, zygote, pid, stdin, stdout, stderr):
+        self.zygote = zygote
+        self.pid = pid
+        self.stdin = stdin
+        self.stdout = stdout
+        self.stderr = stderr
+        self.returncode = None
+        self.elapsed = None
+        self.rusage = None
+
+    def kill(self):
+        if self.returncode is not None:
+            return
+        try:
+            os.killpg(self.pid, signal.SIGKILL)
+        except OSError:
+            try:
+                os.kill(self.pid, signal.SIGKILL)
+            except OSError:
+                pass
+
+    def wait(self, timeout=None):
+        """等待 zygote 报告子进程的退出状态"""
+        if self.returncode is None:
+            try:
+                message = self.zygote.receive(timeout)
+            except socket.timeout:
+                raise subprocess.TimeoutExpired([self.pid], timeout)
+            self.returncode = message['returncode']
+            self.elapsed = message.get('time')
+            self.rusage = message.get('rusage')
+        return self.returncode
+
+    def close(self):
+        for stream in (self.stdin, self.stdout, self.stderr):
+            try:
+                stream.close()
+            except Exception:
+                pass
+
+
+class PythonZygote:
+    """单个 zygote 进程"""
+
+    def __init__(self, python, env, cwd):
+        self.sock, child_sock = socket.socketpair(socket.AF_UNIX, socket.SOCK_SEQPACKET)
+        try:
+            self.process = subprocess.Popen(
+                [python, SERVER_SCRIPT, str(child_sock.fileno())],
+                pass_fds=[child_sock.fileno()],
+                stdin=subprocess.DEVNULL,
+                stdout=subprocess.DEVNULL,
+                stderr=subprocess.DEVNULL,
+                env=env,
+                cwd=cwd,
+            )
+        finally:
+            child_sock.close()
+
+    @property
+    def alive(self):
+        return self.process.poll() is None
+
+    def receive(self, timeout=None):
+        self.sock.settimeout(timeout)
+        try:
+            data = self.sock.recv(MAX_MESSAGE)
+        except socket.timeout:
+            raise
+        except OSError as e:
+            raise ZygoteError(f'zygote 通信失败: {e}')
+        if not data:
+            raise ZygoteError('zygote 已退出')
+        message = json.loads(data.decode('utf-8'))
+        if 'error' in message:
+            raise ZygoteError(message['error'])
+        return message
+
+    def spawn(self, code_file, cwd, limits, stdin_file=None, cgroup=None):
+        """
+        请求 zygote fork 子进程执行代码
+
+        Args:
+            stdin_file: 已打开的文件，指定时直接作为子进程的标准输入，否则使用管道
+            cgroup: RunCgroup，指定时子进程在执行代码前加入该 cgroup
+
+        Returns:
+            ZygoteProcess
+        """
+        if stdin_file is not None:
+            stdin_r, stdin_w = os.dup(stdin_file.fileno()), None
+        else:
+            stdin_r, stdin_w = os.pipe()
+        stdout_r, stdout_w = os.pipe()
+        stderr_r, stderr_w = os.pipe()
+        child_fds = [stdin_r, stdout_w, stderr_w]
+        try:
+            request = json.dumps({
+                'cmd': 'run',
+                'path': code_file,
+                'cwd': cwd,
+                'limits': limits,
+                'cgroup': cgroup.path if cgroup is not None else None,
+            }).encode('utf-8')
+            socket.send_fds(self.sock, [request], child_fds)
+            pid = self.receive(timeout=5)['pid']
+        except Exception:
+            for fd in (stdin_w, stdout_r, stderr_r):
+                if fd is not None:
+                    os.close(fd)
+            raise
+        finally:
+            for fd in child_fds:
+                os.close(fd)
+
+        return ZygoteProcess(
+            self,
+            pid,
+            os.fdopen(stdin_w, 'wb') if stdin_w is not None else None,
+            os.fdopen(stdout_r, 'rb'),
+            os.fdopen(stderr_r, 'rb'),
+        )
+
+    def close(self):
+        try:
+            self.sock.close()
+        finally:
+            if self.alive:
+                self.process.kill()
+            self.process.wait()
+
+
+class ZygotePool:
+    """zygote 池（每个判题进程一个）"""
+
+    def __init__(self, python, env, cwd, size):
+        self.python = python
+        self.env = env
+        self.cwd = cwd
+        self.size = size
+        self._idle = []
+        self._count = 0
+        self._condition = threading.Condition()
+
+    def acquire(self):
+        with self._condition:
+            while True:
+                while self._idle:
+                    zygote = self._idle.pop()
+                    if zygote.alive:
+                        return zygote
+                    self._discard(zygote)
+                if self._count < self.size:
+                    self._count += 1
+                    break
+                self._condition.wait()
+
+        try:
+            return PythonZygote(self.python, self.env, self.cwd)
+        except Exception:
+            with self._condition:
+                self._count -= 1
+                self._condition.notify()
+            raise
+
+    def release(self, zygote, healthy=True):
+        with self._condition:
+            if healthy and zygote.alive:
+                self._idle.append(zygote)
+            else:
+                self._discard(zygote)
+            self._condition.notify()
+
+    def _discard(self, zygote):
+        self._count -= 1
+        try:
+            zygote.close()
+        except Exception:
+            pass
+
+    def run(self, code_file, input_data, timeout, context, cwd, limits, checker=None, cgroup=None):
+        """
+        在 zygote 中运行一个测试用例
+
+        Args:
+            code_file: 用户代码文件
+            input_data: 标准输入，字符串或已打开的文件
+            timeout: 超时时间（秒）
+            context: CaseContext，用于登记子进程以便取消
+            cwd: 工作目录
+            limits: 资源限制 [[名称, 软限制, 硬限制], ...]
+            checker: OutputChecker，指定时边读取边比对标准输出
+            cgroup: RunCgroup，指定时子进程加入该 cgroup
+
+        Returns:
+            tuple: (subprocess.CompletedProcess（附带 rusage 属性）, 用户代码运行时间(秒))
+
+        Raises:
+            subprocess.TimeoutExpired: 运行超时
+        """
+        zygote = self.acquire()
+        healthy = False
+        try:
+            stdin_file = input_data if hasattr(input_data, 'fileno') else None
+            process = zygote.spawn(code_file, cwd, limits, stdin_file, cgroup)
+            context.attach(process)
+            try:
+                stdout, stderr = communicate(process, None if stdin_file else input_data, timeout, checker)
+            finally:
+                process.close()
+            healthy = True
+            completed = subprocess.CompletedProcess([code_file], process.returncode, stdout, stderr)
+            completed.rusage = process.rusage
+            return completed, process.elapsed
+        except subprocess.TimeoutExpired:
+            healthy = True
+            raise
+        finally:
+            self.release(zygote, healthy)
+
+
+_pool = None
+_pool_pid = None
+_pool_lock = threading.Lock()
+
+
+def get_zygote_pool(python, env, cwd):
+    """
+    获取当前进程的 zygote 池
+
+    Celery prefork 模式下每个子进程各自持有一个池。
+    未启用或平台不支持时返回 None，调用方应回退到冷启动解释器。
+    """
+    global _pool, _pool_pid
+
+    oj_settings = getattr(settings, 'OJ_SETTINGS', {})
+    if not oj_settings.get('PYTHON_ZYGOTE_ENABLED', True):
+        return None
+    if not hasattr(os, 'fork') or not hasattr(socket, 'send_fds'):
+        return None
+
+    with _pool_lock:
+        if _pool is None or _pool_pid != os.getpid():
+            size = oj_settings.get('PYTHON_ZYGOTE_POOL_SIZE') or os.cpu_count() or 1
+            _pool = ZygotePool(python, env, cwd, size)
+            _pool_pid = os.getpid()
+        return _pool
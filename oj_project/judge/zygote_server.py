@@ -0,0 +1,161 @@
+"""
+Python 预热解释器（zygote）服务端
+
+由判题进程以 `python zygote_server.py <fd>` 启动，启动时完成解释器初始化和 `site` 导入，
+之后每次评测只需 fork 一个子进程执行用户代码，省去冷启动解释器的时间。
+
+本文件以独立脚本方式运行，不能导入 Django 或项目中的其他模块。
+
+通信协议（AF_UNIX SOCK_SEQPACKET，每条消息为一个 JSON 对象）：
+    请求：{"cmd": "run", "path": 代码文件, "cwd": 工作目录, "limits": [[名称, 软限制, 硬限制], ...],
+           "cgroup": 子进程加入的 cgroup 目录（可为 null）}
+          附带三个文件描述符：标准输入、标准输出、标准错误
+    响应：{"pid": 子进程PID}
+          子进程结束后再发送 {"returncode": 退出码, "time": 墙钟时间(秒), "rusage": {...}}
+"""
+
+import json
+import os
+import socket
+import sys
+import time
+import traceback
+
+# 预先导入常用标准库，子进程中再次导入时直接命中 sys.modules
+PRELOAD_MODULES = [
+    'bisect', 'collections', 'functools', 'heapq', 'itertools', 'math', 're', 'string',
+]
+
+MAX_MESSAGE = 65536
+
+
+def apply_limits(limits):
+    """在子进程中设置资源限制"""
+    try:
+        import resource
+        for name, soft, hard in limits:
+            resource.setrlimit(getattr(resource, name), (soft, hard))
+    except Exception:
+        # 与 set_resource_limits 保持一致：不支持的平台静默忽略
+        pass
+
+
+def join_cgroup(path):
+    """把当前进程加入 cgroup；失败时抛出异常，不在没有内存限制的情况下运行用户代码"""
+    with open(os.path.join(path, 'cgroup.procs'), 'w') as f:
+        f.write(str(os.getpid()))
+
+
+def exec_user_code(path):
+    """
+    在当前进程中以 `python path` 的语义执行用户代码
+
+    Returns:
+        int: 退出码
+    """
+    sys.argv = [path]
+    sys.path[0] = os.path.dirname(os.path.abspath(path))
+
+    try:
+        with open(path, 'rb') as f:
+            source = f.read()
+        code = compile(source, path, 'exec')
+        namespace = {
+            '__name__': '__main__',
+            '__file__': path,
+            '__doc__': None,
+            '__package__': None,
+            '__spec__': None,
+            '__builtins__': __builtins__,
+        }
+        exec(code, namespace)
+        return 0
+    except SystemExit as e:
+        if e.code is None:
+            return 0
+        if isinstance(e.code, int):
+            return e.code
+        print(e.code, file=sys.stderr)
+        return 1
+    except BaseException as e:
+        # 跳过本函数所在的栈帧，使错误信息与直接运行脚本一致
+        tb = e.__traceback__.tb_next if e.__traceback__ else None
+        traceback.print_exception(type(e), e, tb)
+        return 1
+
+
+def run_child(request, fds, sock):
+    """fork 后在子进程中执行，不会返回"""
+    returncode = 1
+    try:
+        os.setpgid(0, 0)
+        sock.close()
+        for target, fd in enumerate(fds):
+            os.dup2(fd, target)
+        os.closerange(3, os.sysconf('SC_OPEN_MAX') if hasattr(os, 'sysconf') else 1024)
+        os.chdir(request.get('cwd') or '/tmp')
+        if request.get('cgroup'):
+            join_cgroup(request['cgroup'])
+        apply_limits(request.get('limits') or [])
+        returncode = exec_user_code(request['path'])
+    except BaseException:
+        traceback.print_exc()
+    finally:
+        try:
+            sys.stdout.flush()
+            sys.stderr.flush()
+        except BaseException:
+            returncode = returncode or 1
+        os._exit(returncode & 0xff)
+
+
+def serve(sock):
+    while True:
+        try:
+            data, fds, _, _ = socket.recv_fds(sock, MAX_MESSAGE, 3)
+        except OSError:
+            return
+        if not data:
+            return
+
+        request = json.loads(data.decode('utf-8'))
+        if request.get('cmd') != 'run' or len(fds) != 3:
+            for fd in fds:
+                os.close(fd)
+            sock.send(json.dumps({'error': 'bad request'}).encode('utf-8'))
+            continue
+
+        start = time.monotonic()
+        pid = os.fork()
+        if pid == 0:
+            run_child(request, fds, sock)
+
+        for fd in fds:
+            os.close(fd)
+        sock.send(json.dumps({'pid': pid}).encode('utf-8'))
+
+        _, status, usage = os.wait4(pid, 0)
+        elapsed = time.monotonic() - start
+        sock.send(json.dumps({
+            'returncode': os.waitstatus_to_exitcode(status),
+            'time': elapsed,
+            'rusage': {
+                'utime': usage.ru_utime,
+                'stime': usage.ru_stime,
+                'maxrss': usage.ru_maxrss,
+            },
+        }).encode('utf-8'))
+
+
+def main():
+    sock = socket.socket(fileno=int(sys.argv[1]))
+    for name in PRELOAD_MODULES:
+        try:
+            __import__(name)
+        except ImportError:
+            pass
+    serve(sock)
+
+
+if __name__ == '__main__':
+    main()
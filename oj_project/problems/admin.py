@@ -1,5 +1,6 @@
-from django.contrib import admin
-from .models import Problem, TestCase, Tag, Submission
+from django.contrib import admin, messages
+from .models import Problem, TestCase, Tag, Submission, ArchivedSubmission, UserProblemStatus, RejudgeJob
+from . import rejudge
 
 
 class TestCaseInline(admin.TabularInline):
@@ -41,16 +42,24 @@ class ProblemAdmin(admin.ModelAdmin):
             'classes': ('collapse',)
         }),
         ('元信息', {
-            'fields': ('created_by',),
+            'fields': ('created_by', 'test_set_version'),
             'classes': ('collapse',)
         }),
     )
+    readonly_fields = ['test_set_version', 'total_submit', 'total_accepted']
+    actions = ['rejudge_problems']
     
     def save_model(self, request, obj, form, change):
         if not change:  # 新建时设置创建者
             obj.created_by = request.user
         super().save_model(request, obj, form, change)
 
+    @admin.action(description='重判所选题目的全部提交')
+    def rejudge_problems(self, request, queryset):
+        for problem in queryset:
+            job = rejudge.create_job(problem=problem, created_by=request.user)
+            self.message_user(request, f'已创建重判任务 #{job.id}（{job.description}），共 {job.total} 条提交')
+
 
 @admin.register(TestCase)
 class TestCaseAdmin(admin.ModelAdmin):
@@ -79,3 +88,89 @@ class SubmissionAdmin(admin.ModelAdmin):
             'fields': ('created_at',)
         }),
     )
+    actions = ['rejudge_submissions']
+
+    @admin.action(description='重判所选提交')
+    def rejudge_submissions(self, request, queryset):
+        job = rejudge.create_job(
+            submissions=queryset,
+            created_by=request.user,
+            description=f'选中的 {queryset.count()} 条提交'
+        )
+        self.message_user(request, f'已创建重判任务 #{job.id}，共 {job.total} 条提交（等待评测和评测中的提交不重判）')
+
+
+@admin.register(ArchivedSubmission)
+class ArchivedSubmissionAdmin(admin.ModelAdmin):
+    list_display = ['id', 'user', 'problem', 'language', 'status',
+                    'score', 'time_used', 'memory_used', 'created_at', 'archived_at']
+    list_filter = ['status', 'language']
+    search_fields = ['user__username', 'problem__title']
+    raw_id_fields = ['user', 'problem']
+    exclude = ['payload']
+    readonly_fields = ['code', 'error_info']
+
+    @admin.display(description='代码')
+    def code(self, obj):
+        return obj.unpack()['code']
+
+    @admin.display(description='错误信息')
+    def error_info(self, obj):
+        return obj.unpack()['error_info']
+
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+
+@admin.register(UserProblemStatus)
+class UserProblemStatusAdmin(admin.ModelAdmin):
+    list_display = ['user', 'problem', 'status', 'attempts', 'first_accepted_at',
+                    'best_time', 'best_memory', 'last_submitted_at']
+    list_filter = ['status']
+    search_fields = ['user__username', 'problem__title']
+    raw_id_fields = ['user', 'problem']
+    readonly_fields = ['updated_at']
+
+
+@admin.register(RejudgeJob)
+class RejudgeJobAdmin(admin.ModelAdmin):
+    list_display = ['id', 'description', 'status', 'progress_display', 'changed', 'accepted_delta',
+                    'rate', 'created_by', 'created_at', 'finished_at']
+    list_filter = ['status', 'created_at']
+    search_fields = ['description']
+    fields = ['description', 'problem', 'user', 'since', 'until', 'status', 'rate',
+              'total', 'enqueued', 'finished', 'changed', 'accepted_delta',
+              'created_by', 'created_at', 'finished_at']
+    readonly_fields = [name for name in fields if name != 'rate']
+    actions = ['pause_jobs', 'resume_jobs', 'cancel_jobs']
+
+    @admin.display(description='进度')
+    def progress_display(self, obj):
+        return f'{obj.finished}/{obj.total}（{obj.progress}%）'
+
+    def save_model(self, request, obj, form, change):
+        # 只修改速率上限，进度由 rejudge.dispatch_rejudges 更新
+        RejudgeJob.objects.filter(pk=obj.pk).update(rate=obj.rate)
+
+    def has_add_permission(self, request):
+        # 通过题目、提交记录的后台操作或 rejudge 管理命令创建
+        return False
+
+    @admin.action(description='暂停所选重判任务')
+    def pause_jobs(self, request, queryset):
+        for job in queryset:
+            rejudge.pause_job(job)
+
+    @admin.action(description='继续所选重判任务')
+    def resume_jobs(self, request, queryset):
+        for job in queryset:
+            rejudge.resume_job(job)
+
+    @admin.action(description='取消所选重判任务')
+    def cancel_jobs(self, request, queryset):
+        for job in queryset:
+            rejudge.cancel_job(job)
+        self.message_user(request, '未发送的提交不再重判，已发送的评测完成后更新统计数据', messages.INFO)
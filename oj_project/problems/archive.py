@@ -0,0 +1,139 @@
+"""
+提交记录归档
+
+Submission 只保留近期的提交（热数据），列表查询和索引的大小不随历史提交无限增长。
+archive_submissions 由 celery-beat 定期调度，把早于 SUBMISSION_ARCHIVE_AFTER_DAYS 天的提交
+移到 ArchivedSubmission（代码和错误信息压缩保存），但保留：
+    - 等待评测和评测中的提交
+    - 每个用户在每道题上最好的通过提交（运行时间最短，其次内存最小、最早）
+
+归档的提交编号不变，详情页和 API 通过 get_submission 透明读取；
+统计数据（rebuild_user、UserProfile.update_statistics）同时计入归档的提交。
+"""
+
+import logging
+from datetime import timedelta
+from celery import shared_task
+from django.conf import settings
+from django.db import transaction
+from django.db.models import OuterRef, Subquery
+from django.utils import timezone
+from .models import ArchivedSubmission, Submission
+
+logger = logging.getLogger(__name__)
+
+# 不归档的提交状态
+ACTIVE_STATUSES = ('Pending', 'Judging')
+
+
+def _setting(name, default):
+    return getattr(settings, 'OJ_SETTINGS', {}).get(name, default)
+
+
+def _best_accepted(submission_ids):
+    """给定的通过提交中，是所在（用户, 题目）最好的通过提交的ID"""
+    best = Submission.objects.filter(
+        user_id=OuterRef('user_id'),
+        problem_id=OuterRef('problem_id'),
+        status='Accepted',
+    ).order_by('time_used', 'memory_used', 'created_at', 'id').values('id')[:1]
+    return {
+        submission_id for submission_id, best_id in Submission.objects.filter(
+            id__in=submission_ids
+        ).annotate(best_id=Subquery(best)).values_list('id', 'best_id')
+        if submission_id == best_id
+    }
+
+
+def archive_batch(ids):
+    """
+    归档一批提交记录（同一事务中写入归档表并从 Submission 删除）
+
+    Args:
+        ids: 提交ID
+
+    Returns:
+        int: 归档数量
+    """
+    with transaction.atomic():
+        # 跳过正在被判题任务或重判锁定的行；重新检查状态，读取后被重判的提交和重判任务中的提交不归档
+        submissions = list(
+            Submission.objects.select_for_update(skip_locked=True)
+            .filter(id__in=ids)
+            .exclude(status__in=ACTIVE_STATUSES)
+            .filter(rejudge_item__isnull=True)
+        )
+        if not submissions:
+            return 0
+        ArchivedSubmission.objects.bulk_create(
+            [ArchivedSubmission.from_submission(submission) for submission in submissions],
+            ignore_conflicts=True
+        )
+        Submission.objects.filter(id__in=[submission.id for submission in submissions]).delete()
+    return len(submissions)
+
+
+@shared_task(ignore_result=True)
+def archive_submissions(days=None, batch_size=None):
+    """
+    归档较早的提交记录（由 celery-beat 定期调度）
+
+    按 (created_at, id) 顺序分批扫描，每批一个事务。
+
+    Args:
+        days: 归档早于该天数的提交，默认 SUBMISSION_ARCHIVE_AFTER_DAYS
+        batch_size: 每批数量，默认 SUBMISSION_ARCHIVE_BATCH_SIZE
+
+    Returns:
+        int: 归档数量
+    """
+    days = days if days is not None else _setting('SUBMISSION_ARCHIVE_AFTER_DAYS', 180)
+    batch_size = batch_size or _setting('SUBMISSION_ARCHIVE_BATCH_SIZE', 1000)
+    if days <= 0:
+        return 0
+
+    candidates = Submission.objects.filter(
+        created_at__lt=timezone.now() - timedelta(days=days)
+    ).exclude(status__in=ACTIVE_STATUSES).order_by('created_at', 'id')
+
+    archived = 0
+    last = None
+    while True:
+        batch = candidates
+        if last is not None:
+            batch = batch.filter(created_at__gte=last[0]).exclude(created_at=last[0], id__lte=last[1])
+        rows = list(batch.values_list('id', 'status', 'created_at')[:batch_size])
+        if not rows:
+            break
+        last = (rows[-1][2], rows[-1][0])
+
+        keep = _best_accepted([submission_id for submission_id, status, _ in rows if status == 'Accepted'])
+        archived += archive_batch([submission_id for submission_id, _, _ in rows if submission_id not in keep])
+
+    if archived:
+        logger.info(f"归档提交记录 {archived} 条")
+    return archived
+
+
+def get_submission(submission_id):
+    """
+    读取提交记录，已归档的从归档表还原
+
+    Args:
+        submission_id: 提交ID
+
+    Returns:
+        Submission
+
+    Raises:
+        Submission.DoesNotExist: 提交不存在
+    """
+    try:
+        return Submission.objects.select_related('user', 'problem').get(id=submission_id)
+    except Submission.DoesNotExist:
+        pass
+    try:
+        archived = ArchivedSubmission.objects.get(id=submission_id)
+    except ArchivedSubmission.DoesNotExist:
+        raise Submission.DoesNotExist(f'Submission {submission_id} not found')
+    return archived.to_submission()
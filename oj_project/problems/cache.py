@@ -0,0 +1,94 @@
+"""
+题目缓存
+
+题目详情页（渲染好的题面）和题目详情 API（序列化结果）对所有用户相同，
+缓存后热门题目每次访问只需一次缓存读取；提交记录等与用户相关的部分在视图中另外查询。
+
+每道题有一个版本号 problem:<ID>:version，缓存内容中记录生成时的版本号，
+与当前版本号不同即视为失效。题目、标签或测试用例修改时（见 signals.py）版本号加一，
+导入命令等不触发信号的批量操作需要调用 bump_problem。
+版本号和缓存内容用一次 get_many 读取。缓存不可用时直接查询数据库。
+"""
+
+import logging
+import time
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+
+logger = logging.getLogger(__name__)
+
+
+def _timeout():
+    return getattr(settings, 'OJ_SETTINGS', {}).get('PROBLEM_CACHE_TIMEOUT', 60)
+
+
+def version_key(problem_id):
+    return f'problem:{problem_id}:version'
+
+
+def content_key(problem_id, kind):
+    return f'problem:{problem_id}:{kind}'
+
+
+def _bump(problem_id):
+    key = version_key(problem_id)
+    try:
+        cache.incr(key)
+    except ValueError:
+        # 版本号不存在（从未缓存或已被淘汰）：用当前时间作为新版本，不会与旧内容的版本相同
+        cache.set(key, time.time_ns(), timeout=None)
+    except Exception as e:
+        logger.warning(f"更新题目缓存版本失败 (problem={problem_id}): {e}")
+
+
+def bump_problem(*problem_ids):
+    """
+    使题目的缓存失效（在当前事务提交后执行，避免其他请求把修改前的数据缓存为新版本）
+
+    Args:
+        problem_ids: 题目ID
+    """
+    for problem_id in set(problem_ids):
+        transaction.on_commit(lambda problem_id=problem_id: _bump(problem_id))
+
+
+def cached_problem(problem_id, kind, build):
+    """
+    读取题目的缓存内容，未缓存或已失效时调用 build 生成并缓存
+
+    Args:
+        problem_id: 题目ID
+        kind: 缓存内容的类型（'page' / 'api'）
+        build: 生成缓存内容的函数，题目不存在等情况可以抛出异常（不缓存）
+
+    Returns:
+        build 的返回值（或缓存的副本）
+    """
+    key = content_key(problem_id, kind)
+    try:
+        values = cache.get_many([key, version_key(problem_id)])
+    except Exception as e:
+        logger.warning(f"读取题目缓存失败 (problem={problem_id}): {e}")
+        return build()
+
+    version = values.get(version_key(problem_id))
+    entry = values.get(key)
+    if entry is not None and version is not None and entry['version'] == version:
+        return entry['content']
+
+    if version is None:
+        version = time.time_ns()
+        try:
+            if not cache.add(version_key(problem_id), version, timeout=None):
+                version = cache.get(version_key(problem_id))
+        except Exception as e:
+            logger.warning(f"初始化题目缓存版本失败 (problem={problem_id}): {e}")
+            return build()
+
+    content = build()
+    try:
+        cache.set(key, {'version': version, 'content': content}, timeout=_timeout())
+    except Exception as e:
+        logger.warning(f"写入题目缓存失败 (problem={problem_id}): {e}")
+    return content
@@ -0,0 +1,217 @@
+"""
+题目和用户的提交计数
+
+提交数、通过数不再在提交和判题时以「读取-加一-保存整行」的方式更新
+（并发时会丢失更新，热门题目的那一行也会成为所有提交的锁竞争点），
+而是先在 Redis 中原子累加，再由 flush_counters 定期批量写回数据库：
+
+    oj:counters:problem:<题目ID>   {total_submit: 增量, total_accepted: 增量}
+    oj:counters:profile:<用户ID>   {total_submissions: 增量, 各评测结果的提交数字段（STATUS_FIELDS）: 增量}
+    oj:counters:dirty              有待写回增量的键
+
+写回用 UPDATE ... SET 字段 = 字段 + 增量，不覆盖其他字段。
+读取时用 apply_pending 把尚未写回的增量加到对象上，页面上的计数仍然是最新的。
+Redis 不可用时直接在数据库中原子累加。
+"""
+
+import logging
+from celery import shared_task
+from django.apps import apps
+from django.db import transaction
+from django.db.models import F
+from oj_project.judge.redis_client import get_redis
+from .search import notify_changed
+
+logger = logging.getLogger(__name__)
+
+KEY_PREFIX = 'oj:counters:'
+DIRTY_KEY = 'oj:counters:dirty'
+
+# 计数对象: (模型, 对象ID对应的字段)
+TARGETS = {
+    'problem': ('problems.Problem', 'pk'),
+    'profile': ('users.UserProfile', 'user_id'),
+}
+
+# 用户各评测结果的提交数字段（等待评测、评测中和系统错误不单独计数）
+STATUS_FIELDS = {
+    'Accepted': 'accepted_submissions',
+    'Wrong Answer': 'wrong_answer_submissions',
+    'Time Limit Exceeded': 'time_limit_submissions',
+    'Memory Limit Exceeded': 'memory_limit_submissions',
+    'Runtime Error': 'runtime_error_submissions',
+    'Compile Error': 'compile_error_submissions',
+}
+
+
+def counter_key(target, object_id):
+    return f'{KEY_PREFIX}{target}:{object_id}'
+
+
+def _update_database(target, object_id, deltas):
+    model_label, lookup = TARGETS[target]
+    model = apps.get_model(model_label)
+    model.objects.filter(**{lookup: object_id}).update(
+        **{field: F(field) + delta for field, delta in deltas.items()}
+    )
+
+
+def increment(target, object_id, field, amount=1):
+    """
+    累加一个计数（在当前事务提交后执行）
+
+    Args:
+        target: 计数对象（'problem' / 'profile'）
+        object_id: 题目ID / 用户ID
+        field: 计数字段
+        amount: 增量
+    """
+    def apply():
+        key = counter_key(target, object_id)
+        try:
+            pipe = get_redis().pipeline(transaction=False)
+            pipe.hincrby(key, field, amount)
+            pipe.sadd(DIRTY_KEY, key)
+            pipe.execute()
+        except Exception as e:
+            logger.warning(f"Redis 计数失败，直接写入数据库 ({key} {field}): {e}")
+            _update_database(target, object_id, {field: amount})
+
+    transaction.on_commit(apply)
+
+
+def record_submit(submission):
+    """记录一次提交"""
+    increment('problem', submission.problem_id, 'total_submit')
+    increment('profile', submission.user_id, 'total_submissions')
+
+
+def record_status(submission):
+    """
+    记录用户一次评测结果的提交数（由 progress.record_verdict 调用）
+
+    批量重判的提交在重判任务完成时按差异更新，见 rejudge.py。
+    """
+    field = STATUS_FIELDS.get(submission.status)
+    if field is None or getattr(submission, 'is_rejudge', False):
+        return
+    increment('profile', submission.user_id, field)
+
+
+def record_accepted(submission):
+    """记录题目的一次通过（用户的通过提交数由 record_status 累加；批量重判的提交见 rejudge.py）"""
+    if getattr(submission, 'is_rejudge', False):
+        return
+    increment('problem', submission.problem_id, 'total_accepted')
+
+
+def pending(target, object_ids):
+    """
+    尚未写回数据库的增量
+
+    Args:
+        target: 计数对象
+        object_ids: 题目ID / 用户ID 列表
+
+    Returns:
+        dict: {对象ID: {计数字段: 增量}}，Redis 不可用时返回空字典
+    """
+    object_ids = list(object_ids)
+    if not object_ids:
+        return {}
+    try:
+        pipe = get_redis().pipeline(transaction=False)
+        for object_id in object_ids:
+            pipe.hgetall(counter_key(target, object_id))
+        values = pipe.execute()
+    except Exception as e:
+        logger.warning(f"读取 Redis 计数失败: {e}")
+        return {}
+    return {
+        object_id: {field: int(delta) for field, delta in deltas.items()}
+        for object_id, deltas in zip(object_ids, values)
+        if deltas
+    }
+
+
+def apply_pending(target, objects):
+    """
+    把尚未写回的增量加到模型对象上（只用于显示，不保存）
+
+    Args:
+        target: 计数对象
+        objects: 题目 / 用户配置对象列表
+
+    Returns:
+        objects
+    """
+    _, lookup = TARGETS[target]
+    deltas = pending(target, {getattr(obj, lookup) for obj in objects})
+    for obj in objects:
+        for field, delta in deltas.get(getattr(obj, lookup), {}).items():
+            setattr(obj, field, getattr(obj, field) + delta)
+    return objects
+
+
+def _parse_key(key):
+    target, _, object_id = key[len(KEY_PREFIX):].partition(':')
+    return target, int(object_id)
+
+
+@shared_task(ignore_result=True)
+def flush_counters(batch_size=500):
+    """
+    把 Redis 中累积的增量批量写回数据库（由 celery-beat 定期调度）
+
+    每个键的增量用 MULTI 原子地取出并清零；写库失败时把增量加回 Redis，下次重试。
+
+    Args:
+        batch_size: 每批处理的键数
+
+    Returns:
+        int: 写回的键数
+    """
+    client = get_redis()
+    flushed = 0
+    while True:
+        keys = client.spop(DIRTY_KEY, batch_size)
+        if not keys:
+            return flushed
+
+        pipe = client.pipeline(transaction=True)
+        for key in keys:
+            pipe.hgetall(key)
+            pipe.delete(key)
+        values = pipe.execute()[::2]
+
+        batch = []
+        for key, deltas in zip(keys, values):
+            deltas = {field: int(delta) for field, delta in deltas.items() if int(delta)}
+            if deltas:
+                batch.append((key, deltas))
+        # 按固定顺序更新，避免并发写回时互相等锁
+        batch.sort(key=lambda item: _parse_key(item[0]))
+
+        try:
+            with transaction.atomic():
+                for key, deltas in batch:
+                    target, object_id = _parse_key(key)
+                    _update_database(target, object_id, deltas)
+        except Exception:
+            logger.exception("计数写回数据库失败，增量已放回 Redis")
+            pipe = client.pipeline(transaction=False)
+            for key, deltas in batch:
+                for field, delta in deltas.items():
+                    pipe.hincrby(key, field, delta)
+                pipe.sadd(DIRTY_KEY, key)
+            pipe.execute()
+            raise
+
+        # 题目的提交数、通过数用于题目列表排序（见 search.py）
+        notify_changed(*(
+            object_id for target, object_id in (_parse_key(key) for key, _ in batch) if target == 'problem'
+        ), stats_only=True)
+
+        flushed += len(batch)
+        if len(keys) < batch_size:
+            return flushed
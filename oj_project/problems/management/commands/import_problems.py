@@ -3,6 +3,7 @@
 
 使用方法：
 python manage.py import_problems problems.json
+python manage.py import_problems problems.zip --update --batch-size 200 --workers 8
 
 JSON格式示例：
 [
@@ -15,133 +16,455 @@ JSON格式示例：
         "tags": ["基础", "数学"],
         "test_cases": [
             {"input": "1 2", "output": "3", "is_sample": true},
-            {"input": "0 0", "output": "0", "is_sample": false}
+            {"input_file": "a+b/2.in", "output_file": "a+b/2.out"}
         ]
     }
 ]
+
+测试用例可以用 input_file / output_file 引用测试数据文件：
+JSON 文件中相对于 JSON 文件所在目录；ZIP 压缩包中相对于压缩包根目录，
+压缩包根目录下须有 problems.json（格式同上）。
+
+导入过程：
+    - 逐道题目解析 JSON，不把整个文件读入内存
+    - 每 --batch-size 道题目（或测试数据累计超过 --batch-bytes）在一个事务中写入，
+      题目、标签关联和测试用例都用 bulk_create
+    - 测试数据的哈希计算和文件写入（见 testdata.py）在 --workers 个工作进程中并行
+    - 替换测试用例时用 QuerySet.delete() 删除旧用例（触发信号）；bulk_create 不触发信号，
+      每批写入后更新测试数据版本、题目缓存和搜索索引
 """
 
+import io
+import json
+import multiprocessing
+import os
+import re
+import time
+import zipfile
+from concurrent.futures import ProcessPoolExecutor
+from itertools import repeat
 from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.utils import timezone
+from oj_project.problems.cache import bump_problem
 from oj_project.problems.models import Problem, TestCase, Tag
-import json
+from oj_project.problems.search import notify_changed
+from oj_project.problems.testdata import TestDataStore, store_data
+
+MANIFEST_NAME = 'problems.json'
+
+_WHITESPACE = re.compile(r'\s*')
+
+
+def iter_json_array(stream, chunk_size=1024 * 1024):
+    """
+    逐个解析 JSON 数组中的元素
+
+    Args:
+        stream: 文本流
+        chunk_size: 每次读取的字符数
+
+    Yields:
+        数组元素
+
+    Raises:
+        ValueError: 不是 JSON 数组或格式错误
+    """
+    decoder = json.JSONDecoder()
+    buffer, pos = '', 0
+    # 已从缓冲区丢弃的字符数，buffer 中的 pos 对应文件中的第 consumed + pos 个字符（从 0 开始）
+    consumed = 0
+
+    def more():
+        # 读取量随缓冲区增大，单个元素很大时总的解析次数仍是对数级
+        nonlocal buffer, pos, consumed
+        data = stream.read(max(chunk_size, len(buffer) - pos))
+        if not data:
+            return False
+        consumed += pos
+        buffer, pos = buffer[pos:] + data, 0
+        return True
+
+    def skip_whitespace():
+        nonlocal pos
+        while True:
+            pos = _WHITESPACE.match(buffer, pos).end()
+            if pos < len(buffer) or not more():
+                return pos < len(buffer)
+
+    if not skip_whitespace() or buffer[pos] != '[':
+        raise ValueError('JSON文件应包含题目数组')
+    pos += 1
+
+    first = True
+    while True:
+        if not skip_whitespace():
+            raise ValueError('JSON数组不完整')
+        if buffer[pos] == ']':
+            return
+        if not first:
+            if buffer[pos] != ',':
+                raise ValueError(f'JSON格式错误: 第 {consumed + pos + 1} 个字符处应为 ","')
+            pos += 1
+            if not skip_whitespace():
+                raise ValueError('JSON数组不完整')
+        first = False
+
+        while True:
+            try:
+                item, pos = decoder.raw_decode(buffer, pos)
+                break
+            except json.JSONDecodeError as e:
+                if not more():
+                    raise ValueError(f'JSON解析错误: 第 {consumed + e.pos + 1} 个字符处: {e.msg}')
+        yield item
+
+
+class ImportSource:
+    """题目数据来源：JSON 文件（测试数据文件在同一目录下）或 ZIP 压缩包"""
+
+    def __init__(self, path):
+        self.path = path
+        self.archive = zipfile.ZipFile(path) if zipfile.is_zipfile(path) else None
+        self.base_dir = os.path.dirname(os.path.abspath(path))
+
+    def open_manifest(self):
+        if self.archive is None:
+            return open(self.path, 'r', encoding='utf-8')
+        try:
+            return io.TextIOWrapper(self.archive.open(MANIFEST_NAME), encoding='utf-8')
+        except KeyError:
+            raise CommandError(f'压缩包中没有 {MANIFEST_NAME}')
+
+    def _file_path(self, name):
+        path = os.path.normpath(os.path.join(self.base_dir, name))
+        if os.path.commonpath([path, self.base_dir]) != self.base_dir:
+            raise ValueError(f'测试数据文件不在导入目录中: {name}')
+        return path
+
+    def size(self, name):
+        """测试数据文件的大小（字节），文件不存在时抛出 ValueError"""
+        try:
+            if self.archive is not None:
+                return self.archive.getinfo(name).file_size
+            return os.path.getsize(self._file_path(name))
+        except (KeyError, OSError):
+            raise ValueError(f'测试数据文件不存在: {name}')
+
+    def read(self, name):
+        if self.archive is not None:
+            return self.archive.read(name)
+        with open(self._file_path(name), 'rb') as f:
+            return f.read()
+
+    def close(self):
+        if self.archive is not None:
+            self.archive.close()
+
+
+class PendingProblem:
+    """已解析、等待写入的题目"""
+
+    def __init__(self, index, data, source):
+        for field in ['title', 'description']:
+            if field not in data:
+                raise ValueError(f'缺少必需字段: {field}')
+
+        self.index = index
+        self.title = data['title']
+        self.fields = {
+            'description': data['description'],
+            'difficulty': data.get('difficulty', 'Easy'),
+            'time_limit': data.get('time_limit', 1000),
+            'memory_limit': data.get('memory_limit', 128),
+            'is_public': data.get('is_public', True),
+        }
+        self.tags = data.get('tags')
+
+        # 测试数据：内联的字符串或文件名，写入前再读取文件
+        self.cases = None
+        self.size = 0
+        if 'test_cases' in data:
+            self.cases = []
+            for order, tc_data in enumerate(data['test_cases']):
+                case = {
+                    'is_sample': tc_data.get('is_sample', False),
+                    'score': tc_data.get('score', 10),
+                    'order': tc_data.get('order', order),
+                }
+                for name in ('input', 'output'):
+                    if f'{name}_file' in tc_data:
+                        case[name] = ('file', tc_data[f'{name}_file'])
+                        self.size += source.size(tc_data[f'{name}_file'])
+                    else:
+                        case[name] = ('text', tc_data.get(name, ''))
+                        self.size += len(case[name][1])
+                self.cases.append(case)
+
+    def load_cases(self, source):
+        """
+        读取测试数据
+
+        Returns:
+            list: [(测试用例字段, {'input': (文本, 字节串), 'output': (文本, 字节串)}), ...]
+
+        Raises:
+            UnicodeDecodeError: 测试数据文件不是 UTF-8 文本
+        """
+        loaded = []
+        for case in self.cases:
+            data = {}
+            for name in ('input', 'output'):
+                kind, value = case[name]
+                if kind == 'file':
+                    raw = source.read(value)
+                    data[name] = (raw.decode('utf-8'), raw)
+                else:
+                    data[name] = (value, value.encode('utf-8'))
+            fields = {key: case[key] for key in ('is_sample', 'score', 'order')}
+            loaded.append((fields, data))
+        return loaded
 
 
 class Command(BaseCommand):
-    help = '从JSON文件批量导入题目'
+    help = '从JSON文件或ZIP压缩包批量导入题目'
 
     def add_arguments(self, parser):
-        parser.add_argument('file', type=str, help='JSON文件路径')
+        parser.add_argument('file', type=str, help='JSON文件或ZIP压缩包路径')
         parser.add_argument(
             '--update',
             action='store_true',
             help='如果题目已存在则更新',
         )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=100,
+            help='每个事务写入的题目数（默认100）',
+        )
+        parser.add_argument(
+            '--batch-bytes',
+            type=int,
+            default=64 * 1024 * 1024,
+            help='每个事务的测试数据累计字节数上限（默认64MB）',
+        )
+        parser.add_argument(
+            '--workers',
+            type=int,
+            default=os.cpu_count() or 1,
+            help='计算测试数据哈希的工作进程数，0 表示在当前进程中计算（默认CPU核数）',
+        )
 
     def handle(self, *args, **options):
         file_path = options['file']
-        update_existing = options['update']
+        self.update_existing = options['update']
+        self.verbose = options['verbosity'] >= 2
+        batch_size = max(1, options['batch_size'])
+        batch_bytes = options['batch_bytes']
 
-        try:
-            with open(file_path, 'r', encoding='utf-8') as f:
-                problems_data = json.load(f)
-        except FileNotFoundError:
+        if not os.path.exists(file_path):
             raise CommandError(f'文件不存在: {file_path}')
-        except json.JSONDecodeError as e:
-            raise CommandError(f'JSON解析错误: {e}')
 
-        if not isinstance(problems_data, list):
-            raise CommandError('JSON文件应包含题目数组')
+        self.source = ImportSource(file_path)
+        self.store_root = TestDataStore().root
+        self.tag_ids = {}
+        self.counts = {'created': 0, 'updated': 0, 'skipped': 0, 'error': 0, 'cases': 0, 'bytes': 0}
+        self.started = time.monotonic()
+        # 工作进程用 spawn 启动，不继承当前进程的数据库连接
+        self.workers = options['workers']
+        self.pool = ProcessPoolExecutor(
+            max_workers=self.workers,
+            mp_context=multiprocessing.get_context('spawn')
+        ) if options['workers'] > 0 else None
 
-        created_count = 0
-        updated_count = 0
-        skipped_count = 0
-        error_count = 0
-
-        self.stdout.write(self.style.SUCCESS(f'开始导入 {len(problems_data)} 道题目...'))
+        self.stdout.write(self.style.SUCCESS(f'开始导入: {file_path}'))
         self.stdout.write('')
 
-        for index, data in enumerate(problems_data, 1):
-            try:
-                self.stdout.write(f'[{index}/{len(problems_data)}] 处理题目: {data.get("title", "未命名")}')
-                
-                # 验证必需字段
-                required_fields = ['title', 'description']
-                for field in required_fields:
-                    if field not in data:
-                        raise ValueError(f'缺少必需字段: {field}')
-
-                # 检查题目是否已存在
-                existing = Problem.objects.filter(title=data['title']).first()
-
-                if existing and not update_existing:
-                    self.stdout.write(self.style.WARNING(f'  跳过（已存在）: {data["title"]}'))
-                    skipped_count += 1
-                    continue
-
-                # 创建或更新题目
-                problem_fields = {
-                    'description': data['description'],
-                    'difficulty': data.get('difficulty', 'Easy'),
-                    'time_limit': data.get('time_limit', 1000),
-                    'memory_limit': data.get('memory_limit', 128),
-                    'is_public': data.get('is_public', True),
-                }
-
-                if existing:
-                    # 更新现有题目
-                    for key, value in problem_fields.items():
-                        setattr(existing, key, value)
-                    existing.save()
-                    problem = existing
-                    updated_count += 1
-                    self.stdout.write(self.style.SUCCESS(f'  ✓ 更新题目: {problem.title}'))
-                else:
-                    # 创建新题目
-                    problem = Problem.objects.create(
-                        title=data['title'],
-                        **problem_fields
-                    )
-                    created_count += 1
-                    self.stdout.write(self.style.SUCCESS(f'  ✓ 创建题目: {problem.title}'))
-
-                # 处理标签
-                if 'tags' in data:
-                    problem.tags.clear()
-                    for tag_name in data['tags']:
-                        tag, _ = Tag.objects.get_or_create(name=tag_name)
-                        problem.tags.add(tag)
-                    self.stdout.write(f'    添加标签: {", ".join(data["tags"])}')
-
-                # 处理测试用例
-                if 'test_cases' in data:
-                    # 如果更新，先删除旧的测试用例
-                    if existing:
-                        TestCase.objects.filter(problem=problem).delete()
-
-                    for tc_data in data['test_cases']:
-                        TestCase.objects.create(
-                            problem=problem,
-                            input_data=tc_data.get('input', ''),
-                            output_data=tc_data.get('output', ''),
-                            is_sample=tc_data.get('is_sample', False)
-                        )
-                    self.stdout.write(f'    添加测试用例: {len(data["test_cases"])} 个')
-
-                self.stdout.write('')
+        batch = []
+        pending_bytes = 0
+        try:
+            with self.source.open_manifest() as manifest:
+                for index, data in enumerate(iter_json_array(manifest), 1):
+                    try:
+                        if not isinstance(data, dict):
+                            raise ValueError('题目应为JSON对象')
+                        problem = PendingProblem(index, data, self.source)
+                    except Exception as e:
+                        self.counts['error'] += 1
+                        self.stdout.write(self.style.ERROR(f'[{index}] ✗ 错误: {e}'))
+                        continue
 
-            except Exception as e:
-                error_count += 1
-                self.stdout.write(self.style.ERROR(f'  ✗ 错误: {e}'))
-                self.stdout.write('')
-                continue
+                    # 同一批中标题重复时先写入前面的，后面的按已存在处理
+                    if any(pending.title == problem.title for pending in batch):
+                        self.flush(batch)
+                        batch, pending_bytes = [], 0
+                    batch.append(problem)
+                    pending_bytes += problem.size
+                    if len(batch) >= batch_size or pending_bytes >= batch_bytes:
+                        self.flush(batch)
+                        batch, pending_bytes = [], 0
+            self.flush(batch)
+        except (ValueError, UnicodeDecodeError) as e:
+            raise CommandError(str(e))
+        finally:
+            if self.pool is not None:
+                self.pool.shutdown()
+            self.source.close()
 
         # 输出统计信息
+        elapsed = time.monotonic() - self.started
         self.stdout.write('='*60)
         self.stdout.write(self.style.SUCCESS('导入完成！'))
-        self.stdout.write(f'创建: {created_count} 道')
-        self.stdout.write(f'更新: {updated_count} 道')
-        self.stdout.write(f'跳过: {skipped_count} 道')
-        if error_count > 0:
-            self.stdout.write(self.style.ERROR(f'错误: {error_count} 道'))
+        self.stdout.write(f'创建: {self.counts["created"]} 道')
+        self.stdout.write(f'更新: {self.counts["updated"]} 道')
+        self.stdout.write(f'跳过: {self.counts["skipped"]} 道')
+        if self.counts['error'] > 0:
+            self.stdout.write(self.style.ERROR(f'错误: {self.counts["error"]} 道'))
+        self.stdout.write(f'测试用例: {self.counts["cases"]} 个（{self.counts["bytes"] / 1024 / 1024:.1f} MB）')
+        self.stdout.write(f'用时: {elapsed:.1f} 秒，{self._throughput()}')
         self.stdout.write('='*60)
 
+    def _throughput(self):
+        elapsed = max(time.monotonic() - self.started, 1e-6)
+        problems = self.counts['created'] + self.counts['updated']
+        return f'{problems / elapsed:.1f} 道/秒，{self.counts["bytes"] / 1024 / 1024 / elapsed:.1f} MB/秒'
+
+    def _tag_ids(self, names):
+        """标签名称对应的ID（不存在的标签批量创建）"""
+        missing = set(names) - self.tag_ids.keys()
+        if missing:
+            self.tag_ids.update(Tag.objects.filter(name__in=missing).values_list('name', 'id'))
+            missing -= self.tag_ids.keys()
+        if missing:
+            Tag.objects.bulk_create([Tag(name=name) for name in missing], ignore_conflicts=True)
+            self.tag_ids.update(Tag.objects.filter(name__in=missing).values_list('name', 'id'))
+        return [self.tag_ids[name] for name in names]
+
+    def _store(self, blobs):
+        """并行计算哈希并写入测试数据文件存储"""
+        if self.pool is None:
+            return [store_data(self.store_root, blob) for blob in blobs]
+        chunksize = max(1, len(blobs) // (self.workers * 4))
+        return list(self.pool.map(store_data, repeat(self.store_root), blobs, chunksize=chunksize))
+
+    def flush(self, batch):
+        """在一个事务中写入一批题目"""
+        if not batch:
+            return
+
+        # 已存在的题目（标题相同时取最早的一道）
+        existing = {}
+        for problem in Problem.objects.filter(title__in=[pending.title for pending in batch]).order_by('id'):
+            existing.setdefault(problem.title, problem)
+
+        writes = []
+        for pending in batch:
+            problem = existing.get(pending.title)
+            if problem is not None and not self.update_existing:
+                self.counts['skipped'] += 1
+                if self.verbose:
+                    self.stdout.write(self.style.WARNING(f'[{pending.index}] 跳过（已存在）: {pending.title}'))
+                continue
+            try:
+                cases = pending.load_cases(self.source) if pending.cases is not None else None
+            except Exception as e:
+                self.counts['error'] += 1
+                self.stdout.write(self.style.ERROR(f'[{pending.index}] ✗ 错误: {pending.title}: {e}'))
+                continue
+            writes.append((pending, problem, cases))
+        if not writes:
+            return
+
+        blobs = [
+            data[name][1]
+            for _, _, cases in writes
+            for _, data in cases or []
+            for name in ('input', 'output')
+        ]
+        hashes = iter(self._store(blobs))
+        batch_bytes = sum(len(blob) for blob in blobs)
+
+        try:
+            with transaction.atomic():
+                self._write(writes, hashes)
+        except Exception as e:
+            self.counts['error'] += len(writes)
+            self.stdout.write(self.style.ERROR(
+                f'[{writes[0][0].index}-{writes[-1][0].index}] ✗ 本批写入失败（{len(writes)} 道）: {e}'
+            ))
+            return
+
+        for pending, problem, cases in writes:
+            self.counts['updated' if problem is not None else 'created'] += 1
+            self.counts['cases'] += len(cases or [])
+            if self.verbose:
+                action = '更新' if problem is not None else '创建'
+                self.stdout.write(self.style.SUCCESS(f'[{pending.index}] ✓ {action}题目: {pending.title}'))
+        self.counts['bytes'] += batch_bytes
+
+        processed = sum(self.counts[key] for key in ('created', 'updated', 'skipped', 'error'))
+        self.stdout.write(
+            f'已处理 {processed} 道题目（创建 {self.counts["created"]}，更新 {self.counts["updated"]}，'
+            f'跳过 {self.counts["skipped"]}，错误 {self.counts["error"]}），'
+            f'测试用例 {self.counts["cases"]} 个，{self._throughput()}'
+        )
+
+    def _write(self, writes, hashes):
+        now = timezone.now()
+
+        # 题目
+        created = [Problem(title=pending.title, **pending.fields) for pending, problem, _ in writes if problem is None]
+        Problem.objects.bulk_create(created)
+        created = iter(created)
+        updated = []
+        problems = []
+        for pending, problem, _ in writes:
+            if problem is None:
+                problem = next(created)
+            else:
+                for key, value in pending.fields.items():
+                    setattr(problem, key, value)
+                problem.updated_at = now
+                updated.append(problem)
+            problems.append(problem)
+        if updated:
+            Problem.objects.bulk_update(updated, list(writes[0][0].fields) + ['updated_at'])
+
+        # 标签（只替换数据中给出了 tags 的题目）
+        Through = Problem.tags.through
+        tagged = [(problem, pending.tags) for (pending, _, _), problem in zip(writes, problems) if pending.tags is not None]
+        Through.objects.filter(problem_id__in=[problem.id for problem, _ in tagged]).delete()
+        Through.objects.bulk_create([
+            Through(problem_id=problem.id, tag_id=tag_id)
+            for problem, names in tagged
+            for tag_id in dict.fromkeys(self._tag_ids(names))
+        ])
+
+        # 测试用例（只替换数据中给出了 test_cases 的题目）
+        replaced = [problem.id for (_, _, cases), problem in zip(writes, problems) if cases is not None]
+        # 删除触发测试用例的信号（更新测试数据版本、使题目缓存失效）
+        TestCase.objects.filter(problem_id__in=replaced).delete()
+        test_cases = []
+        for (_, _, cases), problem in zip(writes, problems):
+            for fields, data in cases or []:
+                input_hash, input_size = next(hashes)
+                output_hash, output_size = next(hashes)
+                test_cases.append(TestCase(
+                    problem=problem,
+                    input_data=data['input'][0],
+                    output_data=data['output'][0],
+                    input_hash=input_hash,
+                    input_size=input_size,
+                    output_hash=output_hash,
+                    output_size=output_size,
+                    **fields
+                ))
+        TestCase.objects.bulk_create(test_cases, batch_size=500)
+
+        # bulk_create / bulk_update 不触发信号：按新写入的测试用例更新测试数据版本，
+        # 使题目缓存失效并通知搜索索引（删除时信号计算的版本不含新测试用例）
+        for problem_id in replaced:
+            Problem.refresh_test_set_version(problem_id)
+        problem_ids = [problem.id for problem in problems]
+        bump_problem(*problem_ids)
+        notify_changed(*problem_ids)
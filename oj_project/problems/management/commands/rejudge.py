@@ -0,0 +1,111 @@
+"""
+批量重判命令
+
+使用方法：
+python manage.py rejudge --problem 12
+python manage.py rejudge --user alice --since 2024-01-01 --until 2024-02-01 --rate 300
+python manage.py rejudge --problem 12 --wait
+python manage.py rejudge --cancel 5
+
+创建重判任务（见 rejudge.py），由 celery-beat 调度的 dispatch_rejudges 按速率上限分批发送到重判队列，
+全部完成后更新通过数、做题状态和排行榜。--wait 等待任务完成并输出进度。
+"""
+
+import time
+from datetime import datetime, time as dt_time
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+from django.utils.dateparse import parse_date, parse_datetime
+from oj_project.problems import rejudge
+from oj_project.problems.models import Problem, RejudgeJob
+
+
+def parse_time(value):
+    """解析 YYYY-MM-DD 或 YYYY-MM-DD HH:MM[:SS]，按当前时区"""
+    moment = parse_datetime(value)
+    if moment is None:
+        day = parse_date(value)
+        if day is None:
+            raise CommandError(f'无法解析时间: {value}')
+        moment = datetime.combine(day, dt_time.min)
+    if timezone.is_naive(moment):
+        moment = timezone.make_aware(moment)
+    return moment
+
+
+class Command(BaseCommand):
+    help = '按题目、用户或提交时间批量重判提交'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--problem', type=int, help='题目ID')
+        parser.add_argument('--user', type=str, help='用户名')
+        parser.add_argument('--since', type=str, help='提交时间不早于（YYYY-MM-DD 或 YYYY-MM-DD HH:MM）')
+        parser.add_argument('--until', type=str, help='提交时间早于（YYYY-MM-DD 或 YYYY-MM-DD HH:MM）')
+        parser.add_argument('--all', action='store_true', help='不指定筛选条件时重判全部提交')
+        parser.add_argument('--rate', type=int, help='速率上限（条/分钟，默认 REJUDGE_RATE）')
+        parser.add_argument('--wait', action='store_true', help='等待重判完成并输出进度')
+        parser.add_argument('--cancel', type=int, metavar='JOB_ID', help='取消重判任务')
+
+    def handle(self, *args, **options):
+        if options['cancel']:
+            job = self._get_job(options['cancel'])
+            rejudge.cancel_job(job)
+            self.stdout.write(self.style.SUCCESS(f'已取消重判任务 #{job.id}，已发送的提交评测完成后更新统计数据'))
+            return
+
+        problem = user = since = until = None
+        if options['problem'] is not None:
+            try:
+                problem = Problem.objects.get(pk=options['problem'])
+            except Problem.DoesNotExist:
+                raise CommandError(f'题目不存在: {options["problem"]}')
+        if options['user']:
+            try:
+                user = User.objects.get(username=options['user'])
+            except User.DoesNotExist:
+                raise CommandError(f'用户不存在: {options["user"]}')
+        if options['since']:
+            since = parse_time(options['since'])
+        if options['until']:
+            until = parse_time(options['until'])
+        if not any([problem, user, since, until]) and not options['all']:
+            raise CommandError('请指定 --problem、--user、--since / --until，或用 --all 重判全部提交')
+        if options['rate'] is not None and options['rate'] <= 0:
+            raise CommandError('--rate 必须大于 0')
+
+        job = rejudge.create_job(problem=problem, user=user, since=since, until=until, rate=options['rate'])
+        self.stdout.write(self.style.SUCCESS(
+            f'已创建重判任务 #{job.id}（{job.description}），共 {job.total} 条提交，速率上限 {job.rate} 条/分钟'
+        ))
+
+        if options['wait']:
+            self._wait(job)
+
+    def _get_job(self, job_id):
+        try:
+            return RejudgeJob.objects.get(pk=job_id)
+        except RejudgeJob.DoesNotExist:
+            raise CommandError(f'重判任务不存在: {job_id}')
+
+    def _wait(self, job):
+        """轮询任务进度（任务由 celery-beat 调度推进）"""
+        last = None
+        while True:
+            job.refresh_from_db()
+            progress = (job.status, job.enqueued, job.finished)
+            if progress != last:
+                self.stdout.write(
+                    f'[{job.get_status_display()}] 已发送 {job.enqueued}，已完成 {job.finished}/{job.total}（{job.progress}%）'
+                )
+                last = progress
+            if job.status in ('finished', 'cancelled'):
+                break
+            time.sleep(2)
+
+        self.stdout.write('=' * 60)
+        self.stdout.write(self.style.SUCCESS(f'重判完成！用时 {(job.finished_at - job.created_at).total_seconds():.0f} 秒'))
+        self.stdout.write(f'提交: {job.total} 条')
+        self.stdout.write(f'结果变化: {job.changed} 条')
+        self.stdout.write(f'通过数变化: {job.accepted_delta:+d}')
+        self.stdout.write('=' * 60)
@@ -0,0 +1,62 @@
+# Generated by Django 4.2.7 on 2026-10-18 03:50
+
+import hashlib
+
+from django.db import migrations, models
+
+
+def backfill_hashes(apps, schema_editor):
+    """为已有测试用例计算哈希和大小（文件由判题时按需写入）"""
+    TestCase = apps.get_model("problems", "TestCase")
+    batch = []
+    for test_case in TestCase.objects.only("id", "input_data", "output_data").iterator(chunk_size=200):
+        input_bytes = (test_case.input_data or "").encode("utf-8")
+        output_bytes = (test_case.output_data or "").encode("utf-8")
+        test_case.input_hash = hashlib.sha256(input_bytes).hexdigest()
+        test_case.input_size = len(input_bytes)
+        test_case.output_hash = hashlib.sha256(output_bytes).hexdigest()
+        test_case.output_size = len(output_bytes)
+        batch.append(test_case)
+        if len(batch) >= 200:
+            TestCase.objects.bulk_update(batch, ["input_hash", "input_size", "output_hash", "output_size"])
+            batch = []
+    if batch:
+        TestCase.objects.bulk_update(batch, ["input_hash", "input_size", "output_hash", "output_size"])
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("problems", "0002_alter_submission_language"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="testcase",
+            name="input_hash",
+            field=models.CharField(
+                blank=True, editable=False, max_length=64, verbose_name="输入数据哈希"
+            ),
+        ),
+        migrations.AddField(
+            model_name="testcase",
+            name="input_size",
+            field=models.BigIntegerField(
+                default=0, editable=False, verbose_name="输入数据大小(字节)"
+            ),
+        ),
+        migrations.AddField(
+            model_name="testcase",
+            name="output_hash",
+            field=models.CharField(
+                blank=True, editable=False, max_length=64, verbose_name="期望输出哈希"
+            ),
+        ),
+        migrations.AddField(
+            model_name="testcase",
+            name="output_size",
+            field=models.BigIntegerField(
+                default=0, editable=False, verbose_name="期望输出大小(字节)"
+            ),
+        ),
+        migrations.RunPython(backfill_hashes, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,146 @@
+# Generated by Django 4.2.7 on 2026-10-18 04:11
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+from django.db.models import Count, Max, Min, OuterRef, Q, Subquery
+
+
+def backfill_statuses(apps, schema_editor):
+    """按已有的提交记录生成做题状态"""
+    Submission = apps.get_model("problems", "Submission")
+    UserProblemStatus = apps.get_model("problems", "UserProblemStatus")
+
+    submissions = Submission.objects.exclude(status__in=["Pending", "Judging", "System Error"])
+    accepted = Q(status="Accepted")
+    latest_status = submissions.filter(
+        user_id=OuterRef("user_id"), problem_id=OuterRef("problem_id")
+    ).order_by("-created_at", "-id").values("status")[:1]
+    rows = submissions.values("user_id", "problem_id").annotate(
+        attempts=Count("id"),
+        first_accepted_at=Min("created_at", filter=accepted),
+        best_time=Min("time_used", filter=accepted),
+        best_memory=Min("memory_used", filter=accepted),
+        last_submitted_at=Max("created_at"),
+        latest_status=Subquery(latest_status),
+    ).order_by()
+
+    batch = []
+    for row in rows.iterator(chunk_size=2000):
+        batch.append(UserProblemStatus(
+            user_id=row["user_id"],
+            problem_id=row["problem_id"],
+            status="Accepted" if row["first_accepted_at"] else row["latest_status"],
+            attempts=row["attempts"],
+            first_accepted_at=row["first_accepted_at"],
+            best_time=row["best_time"],
+            best_memory=row["best_memory"],
+            last_submitted_at=row["last_submitted_at"],
+        ))
+        if len(batch) >= 2000:
+            UserProblemStatus.objects.bulk_create(batch)
+            batch = []
+    if batch:
+        UserProblemStatus.objects.bulk_create(batch)
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ("problems", "0003_testcase_data_files"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="UserProblemStatus",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                (
+                    "status",
+                    models.CharField(
+                        choices=[
+                            ("Pending", "等待评测"),
+                            ("Judging", "评测中"),
+                            ("Accepted", "通过"),
+                            ("Wrong Answer", "答案错误"),
+                            ("Time Limit Exceeded", "超时"),
+                            ("Memory Limit Exceeded", "内存超限"),
+                            ("Runtime Error", "运行错误"),
+                            ("Compile Error", "编译错误"),
+                            ("System Error", "系统错误"),
+                        ],
+                        help_text="通过过即为通过，否则为最近一次评测结果",
+                        max_length=30,
+                        verbose_name="最好结果",
+                    ),
+                ),
+                ("attempts", models.IntegerField(default=0, verbose_name="评测次数")),
+                (
+                    "first_accepted_at",
+                    models.DateTimeField(blank=True, null=True, verbose_name="首次通过时间"),
+                ),
+                (
+                    "best_time",
+                    models.IntegerField(
+                        blank=True, null=True, verbose_name="最短运行时间(ms)"
+                    ),
+                ),
+                (
+                    "best_memory",
+                    models.IntegerField(
+                        blank=True, null=True, verbose_name="最小内存使用(KB)"
+                    ),
+                ),
+                (
+                    "last_submitted_at",
+                    models.DateTimeField(blank=True, null=True, verbose_name="最近提交时间"),
+                ),
+                (
+                    "updated_at",
+                    models.DateTimeField(auto_now=True, verbose_name="更新时间"),
+                ),
+                (
+                    "problem",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="user_statuses",
+                        to="problems.problem",
+                        verbose_name="题目",
+                    ),
+                ),
+                (
+                    "user",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="problem_statuses",
+                        to=settings.AUTH_USER_MODEL,
+                        verbose_name="用户",
+                    ),
+                ),
+            ],
+            options={
+                "verbose_name": "做题状态",
+                "verbose_name_plural": "做题状态",
+                "indexes": [
+                    models.Index(
+                        fields=["user", "status"], name="problems_us_user_id_aa40fd_idx"
+                    )
+                ],
+            },
+        ),
+        migrations.AddConstraint(
+            model_name="userproblemstatus",
+            constraint=models.UniqueConstraint(
+                fields=("user", "problem"), name="unique_user_problem_status"
+            ),
+        ),
+        migrations.RunPython(backfill_statuses, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,69 @@
+# Generated by Django 4.2.7 on 2026-10-18 04:18
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("problems", "0004_userproblemstatus"),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name="submission",
+            name="problems_su_user_id_112ba8_idx",
+        ),
+        migrations.RemoveIndex(
+            model_name="submission",
+            name="problems_su_problem_baade8_idx",
+        ),
+        migrations.RemoveIndex(
+            model_name="submission",
+            name="problems_su_status_2e2033_idx",
+        ),
+        migrations.RemoveIndex(
+            model_name="submission",
+            name="problems_su_created_ea8540_idx",
+        ),
+        migrations.AddIndex(
+            model_name="submission",
+            index=models.Index(
+                fields=["created_at", "id"], name="problems_su_created_231f93_idx"
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="submission",
+            index=models.Index(
+                fields=["user", "created_at", "id"],
+                name="problems_su_user_id_d82b38_idx",
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="submission",
+            index=models.Index(
+                fields=["problem", "created_at", "id"],
+                name="problems_su_problem_14706f_idx",
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="submission",
+            index=models.Index(
+                fields=["status", "created_at", "id"],
+                name="problems_su_status_0d26c2_idx",
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="submission",
+            index=models.Index(
+                fields=["language", "created_at", "id"],
+                name="problems_su_languag_b91aff_idx",
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="submission",
+            index=models.Index(
+                fields=["user", "status", "created_at", "id"],
+                name="problems_su_user_id_d776cf_idx",
+            ),
+        ),
+    ]
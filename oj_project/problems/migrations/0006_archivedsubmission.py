@@ -0,0 +1,95 @@
+# Generated by Django 4.2.7 on 2026-10-18 04:20
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ("problems", "0005_submission_keyset_indexes"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="ArchivedSubmission",
+            fields=[
+                (
+                    "id",
+                    models.BigIntegerField(
+                        primary_key=True, serialize=False, verbose_name="提交编号"
+                    ),
+                ),
+                (
+                    "language",
+                    models.CharField(
+                        choices=[("C++", "C++"), ("Python", "Python")],
+                        max_length=20,
+                        verbose_name="编程语言",
+                    ),
+                ),
+                (
+                    "status",
+                    models.CharField(
+                        choices=[
+                            ("Pending", "等待评测"),
+                            ("Judging", "评测中"),
+                            ("Accepted", "通过"),
+                            ("Wrong Answer", "答案错误"),
+                            ("Time Limit Exceeded", "超时"),
+                            ("Memory Limit Exceeded", "内存超限"),
+                            ("Runtime Error", "运行错误"),
+                            ("Compile Error", "编译错误"),
+                            ("System Error", "系统错误"),
+                        ],
+                        max_length=30,
+                        verbose_name="状态",
+                    ),
+                ),
+                ("score", models.IntegerField(default=0, verbose_name="得分")),
+                (
+                    "time_used",
+                    models.IntegerField(blank=True, null=True, verbose_name="运行时间(ms)"),
+                ),
+                (
+                    "memory_used",
+                    models.IntegerField(blank=True, null=True, verbose_name="内存使用(KB)"),
+                ),
+                (
+                    "payload",
+                    models.BinaryField(
+                        help_text="zlib 压缩的 JSON", verbose_name="代码和错误信息"
+                    ),
+                ),
+                ("created_at", models.DateTimeField(verbose_name="提交时间")),
+                (
+                    "archived_at",
+                    models.DateTimeField(auto_now_add=True, verbose_name="归档时间"),
+                ),
+                (
+                    "problem",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="archived_submissions",
+                        to="problems.problem",
+                        verbose_name="题目",
+                    ),
+                ),
+                (
+                    "user",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="archived_submissions",
+                        to=settings.AUTH_USER_MODEL,
+                        verbose_name="用户",
+                    ),
+                ),
+            ],
+            options={
+                "verbose_name": "归档提交记录",
+                "verbose_name_plural": "归档提交记录",
+                "ordering": ["-created_at"],
+            },
+        ),
+    ]
@@ -0,0 +1,45 @@
+# Generated by Django 4.2.7 on 2026-10-18 04:22
+
+import hashlib
+
+from django.db import migrations, models
+
+
+def backfill_versions(apps, schema_editor):
+    """为已有题目计算测试数据版本（与 Problem.compute_test_set_version 相同）"""
+    Problem = apps.get_model("problems", "Problem")
+    TestCase = apps.get_model("problems", "TestCase")
+    digests = {}
+    for problem_id, order, score, input_hash, output_hash in TestCase.objects.order_by(
+        "problem_id", "order", "id"
+    ).values_list("problem_id", "order", "score", "input_hash", "output_hash").iterator(chunk_size=2000):
+        digests.setdefault(problem_id, hashlib.sha256()).update(
+            f"{order}:{score}:{input_hash}:{output_hash}\n".encode()
+        )
+    empty = hashlib.sha256().hexdigest()
+    for problem_id in Problem.objects.values_list("id", flat=True).iterator(chunk_size=2000):
+        digest = digests.get(problem_id)
+        Problem.objects.filter(pk=problem_id).update(
+            test_set_version=digest.hexdigest() if digest else empty
+        )
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("problems", "0006_archivedsubmission"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="problem",
+            name="test_set_version",
+            field=models.CharField(
+                blank=True,
+                editable=False,
+                help_text="测试用例的顺序、分值和数据哈希的摘要，测试用例增删改时自动更新",
+                max_length=64,
+                verbose_name="测试数据版本",
+            ),
+        ),
+        migrations.RunPython(backfill_versions, migrations.RunPython.noop),
+    ]
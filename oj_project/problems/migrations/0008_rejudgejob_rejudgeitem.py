@@ -0,0 +1,180 @@
+# Generated by Django 4.2.7 on 2026-10-18 04:29
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ("problems", "0007_problem_test_set_version"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="RejudgeJob",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("description", models.CharField(max_length=200, verbose_name="重判范围")),
+                (
+                    "since",
+                    models.DateTimeField(blank=True, null=True, verbose_name="提交时间起"),
+                ),
+                (
+                    "until",
+                    models.DateTimeField(blank=True, null=True, verbose_name="提交时间止"),
+                ),
+                (
+                    "status",
+                    models.CharField(
+                        choices=[
+                            ("running", "进行中"),
+                            ("paused", "已暂停"),
+                            ("cancelling", "取消中"),
+                            ("finished", "已完成"),
+                            ("cancelled", "已取消"),
+                        ],
+                        default="running",
+                        max_length=20,
+                        verbose_name="状态",
+                    ),
+                ),
+                ("rate", models.PositiveIntegerField(verbose_name="速率上限(条/分钟)")),
+                ("total", models.IntegerField(default=0, verbose_name="提交数")),
+                ("enqueued", models.IntegerField(default=0, verbose_name="已发送")),
+                ("finished", models.IntegerField(default=0, verbose_name="已完成")),
+                ("changed", models.IntegerField(default=0, verbose_name="结果变化")),
+                (
+                    "accepted_delta",
+                    models.IntegerField(default=0, verbose_name="通过数变化"),
+                ),
+                (
+                    "created_at",
+                    models.DateTimeField(auto_now_add=True, verbose_name="创建时间"),
+                ),
+                (
+                    "finished_at",
+                    models.DateTimeField(blank=True, null=True, verbose_name="完成时间"),
+                ),
+                (
+                    "created_by",
+                    models.ForeignKey(
+                        blank=True,
+                        null=True,
+                        on_delete=django.db.models.deletion.SET_NULL,
+                        related_name="rejudge_jobs",
+                        to=settings.AUTH_USER_MODEL,
+                        verbose_name="创建者",
+                    ),
+                ),
+                (
+                    "problem",
+                    models.ForeignKey(
+                        blank=True,
+                        null=True,
+                        on_delete=django.db.models.deletion.SET_NULL,
+                        related_name="rejudge_jobs",
+                        to="problems.problem",
+                        verbose_name="题目",
+                    ),
+                ),
+                (
+                    "user",
+                    models.ForeignKey(
+                        blank=True,
+                        null=True,
+                        on_delete=django.db.models.deletion.SET_NULL,
+                        related_name="+",
+                        to=settings.AUTH_USER_MODEL,
+                        verbose_name="用户",
+                    ),
+                ),
+            ],
+            options={
+                "verbose_name": "重判任务",
+                "verbose_name_plural": "重判任务",
+                "ordering": ["-created_at"],
+            },
+        ),
+        migrations.CreateModel(
+            name="RejudgeItem",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                (
+                    "old_status",
+                    models.CharField(
+                        choices=[
+                            ("Pending", "等待评测"),
+                            ("Judging", "评测中"),
+                            ("Accepted", "通过"),
+                            ("Wrong Answer", "答案错误"),
+                            ("Time Limit Exceeded", "超时"),
+                            ("Memory Limit Exceeded", "内存超限"),
+                            ("Runtime Error", "运行错误"),
+                            ("Compile Error", "编译错误"),
+                            ("System Error", "系统错误"),
+                        ],
+                        max_length=30,
+                        verbose_name="原状态",
+                    ),
+                ),
+                (
+                    "enqueued_at",
+                    models.DateTimeField(blank=True, null=True, verbose_name="发送时间"),
+                ),
+                (
+                    "finished_at",
+                    models.DateTimeField(blank=True, null=True, verbose_name="完成时间"),
+                ),
+                (
+                    "job",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="items",
+                        to="problems.rejudgejob",
+                        verbose_name="重判任务",
+                    ),
+                ),
+                (
+                    "submission",
+                    models.OneToOneField(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="rejudge_item",
+                        to="problems.submission",
+                        verbose_name="提交记录",
+                    ),
+                ),
+            ],
+            options={
+                "verbose_name": "重判提交",
+                "verbose_name_plural": "重判提交",
+                "indexes": [
+                    models.Index(
+                        fields=["job", "enqueued_at", "submission"],
+                        name="problems_re_job_id_162b50_idx",
+                    ),
+                    models.Index(
+                        fields=["job", "finished_at"],
+                        name="problems_re_job_id_2d7ef5_idx",
+                    ),
+                ],
+            },
+        ),
+    ]
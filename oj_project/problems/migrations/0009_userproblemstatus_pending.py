@@ -0,0 +1,50 @@
+# Generated by Django 4.2.7 on 2026-10-18 04:53
+
+from django.db import migrations, models
+
+
+def backfill_pending(apps, schema_editor):
+    """只有等待评测、评测中或系统错误提交的题目写入「等待评测」状态（已有状态的不变）"""
+    UserProblemStatus = apps.get_model("problems", "UserProblemStatus")
+    for model_name in ("Submission", "ArchivedSubmission"):
+        model = apps.get_model("problems", model_name)
+        pairs = model.objects.filter(
+            status__in=["Pending", "Judging", "System Error"]
+        ).values_list("user_id", "problem_id").order_by().distinct()
+        batch = []
+        for user_id, problem_id in pairs.iterator(chunk_size=2000):
+            batch.append(UserProblemStatus(user_id=user_id, problem_id=problem_id, status="Pending"))
+            if len(batch) >= 2000:
+                UserProblemStatus.objects.bulk_create(batch, ignore_conflicts=True)
+                batch = []
+        UserProblemStatus.objects.bulk_create(batch, ignore_conflicts=True)
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("problems", "0008_rejudgejob_rejudgeitem"),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name="userproblemstatus",
+            name="status",
+            field=models.CharField(
+                choices=[
+                    ("Pending", "等待评测"),
+                    ("Judging", "评测中"),
+                    ("Accepted", "通过"),
+                    ("Wrong Answer", "答案错误"),
+                    ("Time Limit Exceeded", "超时"),
+                    ("Memory Limit Exceeded", "内存超限"),
+                    ("Runtime Error", "运行错误"),
+                    ("Compile Error", "编译错误"),
+                    ("System Error", "系统错误"),
+                ],
+                help_text="通过过即为通过，否则为最近一次评测结果；还没有评测结果时为等待评测",
+                max_length=30,
+                verbose_name="最好结果",
+            ),
+        ),
+        migrations.RunPython(backfill_pending, migrations.RunPython.noop),
+    ]
@@ -1,6 +1,10 @@
+import hashlib
+import json
+import zlib
 from django.db import models
 from django.contrib.auth.models import User
 from django.core.validators import MinValueValidator, MaxValueValidator
+from .testdata import TestDataStore
 
 
 class Tag(models.Model):
@@ -67,6 +71,14 @@ class Problem(models.Model):
         related_name='created_problems',
         verbose_name='创建者'
     )
+    test_set_version = models.CharField(
+        '测试数据版本',
+        max_length=64,
+        blank=True,
+        editable=False,
+        help_text='测试用例的顺序、分值和数据哈希的摘要，测试用例增删改时自动更新'
+    )
+    
     created_at = models.DateTimeField('创建时间', auto_now_add=True)
     updated_at = models.DateTimeField('更新时间', auto_now=True)
 
@@ -83,6 +95,48 @@ class Problem(models.Model):
     def __str__(self):
         return f"{self.id}. {self.title}"
 
+    # 不随保存整个题目写回的字段
+    DERIVED_FIELDS = ('test_set_version', 'total_submit', 'total_accepted')
+
+    def save(self, *args, **kwargs):
+        # 测试数据版本只由 refresh_test_set_version 更新，提交数和通过数只由 counters.flush_counters 用 F() 累加，
+        # 保存整个题目时都不写回（内存中的值可能已过期，写回会覆盖已累加的增量）
+        if not self._state.adding and kwargs.get('update_fields') is None:
+            kwargs['update_fields'] = [
+                field.name for field in self._meta.concrete_fields
+                if not field.primary_key and field.name not in self.DERIVED_FIELDS
+            ]
+        super().save(*args, **kwargs)
+
+    @classmethod
+    def compute_test_set_version(cls, problem_id):
+        """
+        按测试用例计算测试数据版本（只读取哈希，不读取测试数据）
+
+        内容相同的测试数据版本相同，例如导入时删除后重新创建相同的测试用例。
+        """
+        digest = hashlib.sha256()
+        for order, score, input_hash, output_hash in TestCase.objects.filter(
+            problem_id=problem_id
+        ).order_by('order', 'id').values_list('order', 'score', 'input_hash', 'output_hash'):
+            digest.update(f'{order}:{score}:{input_hash}:{output_hash}\n'.encode())
+        return digest.hexdigest()
+
+    @classmethod
+    def refresh_test_set_version(cls, problem_id):
+        """
+        重新计算并保存测试数据版本（测试用例的信号处理和不触发信号的批量操作调用）
+
+        Args:
+            problem_id: 题目ID
+
+        Returns:
+            str: 测试数据版本
+        """
+        version = cls.compute_test_set_version(problem_id)
+        cls.objects.filter(pk=problem_id).exclude(test_set_version=version).update(test_set_version=version)
+        return version
+
     @property
     def acceptance_rate(self):
         """通过率"""
@@ -114,6 +168,12 @@ class TestCase(models.Model):
     is_sample = models.BooleanField('是否为样例', default=False, help_text='样例对用户可见')
     score = models.IntegerField('分值', default=10, help_text='用于部分分题目')
     order = models.IntegerField('排序', default=0)
+    
+    # 测试数据文件（见 testdata.py），保存时自动更新
+    input_hash = models.CharField('输入数据哈希', max_length=64, blank=True, editable=False)
+    input_size = models.BigIntegerField('输入数据大小(字节)', default=0, editable=False)
+    output_hash = models.CharField('期望输出哈希', max_length=64, blank=True, editable=False)
+    output_size = models.BigIntegerField('期望输出大小(字节)', default=0, editable=False)
 
     class Meta:
         verbose_name = '测试用例'
@@ -124,6 +184,25 @@ class TestCase(models.Model):
         sample_text = '样例' if self.is_sample else '测试'
         return f"{self.problem.title} - {sample_text}用例 #{self.order}"
 
+    def save(self, *args, **kwargs):
+        update_fields = kwargs.get('update_fields')
+        deferred = self.get_deferred_fields()
+        if 'input_data' not in deferred and 'output_data' not in deferred and (
+            update_fields is None or {'input_data', 'output_data'} & set(update_fields)
+        ):
+            self.store_data()
+            if update_fields is not None:
+                kwargs['update_fields'] = set(update_fields) | {
+                    'input_hash', 'input_size', 'output_hash', 'output_size'
+                }
+        super().save(*args, **kwargs)
+
+    def store_data(self):
+        """把输入和期望输出写入测试数据文件存储，并更新哈希和大小"""
+        store = TestDataStore()
+        self.input_hash, self.input_size = store.put(self.input_data)
+        self.output_hash, self.output_size = store.put(self.output_data)
+
 
 class Submission(models.Model):
     """提交记录"""
@@ -176,11 +255,14 @@ class Submission(models.Model):
         verbose_name = '提交记录'
         verbose_name_plural = '提交记录'
         ordering = ['-created_at']
+        # 提交记录列表按 (created_at, id) 倒序游标分页，每种筛选条件对应一个复合索引
         indexes = [
-            models.Index(fields=['user']),
-            models.Index(fields=['problem']),
-            models.Index(fields=['status']),
-            models.Index(fields=['created_at']),
+            models.Index(fields=['created_at', 'id']),
+            models.Index(fields=['user', 'created_at', 'id']),
+            models.Index(fields=['problem', 'created_at', 'id']),
+            models.Index(fields=['status', 'created_at', 'id']),
+            models.Index(fields=['language', 'created_at', 'id']),
+            models.Index(fields=['user', 'status', 'created_at', 'id']),
             models.Index(fields=['user', 'problem']),
         ]
 
@@ -218,3 +300,239 @@ class Submission(models.Model):
             'System Error': 'exclamation-diamond',
         }
         return icons.get(self.status, 'circle')
+
+
+class ArchivedSubmission(models.Model):
+    """
+    归档的提交记录
+
+    较早的提交记录由 archive.archive_submissions 从 Submission 移到这里，
+    提交编号不变，代码和错误信息压缩后保存在 payload 中。
+    提交详情页和 API 在 Submission 中找不到时从这里读取（见 archive.get_submission）。
+    """
+    id = models.BigIntegerField('提交编号', primary_key=True)
+    problem = models.ForeignKey(
+        Problem,
+        on_delete=models.CASCADE,
+        related_name='archived_submissions',
+        verbose_name='题目'
+    )
+    user = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name='archived_submissions',
+        verbose_name='用户'
+    )
+    language = models.CharField('编程语言', max_length=20, choices=Submission.LANGUAGE_CHOICES)
+    status = models.CharField('状态', max_length=30, choices=Submission.STATUS_CHOICES)
+    score = models.IntegerField('得分', default=0)
+    time_used = models.IntegerField('运行时间(ms)', null=True, blank=True)
+    memory_used = models.IntegerField('内存使用(KB)', null=True, blank=True)
+    payload = models.BinaryField('代码和错误信息', help_text='zlib 压缩的 JSON')
+    created_at = models.DateTimeField('提交时间')
+    archived_at = models.DateTimeField('归档时间', auto_now_add=True)
+
+    class Meta:
+        verbose_name = '归档提交记录'
+        verbose_name_plural = '归档提交记录'
+        ordering = ['-created_at']
+
+    def __str__(self):
+        return f"#{self.id} - {self.user_id} - {self.status}"
+
+    @staticmethod
+    def pack(code, error_info):
+        return zlib.compress(json.dumps({'code': code, 'error_info': error_info}).encode(), 6)
+
+    def unpack(self):
+        """
+        Returns:
+            dict: {'code': 代码, 'error_info': 错误信息}
+        """
+        return json.loads(zlib.decompress(bytes(self.payload)))
+
+    @classmethod
+    def from_submission(cls, submission):
+        return cls(
+            id=submission.id,
+            problem_id=submission.problem_id,
+            user_id=submission.user_id,
+            language=submission.language,
+            status=submission.status,
+            score=submission.score,
+            time_used=submission.time_used,
+            memory_used=submission.memory_used,
+            payload=cls.pack(submission.code, submission.error_info),
+            created_at=submission.created_at,
+        )
+
+    def to_submission(self):
+        """还原为（未保存的）Submission 对象，供详情页和序列化器使用"""
+        submission = Submission(
+            id=self.id,
+            problem_id=self.problem_id,
+            user_id=self.user_id,
+            language=self.language,
+            status=self.status,
+            score=self.score,
+            time_used=self.time_used,
+            memory_used=self.memory_used,
+            created_at=self.created_at,
+            **self.unpack()
+        )
+        submission.is_archived = True
+        return submission
+
+
+class UserProblemStatus(models.Model):
+    """
+    用户在每道题上的做题状态
+
+    创建提交时写入（见 progress.record_attempt），每次写入评测结果时在同一事务中更新（见 progress.record_verdict），
+    题目列表、个人中心等页面直接读取，不再从提交记录中统计。
+    """
+    user = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name='problem_statuses',
+        verbose_name='用户'
+    )
+    problem = models.ForeignKey(
+        Problem,
+        on_delete=models.CASCADE,
+        related_name='user_statuses',
+        verbose_name='题目'
+    )
+    status = models.CharField(
+        '最好结果',
+        max_length=30,
+        choices=Submission.STATUS_CHOICES,
+        help_text='通过过即为通过，否则为最近一次评测结果；还没有评测结果时为等待评测'
+    )
+    attempts = models.IntegerField('评测次数', default=0)
+    first_accepted_at = models.DateTimeField('首次通过时间', null=True, blank=True)
+    best_time = models.IntegerField('最短运行时间(ms)', null=True, blank=True)
+    best_memory = models.IntegerField('最小内存使用(KB)', null=True, blank=True)
+    last_submitted_at = models.DateTimeField('最近提交时间', null=True, blank=True)
+    updated_at = models.DateTimeField('更新时间', auto_now=True)
+
+    class Meta:
+        verbose_name = '做题状态'
+        verbose_name_plural = '做题状态'
+        constraints = [
+            models.UniqueConstraint(fields=['user', 'problem'], name='unique_user_problem_status'),
+        ]
+        indexes = [
+            models.Index(fields=['user', 'status']),
+        ]
+
+    def __str__(self):
+        return f"{self.user.username} - {self.problem.title} - {self.status}"
+
+    @property
+    def is_solved(self):
+        return self.status == 'Accepted'
+
+
+class RejudgeJob(models.Model):
+    """
+    批量重判任务
+
+    由后台操作或 rejudge 管理命令创建（见 rejudge.create_job），
+    celery-beat 定期调度的 rejudge.dispatch_rejudges 按速率上限分批把提交发送到低优先级的重判队列。
+    全部重判完成后按新旧评测结果的差异更新通过数、做题状态和排行榜。
+    """
+    STATUS_CHOICES = [
+        ('running', '进行中'),
+        ('paused', '已暂停'),
+        ('cancelling', '取消中'),
+        ('finished', '已完成'),
+        ('cancelled', '已取消'),
+    ]
+
+    description = models.CharField('重判范围', max_length=200)
+    problem = models.ForeignKey(
+        Problem,
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name='rejudge_jobs',
+        verbose_name='题目'
+    )
+    user = models.ForeignKey(
+        User,
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name='+',
+        verbose_name='用户'
+    )
+    since = models.DateTimeField('提交时间起', null=True, blank=True)
+    until = models.DateTimeField('提交时间止', null=True, blank=True)
+    status = models.CharField('状态', max_length=20, choices=STATUS_CHOICES, default='running')
+    rate = models.PositiveIntegerField('速率上限(条/分钟)')
+    total = models.IntegerField('提交数', default=0)
+    enqueued = models.IntegerField('已发送', default=0)
+    finished = models.IntegerField('已完成', default=0)
+    changed = models.IntegerField('结果变化', default=0)
+    accepted_delta = models.IntegerField('通过数变化', default=0)
+    created_by = models.ForeignKey(
+        User,
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name='rejudge_jobs',
+        verbose_name='创建者'
+    )
+    created_at = models.DateTimeField('创建时间', auto_now_add=True)
+    finished_at = models.DateTimeField('完成时间', null=True, blank=True)
+
+    class Meta:
+        verbose_name = '重判任务'
+        verbose_name_plural = '重判任务'
+        ordering = ['-created_at']
+
+    def __str__(self):
+        return f"#{self.id} {self.description}"
+
+    @property
+    def progress(self):
+        """完成百分比"""
+        if not self.total:
+            return 100
+        return int(self.finished * 100 / self.total)
+
+
+class RejudgeItem(models.Model):
+    """
+    重判任务中的一条提交
+
+    记录重判前的评测结果；任务完成、差异更新到统计数据后删除。
+    一条提交同时只能在一个重判任务中。
+    """
+    job = models.ForeignKey(
+        RejudgeJob,
+        on_delete=models.CASCADE,
+        related_name='items',
+        verbose_name='重判任务'
+    )
+    submission = models.OneToOneField(
+        Submission,
+        on_delete=models.CASCADE,
+        related_name='rejudge_item',
+        verbose_name='提交记录'
+    )
+    old_status = models.CharField('原状态', max_length=30, choices=Submission.STATUS_CHOICES)
+    enqueued_at = models.DateTimeField('发送时间', null=True, blank=True)
+    finished_at = models.DateTimeField('完成时间', null=True, blank=True)
+
+    class Meta:
+        verbose_name = '重判提交'
+        verbose_name_plural = '重判提交'
+        indexes = [
+            models.Index(fields=['job', 'enqueued_at', 'submission']),
+            models.Index(fields=['job', 'finished_at']),
+        ]
+
+    def __str__(self):
+        return f"{self.job_id} - #{self.submission_id}"
@@ -0,0 +1,176 @@
+"""
+提交记录的游标分页
+
+按 (created_at, id) 降序分页，游标记录当前页边界上那条提交的 (created_at, id)，
+下一页只取排在它之后的记录。配合 Submission 上 (筛选字段, created_at, id) 的复合索引，
+数据库从索引中的对应位置开始扫描，不需要 OFFSET 和 COUNT(*)，任何一页的开销都和第一页相同。
+"""
+
+import base64
+import json
+from datetime import datetime
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import BasePagination
+from rest_framework.response import Response
+from rest_framework.utils.urls import remove_query_param, replace_query_param
+
+CURSOR_PARAM = 'cursor'
+
+
+class InvalidCursor(ValueError):
+    pass
+
+
+def encode_cursor(submission, reverse=False):
+    """
+    生成游标
+
+    Args:
+        submission: 边界上的提交记录
+        reverse: 是否为向前翻页（上一页）的游标
+    """
+    data = {'t': submission.created_at.isoformat(), 'i': submission.id}
+    if reverse:
+        data['r'] = 1
+    return base64.urlsafe_b64encode(json.dumps(data, separators=(',', ':')).encode()).decode().rstrip('=')
+
+
+def decode_cursor(cursor):
+    """
+    解析游标
+
+    Returns:
+        tuple: (created_at, id, reverse)
+
+    Raises:
+        InvalidCursor: 游标无效
+    """
+    try:
+        data = json.loads(base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4)))
+        return datetime.fromisoformat(data['t']), int(data['i']), bool(data.get('r'))
+    except (ValueError, TypeError, KeyError) as e:
+        raise InvalidCursor(cursor) from e
+
+
+class KeysetPage:
+    """一页提交记录"""
+
+    def __init__(self, items, next_cursor=None, previous_cursor=None):
+        self.items = items
+        self.next_cursor = next_cursor
+        self.previous_cursor = previous_cursor
+
+    def __iter__(self):
+        return iter(self.items)
+
+    def __len__(self):
+        return len(self.items)
+
+
+def paginate_keyset(queryset, cursor=None, page_size=50):
+    """
+    按 (created_at, id) 降序取一页
+
+    Args:
+        queryset: 已筛选的提交记录
+        cursor: 游标，None 为第一页
+        page_size: 每页数量
+
+    Returns:
+        KeysetPage
+
+    Raises:
+        InvalidCursor: 游标无效
+    """
+    if not cursor:
+        items = list(queryset.order_by('-created_at', '-id')[:page_size + 1])
+        has_more = len(items) > page_size
+        items = items[:page_size]
+        return KeysetPage(items, next_cursor=encode_cursor(items[-1]) if has_more else None)
+
+    created_at, submission_id, reverse = decode_cursor(cursor)
+    if reverse:
+        # 上一页：按升序取边界之后的记录，再反转
+        items = list(
+            queryset.filter(created_at__gte=created_at)
+            .exclude(created_at=created_at, id__lte=submission_id)
+            .order_by('created_at', 'id')[:page_size + 1]
+        )
+        has_more = len(items) > page_size
+        items = items[:page_size][::-1]
+        return KeysetPage(
+            items,
+            next_cursor=encode_cursor(items[-1]) if items else None,
+            previous_cursor=encode_cursor(items[0], reverse=True) if has_more else None,
+        )
+
+    items = list(
+        queryset.filter(created_at__lte=created_at)
+        .exclude(created_at=created_at, id__gte=submission_id)
+        .order_by('-created_at', '-id')[:page_size + 1]
+    )
+    has_more = len(items) > page_size
+    items = items[:page_size]
+    return KeysetPage(
+        items,
+        next_cursor=encode_cursor(items[-1]) if has_more else None,
+        previous_cursor=encode_cursor(items[0], reverse=True) if items else None,
+    )
+
+
+class SubmissionCursorPagination(BasePagination):
+    """提交记录 API 的游标分页（响应格式与 PageNumberPagination 相同，但没有 count）"""
+
+    page_size = 20
+    max_page_size = 100
+    page_size_query_param = 'page_size'
+
+    def get_page_size(self, request):
+        try:
+            size = int(request.query_params.get(self.page_size_query_param, self.page_size))
+        except ValueError:
+            return self.page_size
+        return max(1, min(size, self.max_page_size))
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.request = request
+        try:
+            self.page = paginate_keyset(queryset, request.query_params.get(CURSOR_PARAM), self.get_page_size(request))
+        except InvalidCursor:
+            raise NotFound('Invalid cursor')
+        return self.page.items
+
+    def _link(self, cursor):
+        if cursor is None:
+            return None
+        return replace_query_param(self.request.build_absolute_uri(), CURSOR_PARAM, cursor)
+
+    def get_paginated_response(self, data):
+        return Response({
+            'next': self._link(self.page.next_cursor),
+            'previous': self._link(self.page.previous_cursor),
+            'results': data,
+        })
+
+    def get_paginated_response_schema(self, schema):
+        return {
+            'type': 'object',
+            'properties': {
+                'next': {'type': 'string', 'nullable': True, 'format': 'uri'},
+                'previous': {'type': 'string', 'nullable': True, 'format': 'uri'},
+                'results': schema,
+            },
+        }
+
+
+def page_url(request, cursor):
+    """
+    保留筛选参数的翻页地址
+
+    Args:
+        request: 当前请求
+        cursor: 游标，None 为第一页
+    """
+    if cursor is None:
+        return remove_query_param(request.get_full_path(), CURSOR_PARAM)
+    return replace_query_param(request.get_full_path(), CURSOR_PARAM, cursor)
@@ -0,0 +1,161 @@
+"""
+用户的做题状态（UserProblemStatus）
+
+判题任务写入评测结果时调用 record_verdict，在同一事务中更新该用户在这道题上的状态：
+评测次数、最好结果、首次通过时间、通过提交中的最短运行时间和最小内存；
+同时累加用户该评测结果的提交数（counters.record_status）。
+第一次通过时同时重新统计用户的解题数（从做题状态表统计，只涉及该用户通过的题目）。
+
+等待评测、评测中和系统错误不是用户代码的评测结果，不计入状态；
+创建提交时 record_attempt 先写入一条「等待评测」的状态（评测次数为 0），题目列表据此判断是否尝试过。
+批量重判的提交（见 rejudge.py）不在评测时更新，重判任务完成后按差异统一更新。
+"""
+
+from django.db import transaction
+from django.db.models import Count, Max, Min, OuterRef, Q, Subquery
+from django.utils import timezone
+from .counters import record_status
+from .models import ArchivedSubmission, RejudgeItem, Submission, UserProblemStatus
+
+# 不计入做题状态的提交状态
+IGNORED_STATUSES = ('Pending', 'Judging', 'System Error')
+
+
+def _min(a, b):
+    if a is None:
+        return b
+    if b is None:
+        return a
+    return min(a, b)
+
+
+def record_attempt(submission):
+    """
+    记录一次提交（创建提交时调用）：第一次提交这道题时写入「等待评测」状态，已有状态时不变
+
+    Args:
+        submission: 新创建的提交记录
+    """
+    UserProblemStatus.objects.bulk_create(
+        [UserProblemStatus(user_id=submission.user_id, problem_id=submission.problem_id, status='Pending')],
+        ignore_conflicts=True
+    )
+
+
+def record_verdict(submission):
+    """
+    记录一次评测结果
+
+    Args:
+        submission: 已写入评测结果的提交记录
+
+    Returns:
+        bool: 是否是该用户第一次通过这道题
+    """
+    if _finish_rejudge(submission):
+        return False
+    if submission.status in IGNORED_STATUSES:
+        return False
+    record_status(submission)
+
+    with transaction.atomic():
+        state, _ = UserProblemStatus.objects.select_for_update().get_or_create(
+            user_id=submission.user_id,
+            problem_id=submission.problem_id,
+            defaults={'status': submission.status}
+        )
+        newly_solved = submission.status == 'Accepted' and state.first_accepted_at is None
+
+        state.attempts += 1
+        state.last_submitted_at = max(filter(None, [state.last_submitted_at, submission.created_at]))
+        if submission.status == 'Accepted':
+            state.status = 'Accepted'
+            state.first_accepted_at = _min(state.first_accepted_at, submission.created_at)
+            state.best_time = _min(state.best_time, submission.time_used)
+            state.best_memory = _min(state.best_memory, submission.memory_used)
+        elif state.first_accepted_at is None:
+            state.status = submission.status
+        state.save()
+
+        if newly_solved:
+            from oj_project.users.leaderboard import refresh_solved
+            refresh_solved(submission.user_id)
+
+    return newly_solved
+
+
+def _finish_rejudge(submission):
+    """
+    批量重判已发送的提交：只标记重判完成，并设置 submission.is_rejudge（counters.record_accepted 据此跳过）
+
+    在重判任务中但尚未发送的提交（如被单独重判）按普通评测记录，重判任务稍后仍会发送。
+
+    Returns:
+        bool: 是否是批量重判已发送的提交
+    """
+    if not RejudgeItem.objects.filter(
+        submission_id=submission.id,
+        enqueued_at__isnull=False
+    ).update(finished_at=timezone.now()):
+        return False
+    submission.is_rejudge = True
+    return True
+
+
+def _aggregate(submissions):
+    """按题目统计一个用户的提交 {题目ID: 统计}（只有不计入状态的提交的题目评测次数为 0）"""
+    accepted = Q(status='Accepted')
+    judged = ~Q(status__in=IGNORED_STATUSES)
+    latest_status = submissions.filter(
+        judged,
+        problem_id=OuterRef('problem_id')
+    ).order_by('-created_at', '-id').values('status')[:1]
+    rows = submissions.values('problem_id').annotate(
+        attempts=Count('id', filter=judged),
+        first_accepted_at=Min('created_at', filter=accepted),
+        best_time=Min('time_used', filter=accepted),
+        best_memory=Min('memory_used', filter=accepted),
+        last_submitted_at=Max('created_at', filter=judged),
+        latest_status=Subquery(latest_status),
+    ).order_by()
+    return {row['problem_id']: row for row in rows}
+
+
+def rebuild_user(user_id, problem_ids=None):
+    """
+    按提交记录（包括已归档的）重建一个用户的做题状态
+
+    Args:
+        user_id: 用户ID
+        problem_ids: 只重建这些题目上的状态，默认全部
+    """
+    scope = {'user_id': user_id}
+    if problem_ids is not None:
+        scope['problem_id__in'] = list(problem_ids)
+    rows = _aggregate(Submission.objects.filter(**scope))
+    for problem_id, old in _aggregate(ArchivedSubmission.objects.filter(**scope)).items():
+        row = rows.get(problem_id)
+        if row is None:
+            rows[problem_id] = old
+            continue
+        row['attempts'] += old['attempts']
+        for name in ('first_accepted_at', 'best_time', 'best_memory'):
+            row[name] = _min(row[name], old[name])
+        if old['last_submitted_at'] and (row['last_submitted_at'] is None or old['last_submitted_at'] > row['last_submitted_at']):
+            row['last_submitted_at'], row['latest_status'] = old['last_submitted_at'], old['latest_status']
+
+    with transaction.atomic():
+        UserProblemStatus.objects.filter(**scope).delete()
+        UserProblemStatus.objects.bulk_create([
+            UserProblemStatus(
+                user_id=user_id,
+                problem_id=problem_id,
+                status='Accepted' if row['first_accepted_at'] else row['latest_status'] or 'Pending',
+                attempts=row['attempts'],
+                first_accepted_at=row['first_accepted_at'],
+                best_time=row['best_time'],
+                best_memory=row['best_memory'],
+                last_submitted_at=row['last_submitted_at'],
+            )
+            for problem_id, row in rows.items()
+        ])
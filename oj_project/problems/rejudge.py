@@ -0,0 +1,327 @@
+"""
+批量重判
+
+题目的测试数据或时间限制修改后，用 create_job 按题目、用户、提交时间选出提交，创建重判任务（RejudgeJob）；
+后台操作（题目、提交记录）和 rejudge 管理命令都通过它创建。
+
+dispatch_rejudges 由 celery-beat 每 REJUDGE_DISPATCH_INTERVAL 秒调度一次，对每个未完成的任务：
+    1. 标记已出结果的提交为重判完成（评测时 progress.record_verdict 也会标记），
+       发送后超过 REJUDGE_TIMEOUT 秒仍没有结果的按系统错误处理
+    2. 按任务的速率上限（条/分钟）把下一批提交发送到低优先级的重判队列（routing.KIND_REJUDGE）；
+       所有任务正在重判的提交不超过 REJUDGE_MAX_IN_FLIGHT，
+       等待评测的用户提交超过 REJUDGE_YIELD_BACKLOG 时本轮不发送，不挤占用户提交的评测
+    3. 全部完成后按重判前后评测结果的差异更新通过数、做题状态和排行榜（apply_deltas）
+
+重判中的提交在评测时不更新统计数据（record_verdict 和 counters.record_accepted 跳过），通过数不会重复计算。
+已归档的提交不重判。
+"""
+
+import logging
+import math
+from collections import Counter, defaultdict
+from datetime import timedelta
+from celery import shared_task
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+from .counters import STATUS_FIELDS, increment
+from .models import RejudgeItem, RejudgeJob, Submission
+from .progress import rebuild_user
+
+logger = logging.getLogger(__name__)
+
+# 等待评测和评测中的提交（不加入重判任务）
+ACTIVE_STATUSES = ('Pending', 'Judging')
+
+# 未完成的任务状态
+OPEN_STATUSES = ('running', 'paused', 'cancelling')
+
+
+def _setting(name, default):
+    return getattr(settings, 'OJ_SETTINGS', {}).get(name, default)
+
+
+def select_submissions(problem=None, user=None, since=None, until=None, submissions=None):
+    """
+    可以重判的提交：排除等待评测、评测中和已在其他重判任务中的提交
+
+    Args:
+        problem: 题目
+        user: 用户
+        since: 提交时间不早于
+        until: 提交时间早于
+        submissions: 在这些提交（QuerySet）中选择，默认全部提交
+
+    Returns:
+        QuerySet
+    """
+    if submissions is None:
+        submissions = Submission.objects.all()
+    submissions = submissions.exclude(status__in=ACTIVE_STATUSES).filter(rejudge_item__isnull=True)
+    if problem is not None:
+        submissions = submissions.filter(problem=problem)
+    if user is not None:
+        submissions = submissions.filter(user=user)
+    if since is not None:
+        submissions = submissions.filter(created_at__gte=since)
+    if until is not None:
+        submissions = submissions.filter(created_at__lt=until)
+    return submissions
+
+
+def describe(problem=None, user=None, since=None, until=None):
+    """重判范围的说明文字"""
+    parts = []
+    if problem is not None:
+        parts.append(f'题目 #{problem.id} {problem.title}')
+    if user is not None:
+        parts.append(f'用户 {user.username}')
+    if since is not None or until is not None:
+        start = timezone.localtime(since).strftime('%Y-%m-%d %H:%M') if since else ''
+        end = timezone.localtime(until).strftime('%Y-%m-%d %H:%M') if until else ''
+        parts.append(f'提交时间 {start} ~ {end}')
+    return '，'.join(parts) or '全部提交'
+
+
+def create_job(problem=None, user=None, since=None, until=None, submissions=None,
+               rate=None, created_by=None, description=None, batch_size=2000):
+    """
+    创建重判任务
+
+    Args:
+        problem / user / since / until / submissions: 重判范围（见 select_submissions）
+        rate: 速率上限（条/分钟），默认 REJUDGE_RATE
+        created_by: 创建者
+        description: 重判范围的说明，默认按筛选条件生成
+        batch_size: 每次写入的重判提交数
+
+    Returns:
+        RejudgeJob
+    """
+    selected = select_submissions(problem, user, since, until, submissions).order_by('id')
+    with transaction.atomic():
+        job = RejudgeJob.objects.create(
+            description=(description or describe(problem, user, since, until))[:200],
+            problem=problem,
+            user=user,
+            since=since,
+            until=until,
+            rate=rate or _setting('REJUDGE_RATE', 600),
+            created_by=created_by,
+        )
+        last_id = 0
+        while True:
+            rows = list(selected.filter(id__gt=last_id).values_list('id', 'status')[:batch_size])
+            if not rows:
+                break
+            last_id = rows[-1][0]
+            # 并发创建的任务已经选中的提交被忽略
+            RejudgeItem.objects.bulk_create(
+                [RejudgeItem(job=job, submission_id=submission_id, old_status=status) for submission_id, status in rows],
+                ignore_conflicts=True
+            )
+        job.total = job.items.count()
+        if not job.total:
+            job.status = 'finished'
+            job.finished_at = timezone.now()
+        job.save(update_fields=['total', 'status', 'finished_at'])
+
+    logger.info(f"创建重判任务 #{job.id}（{job.description}），共 {job.total} 条提交")
+    return job
+
+
+def pause_job(job):
+    """暂停发送（已发送的提交照常评测）"""
+    RejudgeJob.objects.filter(pk=job.pk, status='running').update(status='paused')
+
+
+def resume_job(job):
+    RejudgeJob.objects.filter(pk=job.pk, status='paused').update(status='running')
+
+
+def cancel_job(job):
+    """
+    取消重判任务：未发送的提交不再重判，已发送的评测完成后照常更新统计数据
+    """
+    with transaction.atomic():
+        job = RejudgeJob.objects.select_for_update().get(pk=job.pk)
+        if job.status not in ('running', 'paused'):
+            return
+        job.items.filter(enqueued_at__isnull=True).delete()
+        job.total = job.items.count()
+        job.status = 'cancelling'
+        job.save(update_fields=['total', 'status'])
+
+
+def _enqueue(submissions):
+    from oj_project.judge.routing import KIND_REJUDGE, enqueue_judge
+
+    for submission in submissions:
+        try:
+            enqueue_judge(submission, kind=KIND_REJUDGE)
+        except Exception as e:
+            # 没有发送成功的提交超过 REJUDGE_TIMEOUT 后按系统错误处理
+            logger.error(f"发送重判任务失败 (submission={submission.id}): {e}")
+
+
+def _collect(job, now):
+    """标记已出结果和超时的提交为重判完成"""
+    in_flight = job.items.filter(enqueued_at__isnull=False, finished_at__isnull=True)
+    in_flight.exclude(submission__status__in=ACTIVE_STATUSES).update(finished_at=now)
+
+    deadline = now - timedelta(seconds=_setting('REJUDGE_TIMEOUT', 1800))
+    stale = list(in_flight.filter(enqueued_at__lt=deadline).values_list('submission_id', flat=True))
+    if stale:
+        Submission.objects.filter(id__in=stale, status__in=ACTIVE_STATUSES).update(
+            status='System Error',
+            error_info='重判超时'
+        )
+        job.items.filter(submission_id__in=stale).update(finished_at=now)
+        logger.warning(f"重判任务 #{job.id}: {len(stale)} 条提交超时")
+
+
+def _dispatch(job, limit, now):
+    """
+    发送下一批提交（事务提交后发送到重判队列）
+
+    Returns:
+        int: 发送数量
+    """
+    ids = list(
+        job.items.filter(enqueued_at__isnull=True, finished_at__isnull=True)
+        .order_by('submission_id')
+        .values_list('submission_id', flat=True)[:limit]
+    )
+    if not ids:
+        return 0
+    job.items.filter(submission_id__in=ids).update(enqueued_at=now)
+    Submission.objects.filter(id__in=ids).update(status='Pending')
+    submissions = list(Submission.objects.filter(id__in=ids).only('id', 'language'))
+    transaction.on_commit(lambda: _enqueue(submissions))
+    return len(ids)
+
+
+def apply_deltas(job):
+    """
+    按重判前后评测结果的差异更新统计数据（在调用方的事务中执行）
+        - 题目通过数、用户各评测结果的提交数：累加差值（counters.increment）
+        - 结果有变化的（用户, 题目）：按提交记录重建做题状态（progress.rebuild_user）
+        - 通过情况有变化的用户：重新统计解题数，排行榜随之更新（leaderboard.refresh_solved）
+
+    Args:
+        job: 重判任务
+
+    Returns:
+        tuple: (结果变化的提交数, 通过数变化)
+    """
+    from oj_project.users.leaderboard import refresh_solved
+
+    problem_deltas = Counter()
+    user_deltas = Counter()
+    # {(用户ID, 提交数字段): 差值}
+    status_deltas = Counter()
+    changed_problems = defaultdict(set)
+    changed = 0
+
+    items = job.items.order_by('submission_id').values_list(
+        'submission_id', 'submission__user_id', 'submission__problem_id', 'old_status', 'submission__status'
+    )
+    last_id = 0
+    while True:
+        rows = list(items.filter(submission_id__gt=last_id)[:2000])
+        if not rows:
+            break
+        last_id = rows[-1][0]
+        for _, user_id, problem_id, old_status, new_status in rows:
+            if old_status == new_status:
+                continue
+            changed += 1
+            changed_problems[user_id].add(problem_id)
+            for status, sign in ((old_status, -1), (new_status, 1)):
+                if status in STATUS_FIELDS:
+                    status_deltas[user_id, STATUS_FIELDS[status]] += sign
+            delta = (new_status == 'Accepted') - (old_status == 'Accepted')
+            if delta:
+                problem_deltas[problem_id] += delta
+                user_deltas[user_id] += delta
+
+    for problem_id, delta in problem_deltas.items():
+        if delta:
+            increment('problem', problem_id, 'total_accepted', delta)
+    for (user_id, field), delta in status_deltas.items():
+        if delta:
+            increment('profile', user_id, field, delta)
+    for user_id, problem_ids in changed_problems.items():
+        rebuild_user(user_id, problem_ids)
+        if user_id in user_deltas:
+            refresh_solved(user_id)
+
+    return changed, sum(problem_deltas.values())
+
+
+def _advance(job_id, budget, now):
+    """
+    推进一个重判任务
+
+    Args:
+        job_id: 重判任务ID
+        budget: 本轮最多发送的提交数
+        now: 当前时间
+
+    Returns:
+        int: 发送数量
+    """
+    with transaction.atomic():
+        # 上一轮调度还在处理的任务跳过
+        job = RejudgeJob.objects.select_for_update(skip_locked=True).filter(
+            pk=job_id, status__in=OPEN_STATUSES
+        ).first()
+        if job is None:
+            return 0
+
+        _collect(job, now)
+        sent = 0
+        if job.status == 'running' and budget > 0:
+            interval = _setting('REJUDGE_DISPATCH_INTERVAL', 5.0)
+            sent = _dispatch(job, min(budget, math.ceil(job.rate * interval / 60)), now)
+
+        job.enqueued = job.items.filter(enqueued_at__isnull=False).count()
+        job.finished = job.items.filter(finished_at__isnull=False).count()
+        update_fields = ['enqueued', 'finished']
+        if job.finished >= job.total:
+            job.changed, job.accepted_delta = apply_deltas(job)
+            job.items.all().delete()
+            job.status = 'cancelled' if job.status == 'cancelling' else 'finished'
+            job.finished_at = now
+            update_fields += ['changed', 'accepted_delta', 'status', 'finished_at']
+            logger.info(
+                f"重判任务 #{job.id} 完成：{job.finished} 条提交，结果变化 {job.changed} 条，"
+                f"通过数变化 {job.accepted_delta:+d}"
+            )
+        job.save(update_fields=update_fields)
+    return sent
+
+
+@shared_task(ignore_result=True)
+def dispatch_rejudges():
+    """
+    推进所有未完成的重判任务（由 celery-beat 定期调度）
+
+    Returns:
+        int: 本轮发送的提交数
+    """
+    now = timezone.now()
+    in_flight = RejudgeItem.objects.filter(enqueued_at__isnull=False, finished_at__isnull=True).count()
+    budget = max(0, _setting('REJUDGE_MAX_IN_FLIGHT', 20) - in_flight)
+
+    # 用户提交优先：等待评测的用户提交较多时本轮不发送
+    backlog = Submission.objects.filter(status__in=ACTIVE_STATUSES, rejudge_item__isnull=True).count()
+    if backlog > _setting('REJUDGE_YIELD_BACKLOG', 10):
+        budget = 0
+
+    sent = 0
+    for job_id in RejudgeJob.objects.filter(status__in=OPEN_STATUSES).order_by('created_at').values_list('id', flat=True):
+        enqueued = _advance(job_id, budget, now)
+        budget -= enqueued
+        sent += enqueued
+    return sent
@@ -0,0 +1,371 @@
+"""
+题目搜索索引
+
+每个 Web 进程在内存中维护公开题目的索引，题目列表页和题目 API 的筛选、搜索、排序都在内存中完成，
+只按结果中当前页的题目ID查询数据库：
+    - 标题、描述分词后的倒排索引：英文和数字按单词（查询词按前缀匹配），中文按单字和相邻两字
+    - 难度、标签（每个标签一位的位图）
+    - 提交数、通过数（用于排序）
+
+题目、标签、测试用例修改（signals.py）和计数写回（counters.flush_counters）时调用 notify_changed，
+通过 Redis 频道 oj:problem-changes 通知所有进程；各进程的订阅线程记录变化的题目，
+下一次查询前只重新读取这些题目。索引在首次查询时建立，订阅断开重连后重建（期间的通知可能丢失）；
+Redis 不可用时每 FALLBACK_REFRESH 秒重建一次。
+"""
+
+import bisect
+import logging
+import os
+import re
+import threading
+import time
+from dataclasses import dataclass, field
+from django.db import transaction
+from oj_project.judge.redis_client import create_listener_redis, get_redis
+
+logger = logging.getLogger(__name__)
+
+CHANGES_CHANNEL = 'oj:problem-changes'
+
+# 订阅不可用时的全量重建间隔（秒）
+FALLBACK_REFRESH = 60
+
+DIFFICULTY_ORDER = {'Easy': 0, 'Medium': 1, 'Hard': 2}
+
+# 排序方式: 排序键（均以题目ID作为次要排序）
+ORDERINGS = {
+    'id': lambda doc: doc.id,
+    'difficulty': lambda doc: (DIFFICULTY_ORDER.get(doc.difficulty, 0), doc.id),
+    'total_submit': lambda doc: (doc.total_submit, doc.id),
+    'total_accepted': lambda doc: (doc.total_accepted, doc.id),
+}
+
+_WORD_RE = re.compile(r'[0-9a-z]+|[\u3400-\u4dbf\u4e00-\u9fff\uf900-\ufaff]+')
+
+
+def tokenize(text, query=False):
+    """
+    分词
+
+    Args:
+        text: 文本
+        query: 是否为查询词（中文查询词只取相邻两字，单个字时取单字）
+
+    Returns:
+        set: 词
+    """
+    tokens = set()
+    for run in _WORD_RE.findall((text or '').lower()):
+        if run.isascii():
+            tokens.add(run)
+            continue
+        if not query or len(run) == 1:
+            tokens.update(run)
+        tokens.update(run[i:i + 2] for i in range(len(run) - 1))
+    return tokens
+
+
+@dataclass
+class ProblemDoc:
+    id: int
+    title: str
+    difficulty: str
+    tag_mask: int
+    total_submit: int
+    total_accepted: int
+    tokens: dict = field(default_factory=dict)  # {字段: 词集合}
+
+
+class TextIndex:
+    """一个字段的倒排索引"""
+
+    def __init__(self):
+        self.postings = {}
+        self._vocabulary = None  # 排序后的英文词表（前缀匹配用），修改后重新生成
+
+    def add(self, doc_id, tokens):
+        for token in tokens:
+            self.postings.setdefault(token, set()).add(doc_id)
+        self._vocabulary = None
+
+    def remove(self, doc_id, tokens):
+        for token in tokens:
+            ids = self.postings.get(token)
+            if ids is not None:
+                ids.discard(doc_id)
+                if not ids:
+                    del self.postings[token]
+        self._vocabulary = None
+
+    def match(self, token):
+        """包含该词的题目ID（英文词按前缀匹配）"""
+        if not token.isascii():
+            return self.postings.get(token, set())
+        if self._vocabulary is None:
+            self._vocabulary = sorted(t for t in self.postings if t.isascii())
+        ids = set()
+        start = bisect.bisect_left(self._vocabulary, token)
+        for word in self._vocabulary[start:]:
+            if not word.startswith(token):
+                break
+            ids |= self.postings[word]
+        return ids
+
+
+class ProblemIndex:
+    """公开题目的内存索引（线程安全）"""
+
+    TEXT_FIELDS = ('title', 'description')
+
+    def __init__(self):
+        self._lock = threading.RLock()
+        self.docs = {}
+        self.text = {name: TextIndex() for name in self.TEXT_FIELDS}
+        self.tag_bits = {}  # 标签名称: 位
+        self._orders = {}  # 排序方式: 排序后的题目ID，索引修改后清空
+        self._changed = {}  # 题目ID: 是否只有统计数据变化
+        self._needs_rebuild = True
+        self._built_at = 0
+        self._listening = False
+        self._listener_pid = None
+
+    # ---- 维护 ----
+
+    def _tag_mask(self, tag_names):
+        mask = 0
+        for name in tag_names:
+            if name not in self.tag_bits:
+                self.tag_bits[name] = len(self.tag_bits)
+            mask |= 1 << self.tag_bits[name]
+        return mask
+
+    def _remove(self, problem_id):
+        doc = self.docs.pop(problem_id, None)
+        if doc is not None:
+            for name, tokens in doc.tokens.items():
+                self.text[name].remove(problem_id, tokens)
+
+    def _add(self, problem):
+        doc = ProblemDoc(
+            id=problem.id,
+            title=problem.title,
+            difficulty=problem.difficulty,
+            tag_mask=self._tag_mask(tag.name for tag in problem.tags.all()),
+            total_submit=problem.total_submit,
+            total_accepted=problem.total_accepted,
+            tokens={name: tokenize(getattr(problem, name)) for name in self.TEXT_FIELDS},
+        )
+        for name, tokens in doc.tokens.items():
+            self.text[name].add(doc.id, tokens)
+        self.docs[doc.id] = doc
+
+    def _load(self, problem_ids=None):
+        from .models import Problem
+
+        problems = Problem.objects.filter(is_public=True).only(
+            'id', 'title', 'description', 'difficulty', 'total_submit', 'total_accepted'
+        ).prefetch_related('tags')
+        if problem_ids is not None:
+            problems = problems.filter(id__in=problem_ids)
+        return problems
+
+    def rebuild(self):
+        """从数据库重建索引"""
+        with self._lock:
+            self.docs = {}
+            self.text = {name: TextIndex() for name in self.TEXT_FIELDS}
+            self.tag_bits = {}
+            self._changed = {}
+            for problem in self._load().iterator(chunk_size=500):
+                self._add(problem)
+            self._orders = {}
+            self._needs_rebuild = False
+            self._built_at = time.monotonic()
+
+    def _apply_changes(self):
+        from .models import Problem
+
+        changed, self._changed = self._changed, {}
+        stats_only = [problem_id for problem_id, only in changed.items() if only and problem_id in self.docs]
+        full = [problem_id for problem_id, only in changed.items() if not only or problem_id not in self.docs]
+
+        for problem_id, total_submit, total_accepted in Problem.objects.filter(
+            id__in=stats_only
+        ).values_list('id', 'total_submit', 'total_accepted'):
+            doc = self.docs[problem_id]
+            doc.total_submit, doc.total_accepted = total_submit, total_accepted
+
+        if full:
+            for problem_id in full:
+                self._remove(problem_id)
+            for problem in self._load(full):
+                self._add(problem)
+        self._orders = {}
+
+    def mark_changed(self, problem_id, stats_only=False):
+        with self._lock:
+            self._changed[problem_id] = stats_only and self._changed.get(problem_id, True)
+
+    def _ensure_current(self):
+        self._start_listener()
+        if self._needs_rebuild or (not self._listening and time.monotonic() - self._built_at > FALLBACK_REFRESH):
+            self.rebuild()
+        elif self._changed:
+            self._apply_changes()
+
+    # ---- 变更通知 ----
+
+    def _start_listener(self):
+        # fork 出的子进程中线程不存在，按 pid 重新启动
+        if self._listener_pid == os.getpid():
+            return
+        self._listener_pid = os.getpid()
+        self._listening = False
+        self._needs_rebuild = True
+        self._subscribed = threading.Event()
+        threading.Thread(target=self._listen, args=(self._subscribed,), name='problem-index-listener', daemon=True).start()
+        # 先订阅再建立索引，建立期间的修改不会漏掉
+        self._subscribed.wait(2)
+
+    def _listen(self, subscribed):
+        while True:
+            client = None
+            try:
+                client = create_listener_redis()
+                pubsub = client.pubsub(ignore_subscribe_messages=True)
+                pubsub.subscribe(CHANGES_CHANNEL)
+                if subscribed.is_set():
+                    # 重新订阅：断开期间的通知可能丢失
+                    self._needs_rebuild = True
+                subscribed.set()
+                self._listening = True
+                for message in pubsub.listen():
+                    problem_id, _, kind = message['data'].partition(':')
+                    self.mark_changed(int(problem_id), stats_only=kind == 'stats')
+            except Exception as e:
+                logger.warning(f"题目索引订阅断开: {e}")
+            finally:
+                self._listening = False
+                if client is not None:
+                    client.close()
+            time.sleep(5)
+
+    # ---- 查询 ----
+
+    def _ordered(self, ordering):
+        ids = self._orders.get(ordering)
+        if ids is None:
+            ids = [doc.id for doc in sorted(self.docs.values(), key=ORDERINGS[ordering])]
+            self._orders[ordering] = ids
+        return ids
+
+    def _match_terms(self, query, fields):
+        """每个查询词（空格分隔）都出现在任一字段中的题目；纯数字的查询词还匹配题目ID"""
+        matched = None
+        for term in query.split():
+            term_ids = set()
+            for name in fields:
+                field_ids = None
+                for token in tokenize(term, query=True):
+                    ids = self.text[name].match(token)
+                    field_ids = set(ids) if field_ids is None else field_ids & ids
+                term_ids |= field_ids or set()
+            if term.isdigit():
+                term_ids |= {doc_id for doc_id in self.docs if term in str(doc_id)}
+            matched = term_ids if matched is None else matched & term_ids
+        return matched
+
+    def search(self, query='', fields=('title',), difficulty=None, tags=(), ordering='id'):
+        """
+        筛选、搜索并排序
+
+        Args:
+            query: 搜索词
+            fields: 搜索的字段（'title' / 'description'）
+            difficulty: 难度
+            tags: 标签名称（须全部包含）
+            ordering: 排序方式（ORDERINGS 中的键，前面加 '-' 为降序）
+
+        Returns:
+            list: 排序后的题目ID
+        """
+        descending = ordering.startswith('-')
+        ordering = ordering.lstrip('-')
+        if ordering not in ORDERINGS:
+            ordering, descending = 'id', False
+
+        with self._lock:
+            self._ensure_current()
+
+            mask = 0
+            for name in tags:
+                if name not in self.tag_bits:
+                    return []
+                mask |= 1 << self.tag_bits[name]
+            matched = self._match_terms(query, fields) if query.strip() else None
+
+            ids = self._ordered(ordering)
+            if descending:
+                ids = ids[::-1]
+            docs = self.docs
+            return [
+                doc_id for doc_id in ids
+                if (matched is None or doc_id in matched)
+                and (not difficulty or docs[doc_id].difficulty == difficulty)
+                and docs[doc_id].tag_mask & mask == mask
+            ]
+
+    def count(self):
+        with self._lock:
+            self._ensure_current()
+            return len(self.docs)
+
+
+_index = ProblemIndex()
+
+
+def problem_index():
+    return _index
+
+
+def notify_changed(*problem_ids, stats_only=False):
+    """
+    通知所有进程题目已修改（在当前事务提交后发送）
+
+    Args:
+        problem_ids: 题目ID
+        stats_only: 是否只有提交数、通过数变化
+    """
+    suffix = ':stats' if stats_only else ''
+
+    def send():
+        try:
+            pipe = get_redis().pipeline(transaction=False)
+            for problem_id in problem_ids:
+                pipe.publish(CHANGES_CHANNEL, f'{problem_id}{suffix}')
+            pipe.execute()
+        except Exception as e:
+            logger.warning(f"发送题目修改通知失败: {e}")
+        # 本进程直接标记，不等待通知
+        for problem_id in problem_ids:
+            _index.mark_changed(problem_id, stats_only)
+
+    if problem_ids:
+        transaction.on_commit(send)
+
+
+def fetch_problems(problem_ids):
+    """
+    按给定顺序读取题目（含标签），计数加上 Redis 中尚未写回的增量
+
+    Args:
+        problem_ids: 题目ID列表
+
+    Returns:
+        list: 题目
+    """
+    from .counters import apply_pending
+    from .models import Problem
+
+    problems = Problem.objects.prefetch_related('tags').in_bulk(list(problem_ids))
+    return apply_pending('problem', [problems[problem_id] for problem_id in problem_ids if problem_id in problems])
@@ -0,0 +1,58 @@
+"""
+题目相关的信号处理
+
+题目、标签、测试用例修改后使题目缓存失效（见 cache.py），
+题目和标签修改后通知各进程更新题目搜索索引（见 search.py），
+测试用例增删改后更新题目的测试数据版本（Problem.test_set_version）。
+"""
+
+from django.db.models.signals import m2m_changed, post_delete, post_save, pre_delete
+from django.dispatch import receiver
+from .cache import bump_problem
+from .models import Problem, Tag, TestCase
+from .search import notify_changed
+
+STATS_FIELDS = {'total_submit', 'total_accepted'}
+
+
+def _problems_changed(*problem_ids):
+    bump_problem(*problem_ids)
+    notify_changed(*problem_ids)
+
+
+@receiver([post_save, post_delete], sender=Problem)
+def problem_changed(sender, instance, update_fields=None, **kwargs):
+    # 只更新统计字段时题面不变
+    if update_fields is not None and set(update_fields) <= STATS_FIELDS:
+        notify_changed(instance.pk, stats_only=True)
+        return
+    _problems_changed(instance.pk)
+
+
+@receiver([post_save, post_delete], sender=TestCase)
+def test_case_changed(sender, instance, **kwargs):
+    # 删除题目时级联删除的测试用例也会触发，此时题目已不存在，更新不影响任何行
+    Problem.refresh_test_set_version(instance.problem_id)
+    bump_problem(instance.problem_id)
+
+
+def _tagged_problem_ids(tag):
+    return Problem.objects.filter(tags=tag).values_list('id', flat=True)
+
+
+@receiver(m2m_changed, sender=Problem.tags.through)
+def problem_tags_changed(sender, instance, action, reverse, pk_set, **kwargs):
+    if not reverse:
+        if action in ('post_add', 'post_remove', 'post_clear'):
+            _problems_changed(instance.pk)
+    elif action in ('post_add', 'post_remove'):
+        # 从标签一侧修改时 instance 是标签，pk_set 是题目ID
+        _problems_changed(*pk_set)
+    elif action == 'pre_clear':
+        _problems_changed(*_tagged_problem_ids(instance))
+
+
+@receiver([post_save, pre_delete], sender=Tag)
+def tag_changed(sender, instance, **kwargs):
+    # 标签名称、颜色显示在题目页面上
+    _problems_changed(*_tagged_problem_ids(instance))
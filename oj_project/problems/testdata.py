@@ -0,0 +1,130 @@
+"""
+测试数据文件存储
+
+测试用例的输入和期望输出除了保存在数据库中，还以内容寻址的方式保存为文件：
+    <TESTDATA_DIR>/<sha256 前两位>/<sha256>
+
+判题时直接把输入文件作为程序的标准输入，期望输出通过 mmap 读取，
+不再经过数据库连接传输大文本，也不在判题进程中复制成 Python 字符串。
+"""
+
+import hashlib
+import mmap
+import os
+import tempfile
+from contextlib import contextmanager
+from django.conf import settings
+
+
+class TestDataStore:
+    """内容寻址的测试数据文件存储"""
+
+    def __init__(self, root=None):
+        self.root = root or settings.OJ_SETTINGS.get(
+            'TESTDATA_DIR', os.path.join(settings.MEDIA_ROOT, 'testdata')
+        )
+
+    def path(self, digest):
+        return os.path.join(self.root, digest[:2], digest)
+
+    def exists(self, digest):
+        return bool(digest) and os.path.exists(self.path(digest))
+
+    def put(self, text):
+        """
+        保存测试数据（内容相同的文件只保存一份）
+
+        Args:
+            text: 字符串或 UTF-8 编码的字节串
+
+        Returns:
+            tuple: (sha256 十六进制摘要, 字节数)
+        """
+        data = text if isinstance(text, bytes) else (text or '').encode('utf-8')
+        digest = hashlib.sha256(data).hexdigest()
+        path = self.path(digest)
+        if not os.path.exists(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            # 先写入临时文件，再原子地重命名，避免判题进程读到不完整的文件
+            fd, staging = tempfile.mkstemp(prefix='.staging-', dir=os.path.dirname(path))
+            try:
+                with os.fdopen(fd, 'wb') as f:
+                    f.write(data)
+                os.replace(staging, path)
+            except BaseException:
+                if os.path.exists(staging):
+                    os.remove(staging)
+                raise
+        return digest, len(data)
+
+
+def store_data(root, data):
+    """
+    在指定目录的存储中保存测试数据（供导入命令在工作进程中并行调用，不依赖 Django 配置）
+
+    Returns:
+        tuple: (sha256 十六进制摘要, 字节数)
+    """
+    return TestDataStore(root).put(data)
+
+
+def materialize(test_case, store=None):
+    """
+    获取测试用例的输入、输出文件路径
+
+    文件缺失（如新部署的判题机、旧数据尚未写入文件）时从数据库读取并写入存储。
+    调用方可以在查询时 defer('input_data', 'output_data')，文件存在时不会读取这两个字段。
+
+    Returns:
+        tuple: (输入文件路径, 期望输出文件路径)
+    """
+    store = store or TestDataStore()
+    if not (store.exists(test_case.input_hash) and store.exists(test_case.output_hash)):
+        from .models import Problem, TestCase
+        input_data, output_data = TestCase.objects.values_list(
+            'input_data', 'output_data'
+        ).get(pk=test_case.pk)
+        input_hash, input_size = store.put(input_data)
+        output_hash, output_size = store.put(output_data)
+        if (input_hash, output_hash) != (test_case.input_hash, test_case.output_hash):
+            TestCase.objects.filter(pk=test_case.pk).update(
+                input_hash=input_hash,
+                input_size=input_size,
+                output_hash=output_hash,
+                output_size=output_size,
+            )
+            test_case.input_hash, test_case.input_size = input_hash, input_size
+            test_case.output_hash, test_case.output_size = output_hash, output_size
+            Problem.refresh_test_set_version(test_case.problem_id)
+    return store.path(test_case.input_hash), store.path(test_case.output_hash)
+
+
+def map_file(path):
+    """
+    以只读方式 mmap 文件
+
+    Returns:
+        mmap.mmap | bytes: 空文件无法 mmap，返回 b''
+    """
+    with open(path, 'rb') as f:
+        if os.fstat(f.fileno()).st_size == 0:
+            return b''
+        return mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+
+@contextmanager
+def open_case_data(test_case, store=None):
+    """
+    打开测试用例的数据文件
+
+    Yields:
+        tuple: (输入文件（二进制，可直接作为子进程的标准输入）, 期望输出（mmap 或 b''）)
+    """
+    input_path, output_path = materialize(test_case, store)
+    expected_output = map_file(output_path)
+    try:
+        with open(input_path, 'rb') as input_file:
+            yield input_file, expected_output
+    finally:
+        if isinstance(expected_output, mmap.mmap):
+            expected_output.close()
@@ -1,20 +1,29 @@
+from django.http import Http404
 from django.shortcuts import render, get_object_or_404
+from django.template.loader import render_to_string
 from django.contrib.auth.decorators import login_required
-from django.conf import settings
-from django.db.models import Q
 from rest_framework import viewsets, status, filters
 from rest_framework.decorators import action
 from rest_framework.response import Response
 from rest_framework.permissions import IsAuthenticated, IsAuthenticatedOrReadOnly
 from django_filters.rest_framework import DjangoFilterBackend
 
-from .models import Problem, Submission, Tag
+from .archive import get_submission
+from .cache import cached_problem
+from .counters import record_submit
+from .models import Problem, Submission, Tag, UserProblemStatus
+from .pagination import CURSOR_PARAM, InvalidCursor, SubmissionCursorPagination, page_url, paginate_keyset
+from .progress import record_attempt
+from .search import fetch_problems, problem_index
 from .serializers import (
     ProblemListSerializer, ProblemDetailSerializer,
     SubmissionListSerializer, SubmissionDetailSerializer,
     SubmissionCreateSerializer, TagSerializer
 )
 
+# 提交记录页面每页数量
+SUBMISSION_PAGE_SIZE = 50
+
 
 # ========== 网页视图 ==========
 
@@ -29,53 +38,21 @@ def problem_list(request):
     order_by = request.GET.get('order_by', 'id')  # 排序字段
     status_filter = request.GET.get('status', '')  # 用户完成状态筛选
     
-    # 基础查询
-    problems = Problem.objects.filter(is_public=True).prefetch_related('tags')
-    
-    # 难度筛选
-    if difficulty:
-        problems = problems.filter(difficulty=difficulty)
-    
-    # 标签筛选
-    if tag:
-        problems = problems.filter(tags__name=tag)
-    
-    # 搜索
-    if search:
-        problems = problems.filter(
-            Q(title__icontains=search) | Q(id__icontains=search)
-        )
-    
-    # 用户完成状态筛选（仅对登录用户）
+    # 用户完成状态（仅对登录用户）
     solved_problem_ids = set()
     attempted_problem_ids = set()
     if request.user.is_authenticated:
-        # 获取用户已解决的题目
-        solved_problem_ids = set(
-            Submission.objects.filter(
-                user=request.user,
-                status='Accepted'
-            ).values_list('problem_id', flat=True).distinct()
-        )
-        
-        # 获取用户尝试过但未解决的题目
-        attempted_problem_ids = set(
-            Submission.objects.filter(
-                user=request.user
-            ).exclude(
-                problem_id__in=solved_problem_ids
-            ).values_list('problem_id', flat=True).distinct()
-        )
-        
-        # 根据状态筛选
-        if status_filter == 'solved':
-            problems = problems.filter(id__in=solved_problem_ids)
-        elif status_filter == 'attempted':
-            problems = problems.filter(id__in=attempted_problem_ids)
-        elif status_filter == 'not_attempted':
-            problems = problems.exclude(id__in=solved_problem_ids | attempted_problem_ids)
+        # 已解决和尝试过但未解决的题目（从做题状态表读取）
+        for problem_id, problem_status in UserProblemStatus.objects.filter(
+            user=request.user
+        ).values_list('problem_id', 'status'):
+            if problem_status == 'Accepted':
+                solved_problem_ids.add(problem_id)
+            else:
+                # 包括还没有评测结果的题目（创建提交时写入「等待评测」状态）
+                attempted_problem_ids.add(problem_id)
     
-    # 排序
+    # 难度、标签筛选，按标题或题号搜索，排序（在内存索引中完成）
     order_map = {
         'id': 'id',
         '-id': '-id',
@@ -84,21 +61,37 @@ def problem_list(request):
         'acceptance': 'total_accepted',  # 通过数排序
         '-acceptance': '-total_accepted',
     }
-    if order_by in order_map:
-        problems = problems.order_by(order_map[order_by])
-    else:
-        problems = problems.order_by('id')
+    problem_ids = problem_index().search(
+        query=search,
+        fields=('title',),
+        difficulty=difficulty or None,
+        tags=[tag] if tag else [],
+        ordering=order_map.get(order_by, 'id'),
+    )
+    
+    # 根据完成状态筛选
+    if request.user.is_authenticated:
+        if status_filter == 'solved':
+            problem_ids = [i for i in problem_ids if i in solved_problem_ids]
+        elif status_filter == 'attempted':
+            problem_ids = [i for i in problem_ids if i in attempted_problem_ids]
+        elif status_filter == 'not_attempted':
+            problem_ids = [
+                i for i in problem_ids
+                if i not in solved_problem_ids and i not in attempted_problem_ids
+            ]
     
-    # 分页
-    paginator = Paginator(problems, 20)  # 每页20题
+    # 分页（只读取当前页的题目）
+    paginator = Paginator(problem_ids, 20)  # 每页20题
     page_number = request.GET.get('page', 1)
     page_obj = paginator.get_page(page_number)
+    page_obj.object_list = fetch_problems(page_obj.object_list)
     
     # 获取所有标签
     tags = Tag.objects.all()
     
     # 题目统计
-    total_count = Problem.objects.filter(is_public=True).count()
+    total_count = problem_index().count()
     solved_count = len(solved_problem_ids) if request.user.is_authenticated else 0
     
     context = {
@@ -118,9 +111,19 @@ def problem_list(request):
     return render(request, 'problems/problem_list.html', context)
 
 
+def _build_problem_page(problem_id):
+    """题目详情页中所有用户相同的部分（题目和渲染好的题面）"""
+    problem = get_object_or_404(Problem.objects.prefetch_related('tags'), id=problem_id, is_public=True)
+    return {
+        'problem': problem,
+        'statement_html': render_to_string('problems/problem_statement.html', {'problem': problem}),
+    }
+
+
 def problem_detail(request, problem_id):
     """题目详情页面"""
-    problem = get_object_or_404(Problem, id=problem_id, is_public=True)
+    page = cached_problem(problem_id, 'page', lambda: _build_problem_page(problem_id))
+    problem = page['problem']
     
     # 获取用户对该题的提交记录
     user_submissions = []
@@ -132,6 +135,7 @@ def problem_detail(request, problem_id):
     
     context = {
         'problem': problem,
+        'statement_html': page['statement_html'],
         'user_submissions': user_submissions,
     }
     
@@ -155,25 +159,13 @@ def submit_code(request, problem_id):
             status='Pending'
         )
         
-        # 根据配置选择判题方式
-        judge_method = settings.OJ_SETTINGS.get('JUDGE_METHOD', 'traditional')
+        # 根据配置选择判题方式，按语言发送到对应的判题队列
+        from oj_project.judge.routing import enqueue_judge
+        enqueue_judge(submission)
         
-        if judge_method == 'judge0':
-            # 使用Judge0专业沙箱判题（阶段3）
-            from oj_project.judge.tasks_judge0 import judge_submission_judge0
-            judge_submission_judge0.delay(submission.id)
-        elif judge_method == 'docker' and settings.OJ_SETTINGS.get('DOCKER_JUDGE_ENABLED', False):
-            # 使用Docker容器判题（阶段2）
-            from oj_project.judge.tasks_docker import judge_submission_docker
-            judge_submission_docker.delay(submission.id)
-        else:
-            # 使用传统判题方式（阶段1）
-            from oj_project.judge.tasks import judge_submission
-            judge_submission.delay(submission.id)
-        
-        # 更新题目提交次数
-        problem.total_submit += 1
-        problem.save()
+        # 更新提交计数（Redis 中累加，定期写回数据库）
+        record_submit(submission)
+        record_attempt(submission)
         
         # 重定向到提交详情页
         from django.shortcuts import redirect
@@ -184,7 +176,11 @@ def submit_code(request, problem_id):
 
 def submission_detail(request, submission_id):
     """提交详情页面"""
-    submission = get_object_or_404(Submission, id=submission_id)
+    # 已归档的提交从归档表读取
+    try:
+        submission = get_submission(submission_id)
+    except Submission.DoesNotExist:
+        raise Http404('提交记录不存在')
     
     # 权限检查：只有提交者本人或管理员可以查看
     if not request.user.is_staff and submission.user != request.user:
@@ -199,24 +195,42 @@ def submission_detail(request, submission_id):
 
 
 def submission_list(request):
-    """提交记录列表页面"""
-    submissions = Submission.objects.select_related('user', 'problem').all()
+    """提交记录列表页面（按提交时间倒序，游标分页）"""
+    submissions = Submission.objects.select_related('user', 'problem')
     
     # 筛选条件
     status_filter = request.GET.get('status', '')
     language_filter = request.GET.get('language', '')
+    problem_filter = request.GET.get('problem', '')
+    user_filter = request.GET.get('user', '')
     
     if status_filter:
         submissions = submissions.filter(status=status_filter)
     if language_filter:
         submissions = submissions.filter(language=language_filter)
+    if problem_filter.isdigit():
+        submissions = submissions.filter(problem_id=int(problem_filter))
     
     # 如果不是管理员，只显示自己的提交
     if not request.user.is_staff and request.user.is_authenticated:
         submissions = submissions.filter(user=request.user)
+    elif user_filter:
+        # 先查出用户ID，按 (user, created_at, id) 索引扫描
+        from django.contrib.auth.models import User
+        user_id = User.objects.filter(username=user_filter).values_list('id', flat=True).first()
+        submissions = submissions.filter(user_id=user_id) if user_id else submissions.none()
+    
+    try:
+        page = paginate_keyset(submissions, request.GET.get(CURSOR_PARAM), SUBMISSION_PAGE_SIZE)
+    except InvalidCursor:
+        # 无效的游标回到第一页
+        page = paginate_keyset(submissions, None, SUBMISSION_PAGE_SIZE)
     
     context = {
-        'submissions': submissions[:50],  # 限制显示数量
+        'submissions': page,
+        'first_url': page_url(request, None),
+        'next_url': page_url(request, page.next_cursor) if page.next_cursor else None,
+        'previous_url': page_url(request, page.previous_cursor) if page.previous_cursor else None,
         'status_choices': Submission.STATUS_CHOICES,
         'language_choices': Submission.LANGUAGE_CHOICES,
     }
@@ -240,16 +254,45 @@ class ProblemViewSet(viewsets.ReadOnlyModelViewSet):
         if self.action == 'retrieve':
             return ProblemDetailSerializer
         return ProblemListSerializer
+    
+    def retrieve(self, request, *args, **kwargs):
+        # 题目详情对所有用户相同，使用版本化缓存
+        try:
+            problem_id = int(kwargs[self.lookup_field])
+        except (KeyError, ValueError):
+            return super().retrieve(request, *args, **kwargs)
+        
+        def build():
+            return super(ProblemViewSet, self).retrieve(request, *args, **kwargs).data
+        
+        return Response(cached_problem(problem_id, 'api', build))
+    
+    def list(self, request, *args, **kwargs):
+        # 列表由内存索引筛选、搜索和排序（参数与 filter_backends 相同），只读取当前页的题目
+        params = request.query_params
+        problem_ids = problem_index().search(
+            query=params.get('search', ''),
+            fields=self.search_fields,
+            difficulty=params.get('difficulty') or None,
+            ordering=(params.get('ordering') or 'id').split(',')[0].strip(),
+        )
+        
+        page = self.paginate_queryset(problem_ids)
+        problems = fetch_problems(page if page is not None else problem_ids)
+        serializer = self.get_serializer(problems, many=True)
+        if page is not None:
+            return self.get_paginated_response(serializer.data)
+        return Response(serializer.data)
 
 
 class SubmissionViewSet(viewsets.ModelViewSet):
     """提交记录 API ViewSet"""
     serializer_class = SubmissionListSerializer
     permission_classes = [IsAuthenticated]
-    filter_backends = [DjangoFilterBackend, filters.OrderingFilter]
-    filterset_fields = ['status', 'language', 'problem']
-    ordering_fields = ['created_at']
-    ordering = ['-created_at']
+    filter_backends = [DjangoFilterBackend]
+    filterset_fields = ['status', 'language', 'problem', 'user']
+    # 固定按 (created_at, id) 倒序，游标分页
+    pagination_class = SubmissionCursorPagination
     
     def get_queryset(self):
         """用户只能查看自己的提交，管理员可以查看所有"""
@@ -257,6 +300,19 @@ class SubmissionViewSet(viewsets.ModelViewSet):
             return Submission.objects.all()
         return Submission.objects.filter(user=self.request.user)
     
+    def retrieve(self, request, *args, **kwargs):
+        """提交详情（已归档的提交从归档表读取）"""
+        try:
+            return super().retrieve(request, *args, **kwargs)
+        except Http404:
+            try:
+                submission = get_submission(int(kwargs['pk']))
+            except (ValueError, Submission.DoesNotExist):
+                raise Http404
+            if not request.user.is_staff and submission.user_id != request.user.id:
+                raise Http404
+            return Response(SubmissionDetailSerializer(submission).data)
+    
     def get_serializer_class(self):
         if self.action == 'create':
             return SubmissionCreateSerializer
@@ -270,26 +326,13 @@ class SubmissionViewSet(viewsets.ModelViewSet):
         serializer.is_valid(raise_exception=True)
         submission = serializer.save()
         
-        # 更新题目提交次数
-        problem = submission.problem
-        problem.total_submit += 1
-        problem.save()
-        
-        # 根据配置选择判题方式
-        judge_method = settings.OJ_SETTINGS.get('JUDGE_METHOD', 'traditional')
+        # 更新提交计数（Redis 中累加，定期写回数据库）
+        record_submit(submission)
+        record_attempt(submission)
         
-        if judge_method == 'judge0':
-            # 使用Judge0专业沙箱判题（阶段3）
-            from oj_project.judge.tasks_judge0 import judge_submission_judge0
-            judge_submission_judge0.delay(submission.id)
-        elif judge_method == 'docker' and settings.OJ_SETTINGS.get('DOCKER_JUDGE_ENABLED', False):
-            # 使用Docker容器判题（阶段2）
-            from oj_project.judge.tasks_docker import judge_submission_docker
-            judge_submission_docker.delay(submission.id)
-        else:
-            # 使用传统判题方式（阶段1）
-            from oj_project.judge.tasks import judge_submission
-            judge_submission.delay(submission.id)
+        # 根据配置选择判题方式，按语言发送到对应的判题队列
+        from oj_project.judge.routing import enqueue_judge
+        enqueue_judge(submission)
         
         return Response(
             SubmissionDetailSerializer(submission).data,
@@ -184,13 +184,55 @@ CORS_ALLOWED_ORIGINS = config(
 
 CORS_ALLOW_CREDENTIALS = True
 
+# Redis（Celery broker 和评测状态推送共用）
+REDIS_URL = config('REDIS_URL', default='redis://localhost:6379/0')
+
+# 缓存（题目页面和题目 API 等，见 oj_project/problems/cache.py）
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+        'LOCATION': config('CACHE_URL', default=REDIS_URL),
+        'KEY_PREFIX': 'oj',
+    }
+}
+
 # Celery Configuration
-CELERY_BROKER_URL = config('REDIS_URL', default='redis://localhost:6379/0')
-CELERY_RESULT_BACKEND = config('REDIS_URL', default='redis://localhost:6379/0')
+CELERY_BROKER_URL = REDIS_URL
+CELERY_RESULT_BACKEND = REDIS_URL
 CELERY_ACCEPT_CONTENT = ['json']
 CELERY_TASK_SERIALIZER = 'json'
 CELERY_RESULT_SERIALIZER = 'json'
 CELERY_TIMEZONE = TIME_ZONE
+CELERY_TASK_DEFAULT_QUEUE = 'celery'
+
+# Celery 定时任务（由 celery-beat 服务调度）
+CELERY_BEAT_SCHEDULE = {
+    # Judge0 回调丢失时的兜底轮询
+    'sweep-judge0-results': {
+        'task': 'oj_project.judge.tasks_judge0.sweep_judge0_results',
+        'schedule': 30.0,
+    },
+    # 把 Redis 中累积的提交数、通过数写回数据库（见 oj_project/problems/counters.py）
+    'flush-counters': {
+        'task': 'oj_project.problems.counters.flush_counters',
+        'schedule': config('COUNTER_FLUSH_INTERVAL', default=10.0, cast=float),
+    },
+    # 把排行榜名次写回 UserProfile.rank，并校正 Redis 排行榜（见 oj_project/users/leaderboard.py）
+    'persist-leaderboard': {
+        'task': 'oj_project.users.leaderboard.persist_leaderboard',
+        'schedule': config('LEADERBOARD_PERSIST_INTERVAL', default=300.0, cast=float),
+    },
+    # 把较早的提交记录移到归档表（见 oj_project/problems/archive.py）
+    'archive-submissions': {
+        'task': 'oj_project.problems.archive.archive_submissions',
+        'schedule': config('SUBMISSION_ARCHIVE_INTERVAL', default=86400.0, cast=float),
+    },
+    # 按速率上限分批发送批量重判的提交（见 oj_project/problems/rejudge.py）
+    'dispatch-rejudges': {
+        'task': 'oj_project.problems.rejudge.dispatch_rejudges',
+        'schedule': config('REJUDGE_DISPATCH_INTERVAL', default=5.0, cast=float),
+    },
+}
 
 # Custom User Model (if needed)
 # AUTH_USER_MODEL = 'users.User'
@@ -242,8 +284,95 @@ OJ_SETTINGS = {
     # judge0: 使用Judge0专业沙箱（阶段3，安全等级：高）- Linux环境下推荐
     'JUDGE_METHOD': config('JUDGE_METHOD', default='traditional'),
     
+    # 判题后端调度（见 oj_project/judge/dispatcher.py）：JUDGE_METHOD 不可用或已饱和时
+    # 按顺序改用以下后端；判题过程中后端故障时也会转交给下一个后端
+    'JUDGE_FALLBACK_BACKENDS': config(
+        'JUDGE_FALLBACK_BACKENDS', default='docker,traditional',
+        cast=lambda v: [name.strip() for name in v.split(',') if name.strip()]
+    ),
+    # 判题 worker 检查各后端并把心跳发布到 Redis 的间隔秒数；超过 TTL 秒没有更新的心跳视为 worker 已下线
+    'JUDGE_BACKEND_CHECK_INTERVAL': config('JUDGE_BACKEND_CHECK_INTERVAL', default=10, cast=int),
+    'JUDGE_BACKEND_HEARTBEAT_TTL': config('JUDGE_BACKEND_HEARTBEAT_TTL', default=30, cast=int),
+    'JUDGE_MAX_QUEUE_LENGTH': config('JUDGE_MAX_QUEUE_LENGTH', default=50, cast=int),  # traditional / docker：提交所在 Celery 队列超过该长度视为饱和
+    'JUDGE0_MAX_QUEUE': config('JUDGE0_MAX_QUEUE', default=100, cast=int),  # Judge0 排队数超过该值视为饱和
+    
+    # 判题任务队列路由（见 oj_project/judge/routing.py）：每个队列由专门的 worker 消费，
+    # 未列出的任务类型或语言进入 Celery 默认队列
+    'JUDGE_QUEUES': {
+        'judge': {'Python': 'judge.python', 'C++': 'judge.cpp'},  # 用户提交，按语言分队列
+        'rejudge': 'judge.rejudge',  # 批量重判
+    },
+    # 队列内的优先级（Redis broker 中 0 最高）
+    'JUDGE_PRIORITIES': {
+        'judge': 0,
+        'rejudge': 6,
+    },
+    
     # Docker Judge Settings（阶段2）
     'DOCKER_JUDGE_ENABLED': config('DOCKER_JUDGE_ENABLED', default=True, cast=bool),
     'DOCKER_PYTHON_IMAGE': 'oj-judge-python:latest',
     'DOCKER_CPP_IMAGE': 'oj-judge-cpp:latest',
+    
+    # Docker 判题容器池：预创建常驻容器，一次提交的全部测试用例在同一个容器中运行
+    'DOCKER_POOL_ENABLED': config('DOCKER_POOL_ENABLED', default=True, cast=bool),
+    'DOCKER_POOL_SIZE': config('DOCKER_POOL_SIZE', default=2, cast=int),  # 每个判题进程、每个镜像的容器数
+    'DOCKER_POOL_MAX_USES': config('DOCKER_POOL_MAX_USES', default=50, cast=int),  # 单个容器最多评测的提交数
+    
+    # Docker 判题通过镜像中 busybox 的 time 测量用户程序的内存峰值
+    'DOCKER_MEASURE_MEMORY': config('DOCKER_MEASURE_MEMORY', default=True, cast=bool),
+    
+    # Judge0 批量判题：一次提交的全部测试用例通过 /submissions/batch 提交
+    'JUDGE0_BATCH_SIZE': config('JUDGE0_BATCH_SIZE', default=20, cast=int),  # 不超过 Judge0 的 MAX_SUBMISSION_BATCH_SIZE
+    'JUDGE0_POOL_SIZE': config('JUDGE0_POOL_SIZE', default=10, cast=int),  # 每个判题进程的 HTTP 连接池大小
+    
+    # Judge0 回调：Judge0 可访问的本站地址（如 http://web:8000），为空时在任务中轮询结果
+    'JUDGE0_CALLBACK_URL': config('JUDGE0_CALLBACK_URL', default=''),
+    'JUDGE0_CALLBACK_GRACE': config('JUDGE0_CALLBACK_GRACE', default=30, cast=int),  # 超过该秒数未回调的测试用例由兜底轮询查询
+    'JUDGE0_RESULT_TIMEOUT': config('JUDGE0_RESULT_TIMEOUT', default=300, cast=int),  # 超过该秒数仍无结果按系统错误处理
+    
+    # 是否超时以 CPU 时间判定；墙钟时间超过 时间限制 × 该倍数 + 1 秒时结束程序（睡眠或阻塞的程序）
+    'JUDGE_WALL_TIME_FACTOR': config('JUDGE_WALL_TIME_FACTOR', default=3.0, cast=float),
+    
+    # 题目详情页和题目 API 的缓存时间（秒）；题目、标签或样例修改时缓存立即失效，
+    # 通过率等统计数据最多延迟该时间
+    'PROBLEM_CACHE_TIMEOUT': config('PROBLEM_CACHE_TIMEOUT', default=60, cast=int),
+    
+    # 早于该天数的提交记录归档（每个用户在每道题上最好的通过提交除外），0 表示不归档
+    'SUBMISSION_ARCHIVE_AFTER_DAYS': config('SUBMISSION_ARCHIVE_AFTER_DAYS', default=180, cast=int),
+    'SUBMISSION_ARCHIVE_BATCH_SIZE': config('SUBMISSION_ARCHIVE_BATCH_SIZE', default=1000, cast=int),
+    
+    # 批量重判（见 oj_project/problems/rejudge.py）：每个重判任务默认的速率上限（条/分钟）、
+    # 所有任务同时评测中的提交数上限、发送间隔（秒，与 celery-beat 的调度间隔相同）、
+    # 等待评测的用户提交超过该数量时暂停发送、发送后超过该秒数仍无结果按系统错误处理
+    'REJUDGE_RATE': config('REJUDGE_RATE', default=600, cast=int),
+    'REJUDGE_MAX_IN_FLIGHT': config('REJUDGE_MAX_IN_FLIGHT', default=20, cast=int),
+    'REJUDGE_DISPATCH_INTERVAL': config('REJUDGE_DISPATCH_INTERVAL', default=5.0, cast=float),
+    'REJUDGE_YIELD_BACKLOG': config('REJUDGE_YIELD_BACKLOG', default=10, cast=int),
+    'REJUDGE_TIMEOUT': config('REJUDGE_TIMEOUT', default=1800, cast=int),
+    
+    # 提交状态推送（Server-Sent Events）单个连接的最长时间（秒），超时后浏览器自动重连
+    'SUBMISSION_EVENTS_TIMEOUT': config('SUBMISSION_EVENTS_TIMEOUT', default=300, cast=int),
+    
+    # 单次运行的 cgroup v2 内存限制与测量（需委派给判题进程的 cgroup 子树，为空时回退到 RLIMIT_AS）
+    'JUDGE_CGROUP_ROOT': config('JUDGE_CGROUP_ROOT', default=''),
+    
+    # 测试数据文件存储（按内容哈希保存测试用例的输入和期望输出，判题时直接读取文件）
+    'TESTDATA_DIR': config('TESTDATA_DIR', default=str(MEDIA_ROOT / 'testdata')),
+    
+    # C++ 编译缓存（按源代码+编译参数+编译器版本缓存编译产物）
+    'COMPILE_CACHE_ENABLED': config('COMPILE_CACHE_ENABLED', default=True, cast=bool),
+    'COMPILE_CACHE_DIR': config('COMPILE_CACHE_DIR', default='/tmp/oj_compile_cache'),
+    'COMPILE_CACHE_MAX_BYTES': config('COMPILE_CACHE_MAX_BYTES', default=1024 * 1024 * 1024, cast=int),  # 1GB
+    
+    # 评测结果复用（相同代码在相同测试数据、限制和判题后端上的结果，见 judge/verdict_cache.py）
+    'VERDICT_CACHE_ENABLED': config('VERDICT_CACHE_ENABLED', default=True, cast=bool),
+    'VERDICT_CACHE_TIMEOUT': config('VERDICT_CACHE_TIMEOUT', default=7 * 24 * 3600, cast=int),  # 秒
+    
+    # 并行评测：一次提交的多个测试用例同时运行（结果与顺序评测一致）
+    'JUDGE_PARALLEL_CASES': config('JUDGE_PARALLEL_CASES', default=False, cast=bool),
+    'JUDGE_PARALLEL_WORKERS': config('JUDGE_PARALLEL_WORKERS', default=0, cast=int),  # 0 表示使用CPU核数
+    
+    # Python 预热解释器池（zygote）：fork 已启动的解释器运行用户代码，计时不含解释器启动
+    'PYTHON_ZYGOTE_ENABLED': config('PYTHON_ZYGOTE_ENABLED', default=True, cast=bool),
+    'PYTHON_ZYGOTE_POOL_SIZE': config('PYTHON_ZYGOTE_POOL_SIZE', default=0, cast=int),  # 0 表示使用CPU核数
 }
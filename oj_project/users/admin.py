@@ -50,7 +50,8 @@ class UserProfileAdmin(admin.ModelAdmin):
     list_filter = ('school', 'major', 'rating')
     search_fields = ('user__username', 'user__email', 'school', 'major')
     readonly_fields = (
-        'total_submissions', 'accepted_submissions', 'total_solved',
+        'total_submissions', 'accepted_submissions', 'wrong_answer_submissions', 'time_limit_submissions',
+        'memory_limit_submissions', 'runtime_error_submissions', 'compile_error_submissions', 'total_solved',
         'easy_solved', 'medium_solved', 'hard_solved', 'rank',
         'acceptance_rate', 'created_at', 'updated_at'
     )
@@ -61,6 +62,8 @@ class UserProfileAdmin(admin.ModelAdmin):
         ('统计数据', {
             'fields': (
                 'total_submissions', 'accepted_submissions', 'acceptance_rate',
+                'wrong_answer_submissions', 'time_limit_submissions', 'memory_limit_submissions',
+                'runtime_error_submissions', 'compile_error_submissions',
                 'total_solved', 'easy_solved', 'medium_solved', 'hard_solved'
             )
         }),
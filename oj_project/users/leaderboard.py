@@ -0,0 +1,243 @@
+"""
+排行榜
+
+排名保存在 Redis 有序集合 oj:leaderboard 中，成员为「用户名 \x00 用户ID」，分数为
+-(解题数 × RATING_SCALE + 积分)：按分数升序即解题数、积分从高到低，
+两者都相同时按成员的字节序，即按用户名排序（与原先按 user__username 排序一致）。
+用户名修改后成员随之改变，哈希 oj:leaderboard:members 记录每个用户当前的成员。
+
+用户配置保存且解题数或积分可能变化时（见 models.py 的 post_save 信号）更新该用户的分数，
+排行榜分页和名次查询都是 O(log n)。UserProfile.rank 只由 persist_leaderboard 定期写回数据库。
+Redis 不可用时排行榜页面按数据库中的统计数据排序。
+"""
+
+import logging
+from celery import shared_task
+from django.db import transaction
+from oj_project.judge.redis_client import get_redis
+
+logger = logging.getLogger(__name__)
+
+LEADERBOARD_KEY = 'oj:leaderboard'
+MEMBERS_KEY = 'oj:leaderboard:members'  # {用户ID: 有序集合成员}
+
+# 积分的取值范围 [0, RATING_SCALE)，保证解题数优先
+RATING_SCALE = 10 ** 7
+
+
+def leaderboard_score(total_solved, rating):
+    rating = min(max(rating, 0), RATING_SCALE - 1)
+    return -(total_solved * RATING_SCALE + rating)
+
+
+def leaderboard_member(user_id, username):
+    # \x00 小于用户名中的任何字符，用户名是另一个用户名的前缀时排在前面
+    return f'{username}\x00{user_id}'
+
+
+def member_user_id(member):
+    return int(member.rsplit('\x00', 1)[-1])
+
+
+def update_user(user_id):
+    """
+    按数据库中的解题数和积分更新一个用户的分数
+
+    保存时只更新了部分字段的配置对象中，其他字段可能已经过期，因此重新读取。
+
+    Args:
+        user_id: 用户ID
+    """
+    from .models import UserProfile
+
+    row = UserProfile.objects.filter(user_id=user_id).values_list('total_solved', 'rating', 'user__username').first()
+    if row is None:
+        return
+    total_solved, rating, username = row
+    member = leaderboard_member(user_id, username)
+    try:
+        client = get_redis()
+        old = client.hget(MEMBERS_KEY, user_id)
+        pipe = client.pipeline()
+        if old is not None and old != member:
+            pipe.zrem(LEADERBOARD_KEY, old)
+        pipe.zadd(LEADERBOARD_KEY, {member: leaderboard_score(total_solved, rating)})
+        pipe.hset(MEMBERS_KEY, user_id, member)
+        pipe.execute()
+    except Exception as e:
+        logger.warning(f"更新排行榜失败 (user={user_id}): {e}")
+
+
+def remove_user(user_id):
+    try:
+        client = get_redis()
+        member = client.hget(MEMBERS_KEY, user_id)
+        if member is not None:
+            pipe = client.pipeline()
+            pipe.zrem(LEADERBOARD_KEY, member)
+            pipe.hdel(MEMBERS_KEY, user_id)
+            pipe.execute()
+    except Exception as e:
+        logger.warning(f"从排行榜移除用户失败 (user={user_id}): {e}")
+
+
+def refresh_solved(user_id):
+    """
+    提交通过后重新统计用户的解题数
+
+    解题数变化时用户配置的 post_save 信号会更新排行榜。
+    """
+    from .models import UserProfile
+
+    profile = UserProfile.objects.filter(user_id=user_id).first()
+    if profile is not None:
+        profile.update_solved()
+
+
+def get_rank(user_id):
+    """
+    用户的名次
+
+    Returns:
+        int | None: 从 1 开始；不在排行榜中或 Redis 不可用时返回 None
+    """
+    try:
+        client = get_redis()
+        member = client.hget(MEMBERS_KEY, user_id)
+        rank = None if member is None else client.zrank(LEADERBOARD_KEY, member)
+    except Exception as e:
+        logger.warning(f"查询排名失败 (user={user_id}): {e}")
+        return None
+    return None if rank is None else rank + 1
+
+
+def _ranked_rows():
+    """从数据库按排行榜顺序读取全部用户 [(user_id, 有序集合成员, 分数), ...]"""
+    from .models import UserProfile
+
+    rows = UserProfile.objects.values_list(
+        'user_id', 'user__username', 'total_solved', 'rating'
+    ).iterator(chunk_size=5000)
+    ranked = [
+        (user_id, leaderboard_member(user_id, username), leaderboard_score(total_solved, rating))
+        for user_id, username, total_solved, rating in rows
+    ]
+    # 与有序集合相同：分数相同时按成员的字节序（UTF-8 字节序与码点顺序一致）
+    ranked.sort(key=lambda row: (row[2], row[1]))
+    return ranked
+
+
+def rebuild(ranked=None, chunk_size=5000):
+    """
+    用数据库中的统计数据重建有序集合和成员哈希（写入临时键后 RENAME，读取方不会看到不完整的排行榜）
+
+    Args:
+        ranked: _ranked_rows 的结果，默认重新读取
+
+    Returns:
+        int: 用户数
+    """
+    if ranked is None:
+        ranked = _ranked_rows()
+    client = get_redis()
+    if not ranked:
+        client.delete(LEADERBOARD_KEY, MEMBERS_KEY)
+        return 0
+
+    temp_key = f'{LEADERBOARD_KEY}:rebuild'
+    temp_members = f'{MEMBERS_KEY}:rebuild'
+    client.delete(temp_key, temp_members)
+    for start in range(0, len(ranked), chunk_size):
+        chunk = ranked[start:start + chunk_size]
+        client.zadd(temp_key, {member: score for _, member, score in chunk})
+        client.hset(temp_members, mapping={user_id: member for user_id, member, _ in chunk})
+    pipe = client.pipeline()
+    pipe.rename(temp_key, LEADERBOARD_KEY)
+    pipe.rename(temp_members, MEMBERS_KEY)
+    pipe.execute()
+    return len(ranked)
+
+
+class RankedProfiles:
+    """
+    按排行榜顺序排列的用户配置（供 Paginator 分页）
+
+    只读取当前页的用户配置，rank 为实时名次。
+    """
+
+    def __init__(self, client):
+        self.client = client
+
+    def count(self):
+        return self.client.zcard(LEADERBOARD_KEY)
+
+    def __len__(self):
+        return self.count()
+
+    def __getitem__(self, index):
+        from .models import UserProfile
+
+        if not isinstance(index, slice):
+            return self[index:index + 1][0]
+        start = index.start or 0
+        if index.stop is not None and index.stop <= start:
+            return []
+        stop = -1 if index.stop is None else index.stop - 1
+        user_ids = [member_user_id(member) for member in self.client.zrange(LEADERBOARD_KEY, start, stop)]
+        profiles = UserProfile.objects.select_related('user').in_bulk(user_ids, field_name='user_id')
+
+        page = []
+        for rank, user_id in enumerate(user_ids, start=start + 1):
+            profile = profiles.get(user_id)
+            if profile is not None:
+                profile.rank = rank
+                page.append(profile)
+        return page
+
+
+def ranked_profiles():
+    """
+    排行榜（Paginator 可用的序列）
+
+    有序集合或成员哈希为空时（如 Redis 重启后）先从数据库重建。
+
+    Returns:
+        RankedProfiles | QuerySet: Redis 不可用时返回按数据库统计数据排序的查询集
+    """
+    from .models import UserProfile
+
+    try:
+        client = get_redis()
+        if client.exists(LEADERBOARD_KEY, MEMBERS_KEY) < 2:
+            rebuild()
+        return RankedProfiles(client)
+    except Exception as e:
+        logger.warning(f"读取排行榜失败，改为按数据库排序: {e}")
+        return UserProfile.objects.select_related('user').order_by('-total_solved', '-rating', 'user__username')
+
+
+@shared_task(ignore_result=True)
+def persist_leaderboard():
+    """
+    把名次写回 UserProfile.rank（由 celery-beat 定期调度）
+
+    同时用数据库中的统计数据重建有序集合，修正 Redis 不可用期间漏掉的更新。
+    只更新名次变化的用户。
+
+    Returns:
+        int: 名次变化的用户数
+    """
+    from .models import UserProfile
+
+    ranked = _ranked_rows()
+    rebuild(ranked)
+
+    ranks = {user_id: rank for rank, (user_id, _, _) in enumerate(ranked, start=1)}
+    changed = [
+        UserProfile(id=profile_id, rank=ranks[user_id])
+        for profile_id, user_id, rank in UserProfile.objects.values_list('id', 'user_id', 'rank').iterator(chunk_size=5000)
+        if user_id in ranks and ranks[user_id] != rank
+    ]
+    with transaction.atomic():
+        UserProfile.objects.bulk_update(changed, ['rank'], batch_size=1000)
+    return len(changed)
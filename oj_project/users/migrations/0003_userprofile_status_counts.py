@@ -0,0 +1,65 @@
+# Generated by Django 4.2.7 on 2026-10-18 04:55
+
+from django.db import migrations, models
+from django.db.models import Count
+
+# 与 counters.STATUS_FIELDS 相同（不含已有的通过提交数）
+STATUS_FIELDS = {
+    "Wrong Answer": "wrong_answer_submissions",
+    "Time Limit Exceeded": "time_limit_submissions",
+    "Memory Limit Exceeded": "memory_limit_submissions",
+    "Runtime Error": "runtime_error_submissions",
+    "Compile Error": "compile_error_submissions",
+}
+
+
+def backfill_status_counts(apps, schema_editor):
+    """按已有的提交记录（包括已归档的）统计各评测结果的提交数"""
+    UserProfile = apps.get_model("users", "UserProfile")
+    counts = {}
+    for model_name in ("Submission", "ArchivedSubmission"):
+        model = apps.get_model("problems", model_name)
+        rows = model.objects.filter(status__in=list(STATUS_FIELDS)).values_list(
+            "user_id", "status"
+        ).annotate(count=Count("id")).order_by()
+        for user_id, status, count in rows.iterator(chunk_size=2000):
+            fields = counts.setdefault(user_id, {})
+            fields[STATUS_FIELDS[status]] = fields.get(STATUS_FIELDS[status], 0) + count
+    for user_id, fields in counts.items():
+        UserProfile.objects.filter(user_id=user_id).update(**fields)
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("users", "0002_userprofile_language_preference_userprofile_phone_and_more"),
+        ("problems", "0009_userproblemstatus_pending"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="userprofile",
+            name="compile_error_submissions",
+            field=models.IntegerField(default=0, verbose_name="编译错误提交数"),
+        ),
+        migrations.AddField(
+            model_name="userprofile",
+            name="memory_limit_submissions",
+            field=models.IntegerField(default=0, verbose_name="内存超限提交数"),
+        ),
+        migrations.AddField(
+            model_name="userprofile",
+            name="runtime_error_submissions",
+            field=models.IntegerField(default=0, verbose_name="运行错误提交数"),
+        ),
+        migrations.AddField(
+            model_name="userprofile",
+            name="time_limit_submissions",
+            field=models.IntegerField(default=0, verbose_name="超时提交数"),
+        ),
+        migrations.AddField(
+            model_name="userprofile",
+            name="wrong_answer_submissions",
+            field=models.IntegerField(default=0, verbose_name="答案错误提交数"),
+        ),
+        migrations.RunPython(backfill_status_counts, migrations.RunPython.noop),
+    ]
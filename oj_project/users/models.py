@@ -1,6 +1,7 @@
 from django.db import models
 from django.contrib.auth.models import User
-from django.db.models.signals import post_save
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
 from django.dispatch import receiver
 
 class UserProfile(models.Model):
@@ -21,6 +22,11 @@ class UserProfile(models.Model):
     # 统计数据（这些会通过信号或定期任务更新）
     total_submissions = models.IntegerField('总提交数', default=0)
     accepted_submissions = models.IntegerField('通过提交数', default=0)
+    wrong_answer_submissions = models.IntegerField('答案错误提交数', default=0)
+    time_limit_submissions = models.IntegerField('超时提交数', default=0)
+    memory_limit_submissions = models.IntegerField('内存超限提交数', default=0)
+    runtime_error_submissions = models.IntegerField('运行错误提交数', default=0)
+    compile_error_submissions = models.IntegerField('编译错误提交数', default=0)
     total_solved = models.IntegerField('解决题目数', default=0)
     easy_solved = models.IntegerField('简单题通过数', default=0)
     medium_solved = models.IntegerField('中等题通过数', default=0)
@@ -60,9 +66,28 @@ class UserProfile(models.Model):
         verbose_name_plural = '用户配置'
         ordering = ['-rating', '-total_solved']
     
+    # 由 counters.flush_counters 用 F() 累加的提交计数
+    COUNTER_FIELDS = (
+        'total_submissions', 'accepted_submissions', 'wrong_answer_submissions', 'time_limit_submissions',
+        'memory_limit_submissions', 'runtime_error_submissions', 'compile_error_submissions',
+    )
+    
+    # 等待评测、评测中和系统错误的提交不单独计数，在状态分布中合并显示
+    OTHER_STATUSES_LABEL = 'Pending / Judging / System Error'
+    
     def __str__(self):
         return f"{self.user.username}的配置"
     
+    def save(self, *args, **kwargs):
+        # 提交计数只由 counters.flush_counters 用 F() 累加（update_statistics 校正时显式写回），
+        # 保存整个配置时不写回（内存中的值可能已过期，写回会覆盖已累加的增量）
+        if not self._state.adding and kwargs.get('update_fields') is None:
+            kwargs['update_fields'] = [
+                field.name for field in self._meta.concrete_fields
+                if not field.primary_key and field.name not in self.COUNTER_FIELDS
+            ]
+        super().save(*args, **kwargs)
+    
     @property
     def acceptance_rate(self):
         """通过率"""
@@ -70,32 +95,87 @@ class UserProfile(models.Model):
             return 0
         return round(self.accepted_submissions / self.total_submissions * 100, 1)
     
-    def update_statistics(self):
-        """更新用户统计数据"""
-        from oj_project.problems.models import Submission, Problem
-        from django.db.models import Count, Q
+    def status_counts(self):
+        """
+        各状态的提交数（读取随评测结果累加的计数，不统计提交记录）
+        
+        等待评测、评测中和系统错误的提交合计为总提交数减去各评测结果的提交数。
+        
+        Returns:
+            dict: {状态: 提交数}，不含为 0 的状态
+        """
+        from oj_project.problems.counters import STATUS_FIELDS
+        
+        counts = {status: getattr(self, field) for status, field in STATUS_FIELDS.items()}
+        counts[self.OTHER_STATUSES_LABEL] = self.total_submissions - sum(counts.values())
+        return {status: count for status, count in counts.items() if count > 0}
+    
+    def solved_counts(self):
+        """
+        统计通过的题目数（从做题状态表统计）
+        
+        Returns:
+            dict: {'total_solved', 'easy_solved', 'medium_solved', 'hard_solved'}
+        """
+        from oj_project.problems.models import UserProblemStatus
         
-        # 获取用户所有提交
-        user_submissions = Submission.objects.filter(user=self.user)
+        difficulties = list(
+            UserProblemStatus.objects.filter(
+                user_id=self.user_id,
+                status='Accepted'
+            ).values_list('problem__difficulty', flat=True)
+        )
+        return {
+            'total_solved': len(difficulties),
+            'easy_solved': difficulties.count('Easy'),
+            'medium_solved': difficulties.count('Medium'),
+            'hard_solved': difficulties.count('Hard'),
+        }
+    
+    def update_solved(self):
+        """
+        重新统计解题数，有变化时只保存解题数字段
         
-        # 更新提交数
-        self.total_submissions = user_submissions.count()
-        self.accepted_submissions = user_submissions.filter(status='Accepted').count()
+        Returns:
+            bool: 是否有变化
+        """
+        counts = self.solved_counts()
+        changed = [field for field, value in counts.items() if getattr(self, field) != value]
+        for field in changed:
+            setattr(self, field, counts[field])
+        if changed:
+            self.save(update_fields=changed)
+        return bool(changed)
+    
+    def update_statistics(self):
+        """按提交记录重新统计用户数据（包括做题状态表），用于校正"""
+        from django.db.models import Count
+        from oj_project.problems.counters import STATUS_FIELDS
+        from oj_project.problems.models import ArchivedSubmission, Submission
+        from oj_project.problems.progress import rebuild_user
         
-        # 获取通过的题目（去重）
-        solved_problems = Problem.objects.filter(
-            submissions__user=self.user,
-            submissions__status='Accepted'
-        ).distinct()
+        rebuild_user(self.user_id)
         
-        self.total_solved = solved_problems.count()
+        # 更新提交数和各评测结果的提交数（包括已归档的提交）
+        for field in self.COUNTER_FIELDS:
+            setattr(self, field, 0)
+        for model in (Submission, ArchivedSubmission):
+            for status, count in model.objects.filter(user=self.user).values_list('status').annotate(Count('id')).order_by():
+                self.total_submissions += count
+                if status in STATUS_FIELDS:
+                    setattr(self, STATUS_FIELDS[status], getattr(self, STATUS_FIELDS[status]) + count)
         
-        # 按难度统计
-        self.easy_solved = solved_problems.filter(difficulty='Easy').count()
-        self.medium_solved = solved_problems.filter(difficulty='Medium').count()
-        self.hard_solved = solved_problems.filter(difficulty='Hard').count()
+        # 通过的题目数（按难度）
+        for field, value in self.solved_counts().items():
+            setattr(self, field, value)
         
-        self.save()
+        # Redis 中尚未写回的增量稍后会加到数据库上，这里先减去，避免重复计数
+        from oj_project.problems.counters import pending
+        for field, delta in pending('profile', [self.user_id]).get(self.user_id, {}).items():
+            setattr(self, field, getattr(self, field) - delta)
+        
+        # 校正时写回全部字段，包括提交计数
+        self.save(update_fields=[field.name for field in self._meta.concrete_fields if not field.primary_key])
 
 
 @receiver(post_save, sender=User)
@@ -110,3 +190,22 @@ def save_user_profile(sender, instance, **kwargs):
     """保存用户时自动保存配置"""
     if hasattr(instance, 'profile'):
         instance.profile.save()
+
+
+# 影响排行榜分数的字段
+LEADERBOARD_FIELDS = {'total_solved', 'rating'}
+
+
+@receiver(post_save, sender=UserProfile)
+def update_leaderboard(sender, instance, update_fields=None, **kwargs):
+    """解题数或积分可能变化时更新排行榜"""
+    if update_fields is not None and not LEADERBOARD_FIELDS & set(update_fields):
+        return
+    from .leaderboard import update_user
+    transaction.on_commit(lambda: update_user(instance.user_id))
+
+
+@receiver(post_delete, sender=UserProfile)
+def remove_from_leaderboard(sender, instance, **kwargs):
+    from .leaderboard import remove_user
+    transaction.on_commit(lambda: remove_user(instance.user_id))
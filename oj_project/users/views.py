@@ -71,8 +71,9 @@ def logout_view(request):
 @login_required
 def profile_view(request):
     """用户个人中心视图"""
-    from oj_project.problems.models import Submission, Problem
-    from django.db.models import Count, Q
+    from oj_project.problems.counters import apply_pending
+    from oj_project.problems.models import Submission, UserProblemStatus
+    from .leaderboard import get_rank
     
     user = request.user
     
@@ -81,27 +82,27 @@ def profile_view(request):
         from .models import UserProfile
         UserProfile.objects.create(user=user)
     
-    # 更新用户统计数据
-    user.profile.update_statistics()
+    # 统计数据随评测结果增量更新，这里只加上尚未写回数据库的提交计数
+    apply_pending('profile', [user.profile])
+    user.profile.rank = get_rank(user.id) or user.profile.rank
     
     # 获取最近提交记录（最近10条）
     recent_submissions = Submission.objects.filter(user=user).select_related('problem')[:10]
     
-    # 获取已通过的题目
-    solved_problems = Problem.objects.filter(
-        submissions__user=user,
-        submissions__status='Accepted'
-    ).distinct().order_by('-submissions__created_at')[:10]
-    
-    # 统计各状态提交数
-    status_stats = Submission.objects.filter(user=user).values('status').annotate(count=Count('id'))
-    status_dict = {item['status']: item['count'] for item in status_stats}
+    # 获取最近通过的题目
+    solved_problems = [
+        state.problem for state in UserProblemStatus.objects.filter(
+            user=user,
+            status='Accepted'
+        ).select_related('problem').order_by('-first_accepted_at')[:10]
+    ]
     
     context = {
         'profile': user.profile,
         'recent_submissions': recent_submissions,
         'solved_problems': solved_problems,
-        'status_stats': status_dict,
+        # 各状态提交数（随评测结果累加的计数，包括已归档的提交）
+        'status_stats': user.profile.status_counts(),
     }
     
     return render(request, 'users/profile.html', context)
@@ -109,25 +110,19 @@ def profile_view(request):
 
 def leaderboard_view(request):
     """排行榜视图"""
-    from .models import UserProfile
     from django.db.models import Count, Q
     from oj_project.problems.models import Problem
     
-    # 更新所有用户排名
-    profiles = UserProfile.objects.all().order_by('-total_solved', '-rating', 'user__username')
-    for index, profile in enumerate(profiles, start=1):
-        if profile.rank != index:
-            profile.rank = index
-            profile.save(update_fields=['rank'])
-    
-    # 获取排行榜数据（支持分页）
+    # 获取排行榜数据（支持分页，名次由 Redis 有序集合维护）
     from django.core.paginator import Paginator
+    from oj_project.problems.counters import apply_pending
+    from .leaderboard import ranked_profiles
     
-    profiles_list = UserProfile.objects.select_related('user').order_by('rank')
-    paginator = Paginator(profiles_list, 50)  # 每页50个
+    paginator = Paginator(ranked_profiles(), 50)  # 每页50个
     
     page_number = request.GET.get('page', 1)
     page_obj = paginator.get_page(page_number)
+    page_obj.object_list = apply_pending('profile', list(page_obj.object_list))
     
     # 获取题目统计
     total_problems = Problem.objects.filter(is_public=True).count()
@@ -137,9 +132,9 @@ def leaderboard_view(request):
     
     # 获取总用户数和总提交数
     from django.contrib.auth.models import User
-    from oj_project.problems.models import Submission
+    from oj_project.problems.models import ArchivedSubmission, Submission
     total_users = User.objects.count()
-    total_submissions = Submission.objects.count()
+    total_submissions = Submission.objects.count() + ArchivedSubmission.objects.count()
     
     context = {
         'page_obj': page_obj,